@@ -0,0 +1,218 @@
+import os
+import hashlib
+import logging
+import threading
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, UniqueConstraint, select, and_
+from sqlalchemy.engine import Engine
+from db_engine import BatchedTableWriter, close_on_exit
+from config import BILLING_PERIOD_FORMAT
+
+# Run ledger: one row per IVRS number / MH account recording the last billing
+# period fetched, so re-runs only download what is still missing. Bills fetched
+# by the pipelines are recorded through a BatchedTableWriter, so the ledger's
+# upserts never run on the browser's thread.
+
+ledger_metadata = MetaData()
+ledger_table = Table(
+    'bill_ledger', ledger_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('portal', String(8), nullable=False),
+    Column('item_key', String, nullable=False),
+    Column('billing_period', String(16), nullable=False),
+    Column('file_path', String, nullable=False),
+    Column('content_hash', String(64), nullable=False),
+    Column('fetched_at', DateTime, nullable=False),
+    UniqueConstraint('portal', 'item_key', name='uq_bill_ledger_portal_item'),
+)
+
+
+def ensure_ledger_table(engine: Engine) -> None:
+    """
+    Create the bill_ledger table if it does not exist yet.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+    """
+    ledger_metadata.create_all(engine, tables=[ledger_table], checkfirst=True)
+
+
+def current_billing_period(today: Optional[date] = None) -> str:
+    """
+    Return the billing period bills fetched today belong to.
+
+    Args:
+        today (Optional[date]): Date to use instead of today.
+
+    Returns:
+        str: Billing period formatted with BILLING_PERIOD_FORMAT, e.g. "2024-08".
+    """
+    return (today or date.today()).strftime(BILLING_PERIOD_FORMAT)
+
+
+def hash_file(file_path: str) -> str:
+    """
+    Compute the SHA-256 hash of a file.
+
+    Args:
+        file_path (str): Path of the file.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_fetched_keys(engine: Engine, portal: str, billing_period: Optional[str] = None) -> Set[str]:
+    """
+    Return the items whose bill for the billing period is already fetched.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        portal (str): "mp" or "mh".
+        billing_period (Optional[str]): Billing period; defaults to the current one.
+
+    Returns:
+        Set[str]: IVRS numbers or account ids already fetched.
+    """
+    billing_period = billing_period or current_billing_period()
+    query = select(ledger_table.c.item_key).where(and_(
+        ledger_table.c.portal == portal,
+        ledger_table.c.billing_period == billing_period,
+    ))
+    with engine.connect() as connection:
+        return {row[0] for row in connection.execute(query)}
+
+
+def filter_unfetched(engine: Engine, portal: str, keys: Iterable, billing_period: Optional[str] = None) -> List:
+    """
+    Drop the items whose bill for the billing period is already fetched.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        portal (str): "mp" or "mh".
+        keys (Iterable): IVRS numbers or account ids to process.
+        billing_period (Optional[str]): Billing period; defaults to the current one.
+
+    Returns:
+        List: The keys still to be fetched, in their original order.
+    """
+    fetched = get_fetched_keys(engine, portal, billing_period)
+    keys = list(keys)
+    remaining = [key for key in keys if str(key) not in fetched]
+    logging.info(f"Ledger: {len(keys) - len(remaining)} of {len(keys)} {portal} bills already fetched; "
+                 f"{len(remaining)} remaining.")
+    return remaining
+
+
+def _upsert_ledger_entries(engine: Engine):
+    """
+    Build an INSERT on bill_ledger that replaces the items' previous entries in the same statement.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+
+    Returns:
+        Insert: Dialect-specific upsert statement, executed with one or more rows.
+
+    Raises:
+        NotImplementedError: If the database is neither PostgreSQL nor SQLite.
+    """
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"The bill ledger does not support the {engine.dialect.name} dialect.")
+    statement = insert(ledger_table)
+    return statement.on_conflict_do_update(
+        index_elements=[ledger_table.c.portal, ledger_table.c.item_key],
+        set_={name: statement.excluded[name]
+              for name in ('billing_period', 'file_path', 'content_hash', 'fetched_at')},
+    )
+
+
+def _ledger_row(portal: str, item_key: str, file_path: str, billing_period: Optional[str] = None,
+                content_hash: Optional[str] = None) -> Dict[str, object]:
+    """Build the ledger row of a fetched bill."""
+    return {
+        'portal': portal,
+        'item_key': str(item_key),
+        'billing_period': billing_period or current_billing_period(),
+        'file_path': file_path,
+        'content_hash': content_hash or hash_file(file_path),
+        'fetched_at': datetime.utcnow(),
+    }
+
+
+def record_fetched_bill(engine: Engine, portal: str, item_key: str, file_path: str,
+                        billing_period: Optional[str] = None, content_hash: Optional[str] = None) -> None:
+    """
+    Record a fetched bill, replacing the previous entry of the item.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        portal (str): "mp" or "mh".
+        item_key (str): IVRS number or account id.
+        file_path (str): Path of the downloaded bill.
+        billing_period (Optional[str]): Billing period; defaults to the current one.
+        content_hash (Optional[str]): SHA-256 of the bill; computed from file_path when omitted.
+    """
+    row = _ledger_row(portal, item_key, file_path, billing_period, content_hash)
+    with engine.begin() as connection:
+        connection.execute(_upsert_ledger_entries(engine), [row])
+
+
+_writers: Dict[int, BatchedTableWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_ledger_writer(engine: Engine) -> BatchedTableWriter:
+    """
+    Return this process's ledger writer, creating the table and writer on first use.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+
+    Returns:
+        BatchedTableWriter: Writer upserting into bill_ledger.
+    """
+    pid = os.getpid()
+    with _writers_lock:
+        if pid not in _writers:
+            ensure_ledger_table(engine)
+            _writers[pid] = close_on_exit(
+                BatchedTableWriter(engine, ledger_table, statement=_upsert_ledger_entries(engine))
+            )
+        return _writers[pid]
+
+
+def close_ledger_writer() -> None:
+    """Flush and stop this process's ledger writer, if one was started."""
+    with _writers_lock:
+        writer = _writers.pop(os.getpid(), None)
+    if writer:
+        writer.close()
+
+
+def try_record_fetched_bill(engine: Engine, portal: str, item_key: str, file_path: str,
+                            billing_period: Optional[str] = None) -> None:
+    """
+    Queue a fetched bill for the ledger without letting a ledger failure fail the bill itself.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        portal (str): "mp" or "mh".
+        item_key (str): IVRS number or account id.
+        file_path (str): Path of the downloaded bill.
+        billing_period (Optional[str]): Billing period; defaults to the current one.
+    """
+    try:
+        get_ledger_writer(engine).write(_ledger_row(portal, item_key, file_path, billing_period))
+    except Exception as e:
+        logging.error(f"Failed to record {portal} bill {item_key} in the ledger: {e}")
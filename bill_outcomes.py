@@ -0,0 +1,95 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import Table, Column, Integer, String, DateTime, Float, MetaData
+from db_engine import get_engine, BatchedTableWriter, close_on_exit
+from stage_timing import get_run_id
+
+# Per-bill outcomes: one row per item attempt with its outcome, duration, bill
+# path and error class, written through a BatchedTableWriter so the database is
+# never on the browser's critical path.
+
+outcome_metadata = MetaData()
+outcome_table = Table(
+    'bill_outcomes', outcome_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('run_id', String(32), nullable=False),
+    Column('portal', String(8), nullable=False),
+    Column('item_key', String, nullable=False),
+    Column('attempt', Integer, nullable=False),
+    Column('outcome', String(64), nullable=False),
+    Column('duration_ms', Float, nullable=False),
+    Column('file_path', String),
+    Column('error_class', String(128)),
+    Column('finished_at', DateTime, nullable=False),
+)
+
+_writers: Dict[int, BatchedTableWriter] = {}
+_writers_lock = threading.Lock()
+_item_state = threading.local()
+
+
+def get_outcome_writer() -> BatchedTableWriter:
+    """
+    Return this process's outcome writer, creating the table and writer on first use.
+
+    Returns:
+        BatchedTableWriter: Writer for bill_outcomes.
+    """
+    pid = os.getpid()
+    with _writers_lock:
+        if pid not in _writers:
+            engine = get_engine()
+            outcome_metadata.create_all(engine, tables=[outcome_table], checkfirst=True)
+            _writers[pid] = close_on_exit(BatchedTableWriter(engine, outcome_table))
+        return _writers[pid]
+
+
+def close_outcome_writer() -> None:
+    """Flush and stop this process's outcome writer, if one was started."""
+    with _writers_lock:
+        writer = _writers.pop(os.getpid(), None)
+    if writer:
+        writer.close()
+
+
+def set_outcome_file_path(file_path: str) -> None:
+    """
+    Remember the bill path of the item this thread is processing.
+
+    Args:
+        file_path (str): Path of the downloaded bill.
+    """
+    _item_state.file_path = file_path
+
+
+def record_outcome(portal: str, item_key: str, attempt: int, outcome: str, duration: float,
+                   error_class: Optional[str] = None) -> None:
+    """
+    Queue the outcome of one item attempt for insertion.
+
+    The bill path noted with set_outcome_file_path during the attempt is
+    attached and then cleared.
+
+    Args:
+        portal (str): "mp" or "mh".
+        item_key (str): IVRS number or account id.
+        attempt (int): Attempt number.
+        outcome (str): "ok" or "error".
+        duration (float): Duration of the attempt in seconds.
+        error_class (Optional[str]): Class name of the raised exception.
+    """
+    file_path = getattr(_item_state, 'file_path', None)
+    _item_state.file_path = None
+    get_outcome_writer().write({
+        'run_id': get_run_id(),
+        'portal': portal,
+        'item_key': str(item_key),
+        'attempt': attempt,
+        'outcome': outcome,
+        'duration_ms': round(duration * 1000, 3),
+        'file_path': file_path,
+        'error_class': error_class,
+        'finished_at': datetime.utcnow(),
+    })
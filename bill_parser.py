@@ -0,0 +1,287 @@
+import os
+import re
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Optional
+from sqlalchemy import Table, Column, Integer, String, DateTime, Float, MetaData, Index
+from db_engine import get_engine, BatchedTableWriter
+from stage_timing import get_run_id
+from config import BILL_PARSER_WORKERS, BILL_PARSER_MAX_BACKLOG, PROMETHEUS_TEXTFILE_DIR
+
+# Post-download bill parsing.
+#
+# Every downloaded bill is submitted to a process pool as soon as it is saved,
+# so parsing runs alongside the downloads. The text of the PDF is searched for
+# the amount due, due date, units consumed and billing period; results stream
+# into the bills table through a BatchedTableWriter. The patterns are generic
+# and can be tuned per portal in BILL_FIELD_PATTERNS.
+
+_DATE = r"(\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}|\d{1,2}[- ][A-Za-z]{3,9}[- ]\d{2,4})"
+_NUMBER = r"([\d,]+(?:\.\d+)?)"
+
+_COMMON_PATTERNS = {
+    'amount_due': r"(?:Net\s+)?(?:Amount\s+Payable|Amount\s+Due|Payable\s+Amount|Bill\s+Amount|Total\s+Amount)"
+                  r"[^\d\n]{0,40}" + _NUMBER,
+    'due_date': r"Due\s+Date[^\d\n]{0,20}" + _DATE,
+    'units_consumed': r"(?:Units\s+Consumed|Total\s+Units|Billed\s+Units|Consumption)[^\d\n]{0,30}" + _NUMBER,
+    'billing_period': r"Bill(?:ing)?\s+(?:Month|Period)[^\w\n]{0,10}"
+                      r"([A-Za-z]{3,9}[- ]?\d{2,4}|\d{1,2}[-/]\d{4}|"
+                      r"\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}\s*(?:to|-)\s*\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4})",
+}
+
+BILL_FIELD_PATTERNS: Dict[str, Dict[str, str]] = {
+    "mp": dict(_COMMON_PATTERNS),
+    "mh": dict(_COMMON_PATTERNS),
+}
+
+bills_metadata = MetaData()
+bills_table = Table(
+    'bills', bills_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('run_id', String(32), nullable=False),
+    Column('portal', String(8), nullable=False),
+    Column('item_key', String, nullable=False),
+    Column('file_path', String, nullable=False),
+    Column('amount_due', Float),
+    Column('due_date', String(32)),
+    Column('units_consumed', Float),
+    Column('billing_period', String(64)),
+    Column('parse_error', String),
+    Column('parse_ms', Float, nullable=False),
+    Column('parsed_at', DateTime, nullable=False),
+    Index('ix_bills_portal_item', 'portal', 'item_key'),
+)
+
+
+def extract_pdf_text(file_path: str) -> str:
+    """
+    Extract the text of every page of a PDF.
+
+    Args:
+        file_path (str): Path of the PDF.
+
+    Returns:
+        str: Text of all pages, separated by newlines.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def _to_number(text: Optional[str]) -> Optional[float]:
+    """
+    Convert a matched number such as "1,234.50" to a float.
+
+    Args:
+        text (Optional[str]): Matched text.
+
+    Returns:
+        Optional[float]: The number, or None if nothing was matched.
+    """
+    return float(text.replace(',', '')) if text else None
+
+
+def parse_bill_pdf(portal: str, file_path: str) -> Dict[str, Any]:
+    """
+    Extract the bill fields of one PDF; runs in a parser process.
+
+    Args:
+        portal (str): "mp" or "mh".
+        file_path (str): Path of the bill.
+
+    Returns:
+        Dict[str, Any]: amount_due, due_date, units_consumed, billing_period and
+            parse_error (None when every field was found), plus parse_ms.
+    """
+    start_time = time.perf_counter()
+    fields: Dict[str, Any] = {}
+    try:
+        text = extract_pdf_text(file_path)
+        for name, pattern in BILL_FIELD_PATTERNS[portal].items():
+            match = re.search(pattern, text, re.IGNORECASE)
+            fields[name] = match.group(1).strip() if match else None
+        missing = [name for name, value in fields.items() if value is None]
+        fields['parse_error'] = f"Fields not found: {', '.join(missing)}" if missing else None
+        fields['amount_due'] = _to_number(fields.get('amount_due'))
+        fields['units_consumed'] = _to_number(fields.get('units_consumed'))
+    except Exception as e:
+        fields['parse_error'] = f"{type(e).__name__}: {e}"
+    fields['parse_ms'] = round((time.perf_counter() - start_time) * 1000, 3)
+    return fields
+
+
+class BillParseStage:
+    """
+    Parses downloaded bills in a process pool while downloads continue.
+
+    submit() returns immediately; results are written to the bills table from
+    the pool's callback thread. Throughput counters are kept for the metrics.
+    """
+
+    def __init__(self, workers: int = BILL_PARSER_WORKERS):
+        """
+        Start the parser pool and the bills writer.
+
+        Args:
+            workers (int): Parser processes.
+        """
+        engine = get_engine()
+        bills_metadata.create_all(engine, tables=[bills_table], checkfirst=True)
+        self.writer = BatchedTableWriter(engine, bills_table)
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.started_at = time.monotonic()
+        self.submitted = 0
+        self.parsed = 0
+        self.failed = 0
+        self.parse_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def backlog(self) -> int:
+        """Bills submitted but not parsed yet."""
+        return self.submitted - self.parsed - self.failed
+
+    def submit(self, portal: str, item_key: str, file_path: str) -> None:
+        """
+        Queue a downloaded bill for parsing.
+
+        Args:
+            portal (str): "mp" or "mh".
+            item_key (str): IVRS number or consumer number.
+            file_path (str): Path of the bill.
+        """
+        with self._lock:
+            self.submitted += 1
+            if self.backlog > BILL_PARSER_MAX_BACKLOG:
+                logging.warning(f"Bill parser is {self.backlog} bills behind the downloads.")
+        run_id = get_run_id()
+        future = self.executor.submit(parse_bill_pdf, portal, file_path)
+        future.add_done_callback(lambda done: self._store(done, run_id, portal, item_key, file_path))
+
+    def _store(self, future: Future, run_id: str, portal: str, item_key: str, file_path: str) -> None:
+        """
+        Write the result of one parse and update the counters.
+
+        Args:
+            future (Future): Finished parse.
+            run_id (str): Run the bill was downloaded in.
+            portal (str): "mp" or "mh".
+            item_key (str): IVRS number or consumer number.
+            file_path (str): Path of the bill.
+        """
+        try:
+            fields = future.result()
+        except Exception as e:
+            fields = {'parse_error': f"{type(e).__name__}: {e}", 'parse_ms': 0.0}
+        with self._lock:
+            if fields.get('parse_error'):
+                self.failed += 1
+            else:
+                self.parsed += 1
+            self.parse_seconds += fields['parse_ms'] / 1000
+        if fields.get('parse_error'):
+            logging.warning(f"Bill {file_path} parsed with errors: {fields['parse_error']}")
+        self.writer.write({'run_id': run_id, 'portal': portal, 'item_key': str(item_key), 'file_path': file_path,
+                           'parsed_at': datetime.utcnow(), **fields})
+
+    def get_metrics(self) -> Dict[str, float]:
+        """
+        Return the parser's throughput counters.
+
+        Returns:
+            Dict[str, float]: submitted, parsed, failed, backlog, bills_per_second and mean_parse_ms.
+        """
+        with self._lock:
+            finished = self.parsed + self.failed
+            elapsed = time.monotonic() - self.started_at
+            return {
+                'submitted': self.submitted,
+                'parsed': self.parsed,
+                'failed': self.failed,
+                'backlog': self.backlog,
+                'bills_per_second': finished / elapsed if elapsed else 0.0,
+                'mean_parse_ms': self.parse_seconds * 1000 / finished if finished else 0.0,
+            }
+
+    def close(self) -> None:
+        """Wait for queued parses, flush the bills writer and log the metrics."""
+        self.executor.shutdown(wait=True)
+        self.writer.close()
+        metrics = self.get_metrics()
+        logging.info(f"Bill parser: {metrics['parsed']} parsed, {metrics['failed']} with errors, "
+                     f"{metrics['bills_per_second']:.2f} bills/s, mean {metrics['mean_parse_ms']:.0f} ms.")
+        try:
+            write_parser_metrics(metrics)
+        except OSError as e:
+            logging.error(f"Failed to write bill parser metrics: {e}")
+
+
+def write_parser_metrics(metrics: Dict[str, float]) -> str:
+    """
+    Write the parser metrics as a Prometheus textfile, replacing the previous one atomically.
+
+    Args:
+        metrics (Dict[str, float]): Output of BillParseStage.get_metrics.
+
+    Returns:
+        str: Path of the written file.
+    """
+    lines = []
+    for name, value in sorted(metrics.items()):
+        lines.append(f"# TYPE bill_parser_{name} gauge")
+        lines.append(f'bill_parser_{name}{{pid="{os.getpid()}"}} {value}')
+    os.makedirs(PROMETHEUS_TEXTFILE_DIR, exist_ok=True)
+    path = os.path.join(PROMETHEUS_TEXTFILE_DIR, f"bill_parser_{os.getpid()}.prom")
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as file:
+        file.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+    return path
+
+
+_stages: Dict[int, BillParseStage] = {}
+_stages_lock = threading.Lock()
+
+
+def submit_bill_for_parsing(portal: str, item_key: str, file_path: str) -> None:
+    """
+    Queue a downloaded bill for parsing, starting this process's parser on first use.
+
+    Parsing must never fail a download, so errors are only logged.
+
+    Args:
+        portal (str): "mp" or "mh".
+        item_key (str): IVRS number or consumer number.
+        file_path (str): Path of the bill.
+    """
+    try:
+        with _stages_lock:
+            if os.getpid() not in _stages:
+                _stages[os.getpid()] = BillParseStage()
+            stage = _stages[os.getpid()]
+        stage.submit(portal, item_key, file_path)
+    except Exception as e:
+        logging.error(f"Failed to queue {file_path} for parsing: {e}")
+
+
+def close_bill_parser() -> None:
+    """Finish the parses of this process and stop its parser, if one was started."""
+    with _stages_lock:
+        stage = _stages.pop(os.getpid(), None)
+    if stage:
+        stage.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse a downloaded bill PDF.")
+    parser.add_argument("portal", choices=sorted(BILL_FIELD_PATTERNS))
+    parser.add_argument("file_path")
+    args = parser.parse_args()
+
+    for name, value in parse_bill_pdf(args.portal, args.file_path).items():
+        print(f"{name}: {value}")
@@ -0,0 +1,154 @@
+import os
+import errno
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import NamedTuple
+from bill_ledger import hash_file
+from config import BILL_STORE_DIR
+
+# Content-addressed bill storage.
+#
+# Every bill is stored once under its SHA-256 in BILL_STORE_DIR/blobs/<ab>/<hash>.pdf.
+# The human names (`IVRS-<no>.pdf`, `<name>_<number>.pdf`) are hardlinks to the
+# blob, replaced atomically when a newer bill arrives, so re-downloading an
+# unchanged bill costs no disk and checking whether a bill is new is a single
+# path lookup. Where hardlinks are impossible (another file system) the human
+# name falls back to a copy.
+
+
+class StoredBill(NamedTuple):
+    """Result of storing a bill."""
+    path: str
+    content_hash: str
+    is_new: bool
+
+
+def get_blob_path(content_hash: str) -> str:
+    """
+    Return the blob path of a content hash.
+
+    Args:
+        content_hash (str): SHA-256 hex digest.
+
+    Returns:
+        str: Path of the blob, sharded by the first two hex digits.
+    """
+    return os.path.join(BILL_STORE_DIR, "blobs", content_hash[:2], f"{content_hash}.pdf")
+
+
+def is_known_bill(content_hash: str) -> bool:
+    """
+    Check whether a bill with this content is already stored.
+
+    Args:
+        content_hash (str): SHA-256 hex digest.
+
+    Returns:
+        bool: True if the blob exists.
+    """
+    return os.path.exists(get_blob_path(content_hash))
+
+
+def link_human_name(blob_path: str, directory: str, file_name: str) -> str:
+    """
+    Point a human-readable name at a blob, replacing whatever it pointed at before.
+
+    Args:
+        blob_path (str): Blob to expose.
+        directory (str): Directory of the human name.
+        file_name (str): Human file name.
+
+    Returns:
+        str: Path of the human name.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, file_name)
+    # rename() leaves both names in place when they already share the inode
+    if os.path.exists(path) and os.path.samefile(path, blob_path):
+        return path
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.link"
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(blob_path, temp_path)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+        shutil.copyfile(blob_path, temp_path)
+    os.replace(temp_path, path)
+    return path
+
+
+def _place_blob(source_path: str, blob_path: str) -> None:
+    """
+    Move a file into the store as a blob.
+
+    Args:
+        source_path (str): File to move.
+        blob_path (str): Destination blob path.
+    """
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    try:
+        os.replace(source_path, blob_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(source_path, blob_path)
+
+
+def store_bill_file(source_path: str, directory: str, file_name: str) -> StoredBill:
+    """
+    Ingest a downloaded bill and expose it under its human name.
+
+    The downloaded file is consumed: it becomes the blob, or is deleted when the
+    same content is already stored.
+
+    Args:
+        source_path (str): Downloaded PDF.
+        directory (str): Directory of the human name.
+        file_name (str): Human file name.
+
+    Returns:
+        StoredBill: Path of the human name, content hash and whether the content was new.
+    """
+    content_hash = hash_file(source_path)
+    blob_path = get_blob_path(content_hash)
+    is_new = not os.path.exists(blob_path)
+    if is_new:
+        _place_blob(source_path, blob_path)
+    else:
+        os.remove(source_path)
+        logging.info(f"Bill {file_name} is unchanged; reusing stored blob {content_hash[:12]}.")
+    return StoredBill(link_human_name(blob_path, directory, file_name), content_hash, is_new)
+
+
+def store_bill_bytes(content: bytes, directory: str, file_name: str) -> StoredBill:
+    """
+    Ingest a bill held in memory and expose it under its human name.
+
+    Args:
+        content (bytes): PDF bytes.
+        directory (str): Directory of the human name.
+        file_name (str): Human file name.
+
+    Returns:
+        StoredBill: Path of the human name, content hash and whether the content was new.
+    """
+    content_hash = hashlib.sha256(content).hexdigest()
+    blob_path = get_blob_path(content_hash)
+    is_new = not os.path.exists(blob_path)
+    if is_new:
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                file.write(content)
+            os.replace(temp_path, blob_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    return StoredBill(link_human_name(blob_path, directory, file_name), content_hash, is_new)
@@ -0,0 +1,186 @@
+import os
+import logging
+from typing import Dict, List
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+# Browser profiles shared by both portals.
+#
+# The "performance" profile runs Chrome headless (new mode), trims background
+# features that cost memory and blocks URLs the bill flow never needs through
+# the DevTools protocol. Downloads keep working through Browser.setDownloadBehavior
+# and kiosk printing flags set by the portal stay in place, but headless Chrome
+# never completes a kiosk print, so MH captures its bills with Page.printToPDF.
+
+PERFORMANCE_ARGUMENTS = [
+    "--headless=new",
+    "--window-size=1366,900",
+    "--no-first-run",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-renderer-backgrounding",
+    "--disable-backgrounding-occluded-windows",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--renderer-process-limit=2",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,BackForwardCache,InterestFeedContentSuggestions",
+]
+
+_TRACKING_PATTERNS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*facebook.net*", "*hotjar.com*",
+]
+_FONT_PATTERNS = ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*fonts.googleapis.com*", "*fonts.gstatic.com*"]
+_IMAGE_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp", "*.mp4"]
+
+# The MH login needs its captcha image, so images are only blocked on MP
+BLOCKED_URL_PATTERNS: Dict[str, List[str]] = {
+    "mp": _TRACKING_PATTERNS + _FONT_PATTERNS + _IMAGE_PATTERNS,
+    "mh": _TRACKING_PATTERNS + _FONT_PATTERNS,
+}
+
+
+def is_headless(profile: str) -> bool:
+    """
+    Check whether a browser profile runs Chrome headless.
+
+    Args:
+        profile (str): "standard" or "performance".
+
+    Returns:
+        bool: True for headless profiles.
+    """
+    return profile == "performance"
+
+
+def apply_browser_profile(options: Options, portal: str, profile: str) -> Options:
+    """
+    Add the launch arguments and preferences of a browser profile.
+
+    Args:
+        options (Options): Chrome options already configured by the portal.
+        portal (str): "mp" or "mh".
+        profile (str): "standard" or "performance".
+
+    Returns:
+        Options: The same options instance.
+    """
+    if profile != "performance":
+        return options
+    for argument in PERFORMANCE_ARGUMENTS:
+        options.add_argument(argument)
+    prefs = options.experimental_options.setdefault("prefs", {})
+    if portal == "mp":
+        prefs["profile.managed_default_content_settings.images"] = 2
+    return options
+
+
+def prepare_browser(driver: webdriver.Chrome, portal: str, profile: str, download_path: str) -> None:
+    """
+    Apply the runtime part of a browser profile to a freshly started driver.
+
+    Args:
+        driver (webdriver.Chrome): WebDriver instance.
+        portal (str): "mp" or "mh".
+        profile (str): "standard" or "performance".
+        download_path (str): Directory downloads must land in.
+    """
+    if profile != "performance":
+        driver.maximize_window()
+        return
+    driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+        "behavior": "allow",
+        "downloadPath": os.path.abspath(download_path),
+        "eventsEnabled": True,
+    })
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS[portal]})
+    logging.info(f"Performance profile active for {portal}: headless, "
+                 f"{len(BLOCKED_URL_PATTERNS[portal])} URL patterns blocked.")
+
+
+def measure_page_load(driver: webdriver.Chrome) -> float:
+    """
+    Return how long the current page took to load according to Navigation Timing.
+
+    Args:
+        driver (webdriver.Chrome): WebDriver instance.
+
+    Returns:
+        float: Load duration in seconds, or 0.0 if the browser does not report it.
+    """
+    duration = driver.execute_script(
+        "const entry = performance.getEntriesByType('navigation')[0];"
+        "return entry ? entry.duration : 0;"
+    )
+    return (duration or 0) / 1000
+
+
+def _child_pids(parent_pid: int) -> List[int]:
+    """
+    List all descendant processes of a process using /proc.
+
+    Args:
+        parent_pid (int): Root process id.
+
+    Returns:
+        List[int]: Descendant process ids.
+    """
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as file:
+                # The command name may contain spaces; fields after ')' are fixed
+                fields = file.read().rsplit(')', 1)[1].split()
+            parents.setdefault(int(fields[1]), []).append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    descendants = []
+    pending = [parent_pid]
+    while pending:
+        children = parents.get(pending.pop(), [])
+        descendants.extend(children)
+        pending.extend(children)
+    return descendants
+
+
+def browser_rss_bytes(driver: webdriver.Chrome) -> int:
+    """
+    Return the resident memory of a driver's chromedriver and Chrome processes.
+
+    Args:
+        driver (webdriver.Chrome): WebDriver instance.
+
+    Returns:
+        int: Total RSS in bytes, or 0 where /proc is unavailable.
+    """
+    if not os.path.isdir('/proc'):
+        return 0
+    root_pid = driver.service.process.pid
+    total = 0
+    for pid in [root_pid] + _child_pids(root_pid):
+        try:
+            with open(f'/proc/{pid}/statm') as file:
+                total += int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def log_browser_footprint(driver: webdriver.Chrome, portal: str) -> None:
+    """
+    Log the memory a browser uses, typically right before it is closed.
+
+    Args:
+        driver (webdriver.Chrome): WebDriver instance.
+        portal (str): "mp" or "mh".
+    """
+    try:
+        logging.info(f"{portal.upper()} browser RSS: {browser_rss_bytes(driver) / (1024 * 1024):.0f} MB")
+    except Exception as e:
+        logging.debug(f"Could not measure browser RSS: {e}")
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from selenium import webdriver
+from stage_timing import get_item_context, quantile
+from config import WEBDRIVER_COMMAND_PROFILER
+
+# Opt-in WebDriver command profiler.
+#
+# Every find_element, click, execute_script, switch_to or page_source call is
+# one HTTP request to chromedriver. When WEBDRIVER_COMMAND_PROFILER is set, the
+# browsers started by launch_browser and initialize_chrome_driver route every
+# command through a wrapper that records the command, the repo function that
+# issued it (e.g. click_on_element), its latency and request/response size, and
+# the bill being processed. log_command_profile() prints a per-call-site table
+# and the command count per bill at the end of the run.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames of these files are never reported as the call site.
+_SKIPPED_FILES = {os.path.abspath(__file__), os.path.join(REPO_DIR, "stage_timing.py")}
+# Bills listed individually in the report, most commands first.
+REPORTED_BILLS = 20
+
+_lock = threading.Lock()
+# (call site, command) -> [latencies in seconds], bytes sent, bytes received
+_site_latencies: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+_site_bytes: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0])
+# (portal, item id) -> [commands, seconds]
+_bill_commands: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0, 0.0])
+
+
+def get_call_site() -> str:
+    """
+    Return the innermost repo function on the current stack outside the profiler.
+
+    Returns:
+        str: "<module>.<function>", or "<external>" when no repo frame is found.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        file_name = os.path.abspath(frame.f_code.co_filename)
+        if file_name.startswith(REPO_DIR) and file_name not in _SKIPPED_FILES:
+            module = os.path.splitext(os.path.basename(file_name))[0]
+            # co_qualname (with the class name) exists from Python 3.11 on
+            name = getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)
+            return f"{module}.{name}"
+        frame = frame.f_back
+    return "<external>"
+
+
+def _payload_size(payload: Any) -> int:
+    """Return the JSON size of a command's parameters or response value."""
+    if payload is None:
+        return 0
+    try:
+        return len(json.dumps(payload, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def record_command(call_site: str, command: str, duration: float, sent: int, received: int) -> None:
+    """
+    Record one WebDriver command.
+
+    Args:
+        call_site (str): Repo function that issued the command.
+        command (str): WebDriver command name, e.g. "findElement".
+        duration (float): Round-trip time in seconds.
+        sent (int): Request parameter size in bytes.
+        received (int): Response value size in bytes.
+    """
+    context = get_item_context()
+    with _lock:
+        _site_latencies[(call_site, command)].append(duration)
+        sizes = _site_bytes[(call_site, command)]
+        sizes[0] += sent
+        sizes[1] += received
+        bill = _bill_commands[(context['portal'], context['item_id'])]
+        bill[0] += 1
+        bill[1] += duration
+
+
+def install_command_profiler(driver: webdriver.Chrome, force: bool = False) -> webdriver.Chrome:
+    """
+    Route a driver's commands through the profiler when profiling is enabled.
+
+    Element, switch_to and alert commands all go through driver.execute, so
+    wrapping it on the instance covers every round trip.
+
+    Args:
+        driver (webdriver.Chrome): WebDriver instance.
+        force (bool): Install even when WEBDRIVER_COMMAND_PROFILER is off.
+
+    Returns:
+        webdriver.Chrome: The same driver.
+    """
+    if not (WEBDRIVER_COMMAND_PROFILER or force) or getattr(driver, 'command_profiler_installed', False):
+        return driver
+    execute = driver.execute
+
+    def profiled_execute(driver_command: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        call_site = get_call_site()
+        start_time = time.perf_counter()
+        response = None
+        try:
+            response = execute(driver_command, params)
+            return response
+        finally:
+            received = _payload_size(response.get('value')) if isinstance(response, dict) else 0
+            record_command(call_site, driver_command, time.perf_counter() - start_time,
+                           _payload_size(params), received)
+
+    driver.execute = profiled_execute
+    driver.command_profiler_installed = True
+    logging.info("WebDriver command profiler installed.")
+    return driver
+
+
+def reset_command_profile() -> None:
+    """Discard every recorded command."""
+    with _lock:
+        _site_latencies.clear()
+        _site_bytes.clear()
+        _bill_commands.clear()
+
+
+def format_command_profile() -> str:
+    """
+    Format the recorded commands as a per-call-site table and a per-bill summary.
+
+    Returns:
+        str: Plain-text report, or an empty string when nothing was recorded.
+    """
+    with _lock:
+        # quantile() expects ascending values
+        latencies = {key: sorted(values) for key, values in _site_latencies.items()}
+        sizes = {key: list(values) for key, values in _site_bytes.items()}
+        bills = {key: list(values) for key, values in _bill_commands.items() if key[1]}
+    if not latencies:
+        return ""
+
+    lines = [f"{'call site':<50} {'command':<24} {'calls':>6} {'total s':>8} {'mean ms':>8} "
+             f"{'p95 ms':>8} {'sent KB':>8} {'recv KB':>8}"]
+    for key, values in sorted(latencies.items(), key=lambda item: -sum(item[1])):
+        call_site, command = key
+        sent, received = sizes[key]
+        lines.append(
+            f"{call_site:<50} {command:<24} {len(values):>6} {sum(values):>8.2f} "
+            f"{sum(values) / len(values) * 1000:>8.1f} {quantile(values, 0.95) * 1000:>8.1f} "
+            f"{sent / 1024:>8.1f} {received / 1024:>8.1f}"
+        )
+
+    if bills:
+        counts = sorted(commands for commands, _ in bills.values())
+        seconds = [duration for _, duration in bills.values()]
+        lines.append("")
+        lines.append(
+            f"{len(bills)} bills: {sum(counts) / len(counts):.1f} commands per bill "
+            f"(p50 {quantile(counts, 0.5):.0f}, p95 {quantile(counts, 0.95):.0f}, max {max(counts):.0f}), "
+            f"{sum(seconds) / len(seconds):.2f}s in WebDriver per bill."
+        )
+        lines.append(f"{'portal':<7} {'item':<24} {'commands':>8} {'seconds':>8}")
+        ranked = sorted(bills.items(), key=lambda item: -item[1][0])[:REPORTED_BILLS]
+        for (portal, item_id), (commands, duration) in ranked:
+            lines.append(f"{portal:<7} {item_id:<24} {commands:>8.0f} {duration:>8.2f}")
+    return "\n".join(lines)
+
+
+def log_command_profile() -> None:
+    """
+    Log the command profile of this process, if any command was recorded.
+    """
+    report = format_command_profile()
+    if report:
+        logging.info(f"WebDriver command profile (pid {os.getpid()}):\n{report}")
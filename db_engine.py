@@ -0,0 +1,163 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import create_engine, Table
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.sql.expression import Executable
+from config import (DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_WRITER_BATCH_SIZE,
+                    DB_WRITER_FLUSH_MS, DB_WRITER_QUEUE_SIZE)
+
+# Process-wide database access.
+#
+# get_engine hands out one pooled engine per database URL and process, so every
+# module shares its connections; engines are never inherited across a fork.
+# BatchedTableWriter moves inserts off the bill hot path: rows are queued and a
+# background thread inserts them in batches.
+
+_engines: Dict[Tuple[int, str], Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(database_url: str = DATABASE_URL) -> Engine:
+    """
+    Return the shared engine of a database, creating it on first use in this process.
+
+    Server databases get a QueuePool of DB_POOL_SIZE connections (plus
+    DB_MAX_OVERFLOW) that are pinged before use and recycled after
+    DB_POOL_RECYCLE seconds, so idle connections dropped by the server or a
+    firewall are replaced instead of failing a bill.
+
+    Args:
+        database_url (str): SQLAlchemy database URL.
+
+    Returns:
+        Engine: The process-wide engine of that URL.
+    """
+    key = (os.getpid(), database_url)
+    with _engines_lock:
+        if key not in _engines:
+            options: Dict[str, Any] = {'pool_pre_ping': True}
+            if make_url(database_url).get_backend_name() == "sqlite":
+                # Work streams are read by several lane threads, one at a time under a lock
+                options['connect_args'] = {'check_same_thread': False}
+            else:
+                options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_recycle=DB_POOL_RECYCLE)
+            _engines[key] = create_engine(database_url, **options)
+        return _engines[key]
+
+
+class BatchedTableWriter:
+    """
+    Inserts rows into a table from a background thread, in batches.
+
+    write() never blocks on the database: rows are queued and inserted every
+    batch_size rows or flush_ms milliseconds, whichever comes first, with one
+    executemany per batch (a multi-row INSERT ... VALUES on PostgreSQL/psycopg2).
+    When the queue is full, rows are dropped with a warning rather than stalling
+    the caller.
+    """
+
+    def __init__(self, engine: Engine, table: Table, batch_size: int = DB_WRITER_BATCH_SIZE,
+                 flush_ms: int = DB_WRITER_FLUSH_MS, queue_size: int = DB_WRITER_QUEUE_SIZE,
+                 statement: Optional[Executable] = None):
+        """
+        Start the writer thread.
+
+        Args:
+            engine (Engine): SQLAlchemy engine instance.
+            table (Table): Table the rows are inserted into.
+            batch_size (int): Rows per INSERT.
+            flush_ms (int): Longest time a queued row waits before it is inserted.
+            queue_size (int): Rows that may be waiting before new ones are dropped.
+            statement (Optional[Executable]): Statement each batch is executed with, e.g. an upsert;
+                defaults to a plain INSERT into the table.
+        """
+        self.engine = engine
+        self.table = table
+        self.statement = statement if statement is not None else table.insert()
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stop = object()
+        self._thread = threading.Thread(target=self._run, name=f"{table.name}-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, row: Dict[str, Any]) -> None:
+        """
+        Queue a row for insertion.
+
+        Args:
+            row (Dict[str, Any]): Column values.
+        """
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            logging.warning(f"{self.table.name} writer queue is full; dropping a row.")
+
+    def close(self, timeout: float = 10) -> None:
+        """
+        Insert the rows still queued and stop the writer thread.
+
+        Args:
+            timeout (float): Seconds to wait for the final flush.
+        """
+        if self._thread.is_alive():
+            self._queue.put(self._stop)
+            self._thread.join(timeout)
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Insert one batch, logging instead of raising on failure.
+
+        Args:
+            rows (List[Dict[str, Any]]): Rows of the batch.
+        """
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(self.statement, rows)
+        except Exception as e:
+            logging.error(f"Failed to insert {len(rows)} rows into {self.table.name}: {e}")
+
+    def _run(self) -> None:
+        """Collect rows into batches and insert them until close() is called."""
+        rows: List[Dict[str, Any]] = []
+        deadline: Optional[float] = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+            if row is self._stop:
+                if rows:
+                    self._insert(rows)
+                return
+            if row is not None:
+                rows.append(row)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if rows and (len(rows) >= self.batch_size or time.monotonic() >= deadline):
+                self._insert(rows)
+                rows = []
+                deadline = None
+
+
+def close_on_exit(writer: BatchedTableWriter) -> BatchedTableWriter:
+    """
+    Flush a writer when the interpreter exits normally.
+
+    Worker processes of a ProcessPoolExecutor skip atexit handlers, so they must
+    call close() themselves.
+
+    Args:
+        writer (BatchedTableWriter): Writer to close.
+
+    Returns:
+        BatchedTableWriter: The same writer.
+    """
+    atexit.register(writer.close)
+    return writer
@@ -0,0 +1,174 @@
+import time
+import logging
+from typing import Any, Dict, List, NamedTuple, Type, TypeVar
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, JavascriptException
+from wait_engine import record_wait
+
+# Single-round-trip page extraction.
+#
+# A page's named fields (consumer details, grid rows, error banners, ...) are
+# read by one execute_async_script call that polls the DOM in the page itself
+# until every required field is present, instead of one WebDriverWait per field
+# where each poll is several WebDriver round trips. Field values are the trimmed
+# text of the first visible match ("text"), the texts of all visible matches
+# ("texts"), the cell texts of every visible row ("rows") or whether a visible
+# match exists ("exists").
+
+R = TypeVar("R", bound=tuple)
+
+POLL_INTERVAL_MS = 100
+# Seconds the script timeout is kept above the in-page timeout so the page, not
+# chromedriver, decides when the wait is over.
+SCRIPT_TIMEOUT_MARGIN = 5
+
+EXTRACT_SCRIPT = """
+var fields = arguments[0], timeoutMs = arguments[1], pollMs = arguments[2];
+var done = arguments[arguments.length - 1];
+var started = Date.now();
+
+function visible(node) {
+  return !!(node.offsetWidth || node.offsetHeight || (node.getClientRects && node.getClientRects().length));
+}
+function text(node) {
+  return (node.innerText || node.textContent || '').trim();
+}
+function matches(xpath) {
+  var snapshot = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+  var found = [];
+  for (var i = 0; i < snapshot.snapshotLength; i++) {
+    if (visible(snapshot.snapshotItem(i))) { found.push(snapshot.snapshotItem(i)); }
+  }
+  return found;
+}
+function read(spec) {
+  var found = matches(spec.xpath);
+  if (spec.kind === 'texts') { return found.map(text).filter(Boolean); }
+  if (spec.kind === 'rows') {
+    return found.map(function (row) { return Array.prototype.map.call(row.cells || row.children, text); });
+  }
+  if (spec.kind === 'exists') { return found.length > 0; }
+  return found.length ? text(found[0]) : '';
+}
+function isEmpty(value) {
+  return Array.isArray(value) ? value.length === 0 : !value;
+}
+function poll() {
+  var values = {}, missing = [], ended = false;
+  try {
+    Object.keys(fields).forEach(function (name) {
+      var value = read(fields[name]);
+      values[name] = value;
+      if (isEmpty(value)) {
+        if (fields[name].required) { missing.push(name); }
+      } else if (fields[name].ends_wait) {
+        ended = true;
+      }
+    });
+  } catch (e) {
+    missing = Object.keys(fields).filter(function (name) { return fields[name].required; });
+  }
+  if (!missing.length || ended || Date.now() - started >= timeoutMs) {
+    done({values: values, missing: missing});
+  } else {
+    setTimeout(poll, pollMs);
+  }
+}
+poll();
+"""
+
+
+class FieldSpec(NamedTuple):
+    """How to read one named field of a page."""
+    xpath: str
+    kind: str = "text"
+    required: bool = True
+    # A non-empty value ends the wait early, e.g. an error banner.
+    ends_wait: bool = False
+
+
+class Extraction(NamedTuple):
+    """Values read from a page and the required fields that were still missing."""
+    values: Dict[str, Any]
+    missing: List[str]
+
+
+def _empty_value(kind: str) -> Any:
+    return [] if kind in ("texts", "rows") else False if kind == "exists" else ""
+
+
+def _ensure_script_timeout(driver: webdriver.Chrome, timeout: float) -> None:
+    """Raise the driver's script timeout once so it outlasts the in-page wait."""
+    required = timeout + SCRIPT_TIMEOUT_MARGIN
+    if getattr(driver, 'extraction_script_timeout', 0) < required:
+        driver.set_script_timeout(required)
+        driver.extraction_script_timeout = required
+
+
+def extract_fields(driver: webdriver.Chrome, fields: Dict[str, FieldSpec], timeout: float, label: str,
+                   raise_on_timeout: bool = True) -> Extraction:
+    """
+    Read a set of named fields in one round trip, waiting in the page until they are present.
+
+    The call is re-issued only when the page navigates away mid-wait.
+
+    Args:
+        driver (webdriver.Chrome): WebDriver instance.
+        fields (Dict[str, FieldSpec]): Fields to read, by name.
+        timeout (float): Maximum time to wait for the required fields in seconds.
+        label (str): Name under which the wait duration is recorded.
+        raise_on_timeout (bool): Raise TimeoutException when required fields are still missing
+            (and no field ended the wait) instead of returning them in `missing`.
+
+    Returns:
+        Extraction: Field values, with an empty value for every field not found, and the missing fields.
+
+    Raises:
+        TimeoutException: If required fields are missing and raise_on_timeout is True.
+    """
+    specs = {name: spec._asdict() for name, spec in fields.items()}
+    start_time = time.monotonic()
+    result = None
+    try:
+        _ensure_script_timeout(driver, timeout)
+        while result is None:
+            remaining = timeout - (time.monotonic() - start_time)
+            try:
+                result = driver.execute_async_script(EXTRACT_SCRIPT, specs, max(remaining, 0) * 1000,
+                                                     POLL_INTERVAL_MS)
+            except JavascriptException as e:
+                # The document was replaced while the script waited; read the new one.
+                if remaining <= 0:
+                    raise
+                logging.debug(f"Extraction '{label}' restarted: {e}")
+    finally:
+        record_wait(label, time.monotonic() - start_time)
+
+    values = {name: result['values'].get(name, _empty_value(spec.kind)) for name, spec in fields.items()}
+    missing = list(result['missing'])
+    ended = any(spec.ends_wait and values[name] for name, spec in fields.items())
+    if missing and not ended and raise_on_timeout:
+        raise TimeoutException(f"Extraction '{label}' timed out waiting for {', '.join(missing)}.")
+    return Extraction(values, missing)
+
+
+def extract_record(driver: webdriver.Chrome, record_type: Type[R], fields: Dict[str, FieldSpec],
+                   timeout: float, label: str, raise_on_timeout: bool = True) -> R:
+    """
+    Read a page into a typed record in one round trip.
+
+    Args:
+        driver (webdriver.Chrome): WebDriver instance.
+        record_type (Type[R]): NamedTuple whose field names are the keys of `fields`.
+        fields (Dict[str, FieldSpec]): Fields to read, by name.
+        timeout (float): Maximum time to wait for the required fields in seconds.
+        label (str): Name under which the wait duration is recorded.
+        raise_on_timeout (bool): Raise TimeoutException when required fields are still missing.
+
+    Returns:
+        R: The record, with empty values for fields not found.
+
+    Raises:
+        TimeoutException: If required fields are missing and raise_on_timeout is True.
+    """
+    return record_type(**extract_fields(driver, fields, timeout, label, raise_on_timeout).values)
@@ -0,0 +1,327 @@
+import os
+import sys
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from wait_engine import DOWNLOAD_TEMP_SUFFIXES, wait_until, download_completed, record_wait
+
+# inotify based download watcher. Finished downloads are streamed from kernel
+# events instead of scanning the download directory, so resolving a bill costs
+# the same however many PDFs the directory already holds.
+#
+# Every download is tied to the moment its first file appeared (Chrome's
+# "Unconfirmed" temporary, followed through its renames), and a claim only
+# accepts downloads that started after its own click. A bill that finishes
+# after its item's claim timed out therefore never resolves the next item's
+# claim; it is moved to the directory's quarantine folder instead.
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+# Finished downloads nobody claimed are forgotten after this many seconds
+UNCLAIMED_RETENTION = 600
+# Subdirectory that downloads started before every pending claim are moved into
+QUARANTINE_DIR = "quarantine"
+# Bound on the start times and rename cookies kept for events that never complete
+MAX_TRACKED_EVENTS = 1024
+
+
+class DownloadWatcher:
+    """
+    Stream create, close-write and rename events of one download directory.
+
+    A finished download is a `.pdf` that was closed after writing or renamed into
+    place (Chrome renames `.crdownload` temporaries when they complete). Renames
+    of an already finished PDF, such as the renaming of a bill after download,
+    are ignored. Each finished download carries the time its first file was
+    created, so it can be matched to the click that started it.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Start watching a directory.
+
+        Args:
+            directory (str): Download directory to watch.
+
+        Raises:
+            OSError: If inotify is unavailable or the directory cannot be watched.
+        """
+        self.directory = directory
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        if self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, f"{os.strerror(error)}: {directory}")
+
+        self.started_at = time.time()
+        # (finished at, started at, path) of downloads not claimed yet
+        self._completed = deque()
+        self._renamed_cookies = set()
+        # Start time per file name in progress and per rename cookie in flight
+        self._started: Dict[str, float] = {}
+        self._moving: Dict[int, float] = {}
+        # `since` of every claim currently waiting
+        self._claims: List[float] = []
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"download-watcher:{directory}", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """
+        Read and dispatch inotify events until the watcher is closed.
+        """
+        while self._running:
+            try:
+                readable, _, _ = select.select([self._fd], [], [], 0.5)
+                if not readable:
+                    continue
+                data = os.read(self._fd, 64 * 1024)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EINTR):
+                    continue
+                if self._running:
+                    logging.error(f"Download watcher for {self.directory} stopped: {e}")
+                return
+            self._dispatch(data)
+
+    def _dispatch(self, data: bytes) -> None:
+        """
+        Parse a buffer of inotify events and record finished downloads.
+
+        Args:
+            data (bytes): Raw bytes read from the inotify file descriptor.
+        """
+        offset = 0
+        while offset < len(data):
+            _wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b'\0'))
+            offset += _EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                logging.warning(f"Download watcher for {self.directory} overflowed; events were lost.")
+                continue
+            if not name:
+                continue
+            now = time.time()
+            temporary = name.endswith(DOWNLOAD_TEMP_SUFFIXES)
+            if len(self._started) > MAX_TRACKED_EVENTS:
+                self._started.clear()
+            if len(self._moving) > MAX_TRACKED_EVENTS:
+                self._moving.clear()
+            if mask & IN_CREATE:
+                logging.debug(f"Download started: {name}")
+                self._started[name] = now
+                continue
+            if mask & IN_MOVED_FROM:
+                if temporary:
+                    # A download in progress is renamed; its start time follows the cookie
+                    self._moving[cookie] = self._started.pop(name, now)
+                    continue
+                # A finished file being renamed (e.g. to IVRS-<no>.pdf) is not a new download
+                if len(self._renamed_cookies) > MAX_TRACKED_EVENTS:
+                    self._renamed_cookies.clear()
+                self._renamed_cookies.add(cookie)
+                continue
+            if mask & IN_MOVED_TO:
+                if cookie in self._renamed_cookies:
+                    self._renamed_cookies.discard(cookie)
+                    continue
+                started_at = self._moving.pop(cookie, now)
+                if temporary:
+                    self._started[name] = started_at
+                elif name.endswith('.pdf'):
+                    self._add_completed(os.path.join(self.directory, name), started_at)
+                continue
+            if not temporary and name.endswith('.pdf') and mask & IN_CLOSE_WRITE:
+                self._add_completed(os.path.join(self.directory, name), self._started.pop(name, now))
+
+    def _add_completed(self, path: str, started_at: float) -> None:
+        """
+        Record a finished download and wake up waiting claimers.
+
+        Args:
+            path (str): Path of the finished PDF.
+            started_at (float): Epoch timestamp at which the download's first file appeared.
+        """
+        try:
+            if os.path.getsize(path) == 0:
+                # Placeholder created before the real content is renamed into place
+                return
+        except OSError:
+            return
+        now = time.time()
+        with self._condition:
+            if any(entry_path == path for _, _, entry_path in self._completed):
+                return
+            while self._completed and now - self._completed[0][0] > UNCLAIMED_RETENTION:
+                self._completed.popleft()
+            self._completed.append((now, started_at, path))
+            self._condition.notify_all()
+        logging.debug(f"Download finished: {path}")
+
+    def _quarantine_stale(self) -> None:
+        """
+        Move aside finished downloads that started before every pending claim.
+
+        Such a file belongs to an attempt whose claim already timed out; handing
+        it to a later claim would store one consumer's bill under another's name.
+        Called with the condition held.
+        """
+        if not self._claims:
+            return
+        oldest_claim = min(self._claims)
+        for entry in [entry for entry in self._completed if entry[1] < oldest_claim]:
+            self._completed.remove(entry)
+            path = entry[2]
+            quarantine_dir = os.path.join(self.directory, QUARANTINE_DIR)
+            try:
+                os.makedirs(quarantine_dir, exist_ok=True)
+                os.replace(path, os.path.join(quarantine_dir, os.path.basename(path)))
+                logging.warning(f"Quarantined late download {path}: it started before the pending request.")
+            except OSError as e:
+                logging.warning(f"Failed to quarantine late download {path}: {e}")
+
+    def claim(self, key: str, since: float, timeout: float) -> Optional[str]:
+        """
+        Return the oldest unclaimed download that started at or after `since`.
+
+        Each finished download is handed out once, so concurrent requests in the
+        same directory each resolve their own file. Downloads that started before
+        every pending request are quarantined instead of being handed out.
+
+        Args:
+            key (str): IVRS number or consumer the download belongs to, used for logging.
+            since (float): Epoch timestamp taken just before the download was triggered.
+            timeout (float): Maximum time to wait in seconds.
+
+        Returns:
+            Optional[str]: Path of the downloaded file, or None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._claims.append(since)
+            try:
+                while True:
+                    self._quarantine_stale()
+                    for entry in self._completed:
+                        _, started_at, path = entry
+                        if started_at >= since and os.path.exists(path):
+                            self._completed.remove(entry)
+                            logging.info(f"Resolved download for {key}: {path}")
+                            return path
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        logging.warning(f"No download for {key} within {timeout}s; a late file will be quarantined.")
+                        return None
+                    self._condition.wait(remaining)
+            finally:
+                self._claims.remove(since)
+
+    def close(self) -> None:
+        """
+        Stop the event thread and release the inotify descriptor.
+        """
+        self._running = False
+        self._thread.join(timeout=1)
+        os.close(self._fd)
+
+
+_watchers: Dict[Tuple[int, str], Optional[DownloadWatcher]] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_download_watcher(directory: str) -> Optional[DownloadWatcher]:
+    """
+    Return the watcher of a directory, starting it on first use.
+
+    Watchers are kept per process. Call this before triggering a download so the
+    watcher sees its events.
+
+    Args:
+        directory (str): Download directory to watch.
+
+    Returns:
+        Optional[DownloadWatcher]: The watcher, or None where inotify is unavailable.
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    key = (os.getpid(), os.path.abspath(directory))
+    with _watchers_lock:
+        if key not in _watchers:
+            try:
+                _watchers[key] = DownloadWatcher(key[1])
+            except OSError as e:
+                logging.warning(f"inotify unavailable for {directory}, falling back to polling: {e}")
+                _watchers[key] = None
+        return _watchers[key]
+
+
+def close_download_watcher(directory: str) -> None:
+    """
+    Close this process's watchers of a directory and of every directory below it.
+
+    Call before a staging directory is removed, so its event thread and inotify
+    descriptor do not outlive it.
+
+    Args:
+        directory (str): Download directory, or a parent of several.
+    """
+    root = os.path.abspath(directory)
+    pid = os.getpid()
+    with _watchers_lock:
+        keys = [key for key in _watchers
+                if key[0] == pid and (key[1] == root or key[1].startswith(root + os.sep))]
+        watchers = [_watchers.pop(key) for key in keys]
+    for watcher in watchers:
+        if watcher is not None:
+            watcher.close()
+
+
+def wait_for_download(directory: str, key: str, since: float, timeout: float, label: str) -> Optional[str]:
+    """
+    Wait for the download triggered at `since` and return its path.
+
+    Uses the directory's inotify watcher when it was running before the download
+    started and falls back to polling the directory otherwise.
+
+    Args:
+        directory (str): Download directory.
+        key (str): IVRS number or consumer the download belongs to.
+        since (float): Epoch timestamp taken just before the download was triggered.
+        timeout (float): Maximum time to wait in seconds.
+        label (str): Name under which the wait duration is recorded.
+
+    Returns:
+        Optional[str]: Path of the downloaded file, or None on timeout.
+    """
+    watcher = get_download_watcher(directory)
+    if watcher is None or watcher.started_at > since:
+        return wait_until(directory, download_completed(directory, since), timeout, label,
+                          raise_on_timeout=False)
+
+    start_time = time.monotonic()
+    try:
+        return watcher.claim(key, since, timeout)
+    finally:
+        record_wait(label, time.monotonic() - start_time)
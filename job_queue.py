@@ -0,0 +1,469 @@
+import os
+import time
+import uuid
+import socket
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import (Table, Column, Integer, String, DateTime, MetaData, UniqueConstraint, Index,
+                        select, func, and_, or_)
+from sqlalchemy.engine import Engine
+from bill_ledger import current_billing_period, close_ledger_writer
+from bill_outcomes import close_outcome_writer
+from bill_parser import close_bill_parser
+from work_source import WorkFilter, iter_ivrs_batches, iter_mh_credential_batches, iter_work_items, credential_key
+from config import DATABASE_URL, JOB_BATCH_SIZE, JOB_LEASE_SECONDS, JOB_MAX_LEASES, JOB_POLL_INTERVAL
+
+# Lease-based job table shared by every host of a bill run.
+#
+# `enqueue` adds one pending job per IVRS number / MH account still due for the
+# billing period. Workers on any host claim small batches with a single UPDATE
+# (rows picked with FOR UPDATE SKIP LOCKED on PostgreSQL; SQLite serializes
+# writers itself) and extend their leases from a heartbeat thread. A job whose
+# lease expires, because its host died, returns to the pool; after JOB_MAX_LEASES
+# leases it is marked failed. Lease times come from each host's clock, so hosts
+# are expected to run NTP.
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+job_metadata = MetaData()
+job_table = Table(
+    'bill_jobs', job_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('portal', String(8), nullable=False),
+    Column('item_key', String, nullable=False),
+    Column('billing_period', String(16), nullable=False),
+    Column('status', String(16), nullable=False, default=PENDING),
+    Column('leases', Integer, nullable=False, default=0),
+    Column('lease_owner', String),
+    Column('lease_token', String(32)),
+    Column('lease_expires_at', DateTime),
+    Column('last_error', String),
+    Column('updated_at', DateTime, nullable=False),
+    UniqueConstraint('portal', 'item_key', 'billing_period', name='uq_bill_jobs_portal_item_period'),
+    Index('ix_bill_jobs_claim', 'portal', 'billing_period', 'status', 'id'),
+)
+
+
+def ensure_job_table(engine: Engine) -> None:
+    """
+    Create the bill_jobs table if it does not exist yet.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+    """
+    job_metadata.create_all(engine, tables=[job_table], checkfirst=True)
+
+
+def get_worker_owner() -> str:
+    """
+    Return the lease owner name of this process.
+
+    Returns:
+        str: Host name and process id.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _insert_ignoring_duplicates(engine: Engine):
+    """
+    Build an INSERT on bill_jobs that skips jobs already enqueued.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+
+    Returns:
+        Insert: Dialect-specific insert statement.
+
+    Raises:
+        NotImplementedError: If the database is neither PostgreSQL nor SQLite.
+    """
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(job_table).on_conflict_do_nothing()
+    if engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(job_table).on_conflict_do_nothing()
+    raise NotImplementedError(f"The job queue does not support the {engine.dialect.name} dialect.")
+
+
+def enqueue_jobs(engine: Engine, portal: str, item_keys: Iterable[str],
+                 billing_period: Optional[str] = None, batch_size: int = 1000) -> None:
+    """
+    Add pending jobs for items, leaving jobs that already exist untouched.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        portal (str): "mp" or "mh".
+        item_keys (Iterable[str]): IVRS numbers or account ids.
+        billing_period (Optional[str]): Billing period; defaults to the current one.
+        batch_size (int): Rows per INSERT.
+    """
+    billing_period = billing_period or current_billing_period()
+    statement = _insert_ignoring_duplicates(engine)
+    now = datetime.utcnow()
+    rows = []
+    total = 0
+
+    def flush() -> None:
+        with engine.begin() as connection:
+            connection.execute(statement, rows)
+        rows.clear()
+
+    for item_key in item_keys:
+        rows.append({'portal': portal, 'item_key': str(item_key), 'billing_period': billing_period,
+                     'status': PENDING, 'leases': 0, 'updated_at': now})
+        total += 1
+        if len(rows) >= batch_size:
+            flush()
+    if rows:
+        flush()
+    logging.info(f"Enqueued up to {total} {portal} jobs for billing period {billing_period}.")
+
+
+def claim_jobs(engine: Engine, portal: str, owner: str, batch_size: int = JOB_BATCH_SIZE,
+               lease_seconds: int = JOB_LEASE_SECONDS, billing_period: Optional[str] = None) -> List[str]:
+    """
+    Atomically lease a batch of pending or expired jobs.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        portal (str): "mp" or "mh".
+        owner (str): Lease owner, see get_worker_owner.
+        batch_size (int): Maximum number of jobs to lease.
+        lease_seconds (int): Lease duration before the jobs return to the pool.
+        billing_period (Optional[str]): Billing period; defaults to the current one.
+
+    Returns:
+        List[str]: Item keys of the leased jobs, possibly empty.
+    """
+    billing_period = billing_period or current_billing_period()
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    in_run = and_(job_table.c.portal == portal, job_table.c.billing_period == billing_period)
+    expired = and_(job_table.c.status == LEASED, job_table.c.lease_expires_at < now)
+
+    claimable = (
+        select(job_table.c.id)
+        .where(and_(in_run, job_table.c.leases < JOB_MAX_LEASES, or_(job_table.c.status == PENDING, expired)))
+        .order_by(job_table.c.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    with engine.begin() as connection:
+        # Jobs whose hosts died too often are given up on
+        connection.execute(
+            job_table.update()
+            .where(and_(in_run, expired, job_table.c.leases >= JOB_MAX_LEASES))
+            .values(status=FAILED, last_error="Lease expired too many times", updated_at=now)
+        )
+        connection.execute(
+            job_table.update()
+            .where(job_table.c.id.in_(claimable))
+            .values(status=LEASED, lease_owner=owner, lease_token=token,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    leases=job_table.c.leases + 1, updated_at=now)
+        )
+        rows = connection.execute(
+            select(job_table.c.item_key).where(job_table.c.lease_token == token).order_by(job_table.c.id)
+        )
+        return [row[0] for row in rows]
+
+
+def finish_job(engine: Engine, portal: str, item_key: str, owner: str, status: str,
+               error: Optional[str] = None, billing_period: Optional[str] = None) -> bool:
+    """
+    Mark a leased job as done or failed.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        portal (str): "mp" or "mh".
+        item_key (str): IVRS number or account id.
+        owner (str): Lease owner that processed the job.
+        status (str): DONE or FAILED.
+        error (Optional[str]): Last error for failed jobs.
+        billing_period (Optional[str]): Billing period; defaults to the current one.
+
+    Returns:
+        bool: False if the lease had already been lost to another worker.
+    """
+    with engine.begin() as connection:
+        result = connection.execute(
+            job_table.update()
+            .where(and_(job_table.c.portal == portal, job_table.c.item_key == str(item_key),
+                        job_table.c.billing_period == (billing_period or current_billing_period()),
+                        job_table.c.lease_owner == owner, job_table.c.status == LEASED))
+            .values(status=status, last_error=error, lease_token=None, updated_at=datetime.utcnow())
+        )
+    if result.rowcount == 0:
+        logging.warning(f"Lease on {portal} job {item_key} was lost before it finished.")
+        return False
+    return True
+
+
+def extend_leases(engine: Engine, owner: str, lease_seconds: int = JOB_LEASE_SECONDS) -> int:
+    """
+    Push back the expiry of every job leased by an owner.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        owner (str): Lease owner.
+        lease_seconds (int): New lease duration from now.
+
+    Returns:
+        int: Number of leases extended.
+    """
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        result = connection.execute(
+            job_table.update()
+            .where(and_(job_table.c.lease_owner == owner, job_table.c.status == LEASED))
+            .values(lease_expires_at=now + timedelta(seconds=lease_seconds), updated_at=now)
+        )
+    return result.rowcount
+
+
+def release_leases(engine: Engine, owner: str) -> None:
+    """
+    Return the unfinished jobs of an owner to the pool, e.g. on shutdown.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        owner (str): Lease owner.
+    """
+    with engine.begin() as connection:
+        connection.execute(
+            job_table.update()
+            .where(and_(job_table.c.lease_owner == owner, job_table.c.status == LEASED))
+            .values(status=PENDING, lease_owner=None, lease_token=None, lease_expires_at=None,
+                    leases=job_table.c.leases - 1, updated_at=datetime.utcnow())
+        )
+
+
+def count_jobs(engine: Engine, portal: str, billing_period: Optional[str] = None) -> Dict[str, int]:
+    """
+    Count a portal's jobs by status.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        portal (str): "mp" or "mh".
+        billing_period (Optional[str]): Billing period; defaults to the current one.
+
+    Returns:
+        Dict[str, int]: Number of jobs per status.
+    """
+    query = (
+        select(job_table.c.status, func.count())
+        .where(and_(job_table.c.portal == portal,
+                    job_table.c.billing_period == (billing_period or current_billing_period())))
+        .group_by(job_table.c.status)
+    )
+    with engine.connect() as connection:
+        return {status: count for status, count in connection.execute(query)}
+
+
+class LeaseHeartbeat(threading.Thread):
+    """Background thread extending this worker's leases while it processes them."""
+
+    def __init__(self, engine: Engine, owner: str, lease_seconds: int = JOB_LEASE_SECONDS):
+        """
+        Prepare the heartbeat; call start() to run it.
+
+        Args:
+            engine (Engine): SQLAlchemy engine instance.
+            owner (str): Lease owner.
+            lease_seconds (int): Lease duration; the heartbeat beats three times per lease.
+        """
+        super().__init__(name="lease-heartbeat", daemon=True)
+        self.engine = engine
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        """Extend the leases three times per lease period until stopped."""
+        while not self._stopped.wait(self.lease_seconds / 3):
+            try:
+                extend_leases(self.engine, self.owner, self.lease_seconds)
+            except Exception as e:
+                logging.error(f"Lease heartbeat failed: {e}")
+
+    def stop(self) -> None:
+        """Stop the heartbeat and wait for it to exit."""
+        self._stopped.set()
+        self.join()
+
+
+class JobCheckpoint:
+    """
+    Supervisor checkpoint backed by the job table instead of a local file.
+
+    Jobs are only handed to one worker at a time, so nothing is skipped locally;
+    finishing an item finishes its job.
+    """
+
+    def __init__(self, engine: Engine, portal: str, owner: str, billing_period: str):
+        """
+        Bind the checkpoint to the jobs a worker leases.
+
+        Args:
+            engine (Engine): SQLAlchemy engine instance.
+            portal (str): "mp" or "mh".
+            owner (str): Lease owner.
+            billing_period (str): Billing period of the run.
+        """
+        self.engine = engine
+        self.portal = portal
+        self.owner = owner
+        self.billing_period = billing_period
+
+    def is_processed(self, key: str) -> bool:
+        """Leased jobs are never processed yet."""
+        return False
+
+    def mark_done(self, key: str) -> None:
+        """Record a leased job as done."""
+        finish_job(self.engine, self.portal, key, self.owner, DONE, billing_period=self.billing_period)
+
+    def mark_failed(self, key: str, error: str) -> None:
+        """Record a leased job that failed on every retry."""
+        finish_job(self.engine, self.portal, key, self.owner, FAILED, error, self.billing_period)
+
+
+def iter_leased_items(engine: Engine, portal: str, owner: str, billing_period: str) -> Iterator[Any]:
+    """
+    Claim job batches until the portal's run is complete, yielding the work items.
+
+    When nothing is claimable but other workers still hold leases, the worker
+    waits in case those leases expire.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        portal (str): "mp" or "mh".
+        owner (str): Lease owner.
+        billing_period (str): Billing period of the run.
+
+    Yields:
+        Any: IVRS numbers for "mp", credential records for "mh".
+    """
+    while True:
+        item_keys = claim_jobs(engine, portal, owner, billing_period=billing_period)
+        if not item_keys:
+            counts = count_jobs(engine, portal, billing_period)
+            if not counts.get(PENDING) and not counts.get(LEASED):
+                return
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+        if portal == "mp":
+            yield from item_keys
+        else:
+            ids = [int(item_key) for item_key in item_keys]
+            yield from iter_work_items(iter_mh_credential_batches(engine, WorkFilter(ids=ids)))
+
+
+def run_job_worker(portal: str) -> Tuple[int, int]:
+    """
+    Process leased jobs of a portal until none are left.
+
+    Start one per host (or several, each with its own browser); adding workers
+    needs no coordination beyond the shared database.
+
+    Args:
+        portal (str): "mp" or "mh".
+
+    Returns:
+        Tuple[int, int]: Number of jobs done and failed by this worker.
+    """
+    from mp_automation.mp_database import create_database_engine
+    from supervisor import run_supervised
+    from storage_layout import get_staging_dir, clear_staging
+    from config import MH_ACCOUNTS_PER_BROWSER
+
+    engine = create_database_engine(DATABASE_URL)
+    ensure_job_table(engine)
+    owner = get_worker_owner()
+    # Fixed for the whole run, so a run crossing midnight at a month end keeps working its own jobs
+    billing_period = current_billing_period()
+    heartbeat = LeaseHeartbeat(engine, owner)
+    heartbeat.start()
+    logging.info(f"Job worker {owner} started for {portal}.")
+
+    try:
+        if portal == "mp":
+            from mp_automation.mp_webdriver import initialize_chrome_driver
+            from mp_automation.mp_pipeline import process_ivrs_number, quit_mp_driver
+            return run_supervised(
+                iter_leased_items(engine, portal, owner, billing_period),
+                JobCheckpoint(engine, portal, owner, billing_period),
+                lambda ivrs_no, get_driver: process_ivrs_number(ivrs_no, get_driver, engine, get_staging_dir("mp")),
+                open_worker=lambda: initialize_chrome_driver(get_staging_dir("mp")),
+                close_worker=quit_mp_driver,
+            )
+
+        from mh_automation.mh_config import launch_browser
+        from mh_automation.mh_session import reset_browser_session
+        from mh_automation.mh_pipeline import process_mh_account, quit_mh_browser
+        return run_supervised(
+            iter_leased_items(engine, portal, owner, billing_period),
+            JobCheckpoint(engine, portal, owner, billing_period),
+            lambda credentials, get_driver: process_mh_account(credentials, get_driver, engine, get_staging_dir("mh")),
+            open_worker=lambda: launch_browser(get_staging_dir("mh")),
+            close_worker=quit_mh_browser,
+            reset_worker=reset_browser_session,
+            recycle_after=MH_ACCOUNTS_PER_BROWSER,
+            item_key=credential_key,
+        )
+    finally:
+        heartbeat.stop()
+        release_leases(engine, owner)
+        close_bill_parser()
+        close_outcome_writer()
+        close_ledger_writer()
+        clear_staging()
+
+
+def enqueue_portal(engine: Engine, portal: str) -> None:
+    """
+    Enqueue every item of a portal whose bill is still due this billing period.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        portal (str): "mp" or "mh".
+    """
+    from bill_ledger import ensure_ledger_table
+
+    ensure_ledger_table(engine)
+    ensure_job_table(engine)
+    work_filter = WorkFilter(due_only=True)
+    # Every key is read before the first write, so no read is open while the jobs are inserted
+    if portal == "mp":
+        item_keys = list(iter_work_items(iter_ivrs_batches(engine, work_filter)))
+    else:
+        item_keys = [credential_key(credentials)
+                     for credentials in iter_work_items(iter_mh_credential_batches(engine, work_filter))]
+    enqueue_jobs(engine, portal, item_keys, current_billing_period())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Share a bill run across hosts through the bill_jobs table.")
+    parser.add_argument("command", choices=["enqueue", "work", "status"])
+    parser.add_argument("portal", choices=["mp", "mh"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == "work":
+        done, failed = run_job_worker(args.portal)
+        logging.info(f"Job worker finished: {done} done, {failed} failed.")
+    else:
+        from mp_automation.mp_database import create_database_engine
+        engine = create_database_engine(DATABASE_URL)
+        if args.command == "enqueue":
+            enqueue_portal(engine, args.portal)
+        else:
+            ensure_job_table(engine)
+            print(count_jobs(engine, args.portal))
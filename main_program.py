@@ -1,147 +1,144 @@
 import logging
+from typing import Optional
 from mp_automation.mp_database import create_database_engine, retrieve_ivrs_numbers
 from mp_automation.mp_webdriver import initialize_chrome_driver
 from mp_automation.mp_web_interaction import wait_for_page_load, locate_element, click_on_element
 from mp_automation.mp_website import download_bill_for_ivrs
 from mp_automation.mp_file_operations import rename_latest_pdf_file
-from mp_automation.mp_alert_handler import handle_unexpected_alert, restart_script_for_mp_website, terminate_chrome_browser_instances
+from mp_automation.mp_alert_handler import handle_unexpected_alert, terminate_chrome_browser_instances
+from mp_automation.mp_worker_pool import run_mp_worker_pool
+from mp_automation.mp_pipeline import process_ivrs_number, quit_mp_driver
 from mh_automation.mh_config import configure_logging, launch_browser
-from mh_automation.mh_database import setup_maharashtra_db_connection, get_credentials_by_id
+from mh_automation.mh_database import setup_maharashtra_db_connection, get_credentials_by_id, reflect_mh_table
 from mh_automation.mh_captcha_handler import refresh_captcha, solve_captcha, enter_captcha, solve_captcha_and_login
 from mh_automation.mh_login import select_language, navigate_to_login_page, enter_login_details, perform_login
 from mh_automation.mh_bill_access import get_view_bill_button, click_view_bill_button, switch_to_new_window, click_view_printable_version, click_print_download_button, access_and_download_bill
 from mh_automation.mh_file_manager import wait_for_download_to_complete, handle_file_download, fetch_consumer_details, rename_file
-from mh_automation.mh_error_handler import handle_login_errors, check_login_error, restart_login_process, manage_unexpected_alerts, restart_script_for_mh_website
-from config import CHROMEDRIVER_PATH, DOWNLOAD_PATH_1, DOWNLOAD_PATH_2, LOGIN_URL_MP, LOGIN_URL_MH, DATABASE_URL
+from mh_automation.mh_error_handler import handle_login_errors, check_login_error, restart_login_process, manage_unexpected_alerts
+from mh_automation.mh_session import reset_browser_session
+from mh_automation.mh_pipeline import process_mh_account, quit_mh_browser
+from wait_engine import log_wait_summary
+from command_profiler import log_command_profile
+from orchestrator import run_orchestrator
+from bill_ledger import ensure_ledger_table, close_ledger_writer
+from stage_timing import get_run_id, log_stage_summary
+from bill_outcomes import close_outcome_writer
+from bill_parser import close_bill_parser
+from storage_layout import get_staging_dir, clear_staging
+from supervisor import RunCheckpoint, run_supervised, clear_checkpoints
+from work_source import WorkFilter, iter_ivrs_batches, iter_mh_credential_batches, iter_work_items, credential_key
+from config import CHROMEDRIVER_PATH, DOWNLOAD_PATH_1, DOWNLOAD_PATH_2, LOGIN_URL_MP, LOGIN_URL_MH, DATABASE_URL, MP_WORKER_COUNT, MH_ACCOUNTS_PER_BROWSER, SKIP_FETCHED_BILLS
 
 # Initialize logging
 logger = configure_logging()
 
-def main_mp_website() -> None:
+def main_mp_website(work_filter: Optional[WorkFilter] = None) -> None:
     """
     Main function to download bills for all IVRS numbers.
+
+    IVRS numbers are streamed from the database in batches. The run is supervised
+    and checkpointed: a failing IVRS number is retried with a fresh browser, and
+    a restarted run resumes where the previous one stopped.
+
+    Args:
+        work_filter (Optional[WorkFilter]): Rows to process; defaults to every IVRS
+            number, skipping bills already fetched when SKIP_FETCHED_BILLS is set.
     """
     logging.info("Starting Madhya Pradesh Website Automation Script.")
+    logging.info(f"Run id: {get_run_id()}")
+    work_filter = work_filter or WorkFilter(due_only=SKIP_FETCHED_BILLS)
 
     try:
         engine = create_database_engine(DATABASE_URL)
-        # Retrieve all IVRS numbers from the database
-        ivrs_numbers = retrieve_ivrs_numbers(engine)
+        ensure_ledger_table(engine)
     except Exception as e:
         logging.error(f"Failed to initialize database: {e}")
         return
 
-    try:
-        driver = initialize_chrome_driver(DOWNLOAD_PATH_1)
-    except Exception as e:
-        logging.error(f"Failed to initialize Chrome driver: {e}")
-        return
-
-    for ivrs_no in ivrs_numbers:
-        try:
-            download_bill_for_ivrs(driver, ivrs_no)
-            logging.info("Process completed successfully for IVRS number: %s", ivrs_no)
-
-            if not handle_unexpected_alert(driver):
-                restart_script_for_mp_website()
-                break
-        except Exception as e:
-            logging.error(f"Error in processing IVRS number {ivrs_no}: {e}")
-            restart_script_for_mp_website()
-            break
-    # Attempt to quit the driver after processing all IVRS numbers
-    try:
-        driver.quit()
-    except Exception as e:
-        logging.error(f"Failed to quit driver: {e}")
-
-    logging.info("All IVRS bills processed successfully.")
+    if MP_WORKER_COUNT > 1:
+        succeeded, failed = run_mp_worker_pool(MP_WORKER_COUNT, work_filter)
+    else:
+        # With the HTTP engine Chrome is only started once a bill needs the browser fallback
+        succeeded, failed = run_supervised(
+            iter_work_items(iter_ivrs_batches(engine, work_filter)),
+            RunCheckpoint("mp"),
+            lambda ivrs_no, get_driver: process_ivrs_number(ivrs_no, get_driver, engine, get_staging_dir("mp")),
+            open_worker=lambda: initialize_chrome_driver(get_staging_dir("mp")),
+            close_worker=quit_mp_driver,
+        )
+        log_wait_summary()
+        log_command_profile()
+
+    clear_checkpoints("mp")
+    close_bill_parser()
+    close_outcome_writer()
+    close_ledger_writer()
+    clear_staging()
+    logging.info(f"IVRS bills processed: {succeeded} downloaded, {failed} failed.")
+    log_stage_summary("mp")
     logging.info("Ending Madhya Pradesh Website Automation Script.")
 
-def main_mh_website():
+def main_mh_website(work_filter: Optional[WorkFilter] = None):
     """
     Automate tasks for the Maharashtra State Electricity Distribution Co. Ltd. website.
 
     This function:
-    1. Sets up the database and retrieves login credentials.
-    2. Initializes the WebDriver.
+    1. Sets up the database and streams login credentials in batches from one query.
+    2. Initializes the WebDriver, reusing it for up to MH_ACCOUNTS_PER_BROWSER accounts.
     3. Performs login using the retrieved credentials.
-    4. Accesses and downloads the bill.
-    5. Handles any exceptions and alerts that occur during the process.
+    4. Accesses and downloads the bill, then clears the session for the next account.
+    5. Handles any exceptions and alerts that occur during the process, retrying a
+       failed account with a fresh browser and checkpointing every processed account.
+
+    Args:
+        work_filter (Optional[WorkFilter]): Rows to process; defaults to every account,
+            skipping bills already fetched when SKIP_FETCHED_BILLS is set.
     """
     logging.info("Starting Maharashtra Website Automation Script.")
-    driver = None
-    session = None
-    success = False
+    logging.info(f"Run id: {get_run_id()}")
+    work_filter = work_filter or WorkFilter(due_only=SKIP_FETCHED_BILLS)
 
     try:
-        # Setup the database and create a session
-        Session, mh_table = setup_maharashtra_db_connection()
-        session = Session()
-
-        # Retrieve all IDs from the database
-        ids = [record.id for record in session.query(mh_table).all()]
-
-        for id in ids:
-            credentials = get_credentials_by_id(session, mh_table, id)
-            if credentials:
-                driver = launch_browser(DOWNLOAD_PATH_2)
-
-                username = credentials.get('login_name')
-                password = credentials.get('password')
-
-                if not username or not password:
-                    logging.error(f"Missing username or password for record ID {id}. Skipping.")
-                    continue
-
-                try:
-                    perform_login(driver, username, password)
-                    access_and_download_bill(driver)
-                    logging.info(f"Successfully processed record ID {id}.")
-                    
-                except Exception as e:
-                    logging.error(f"An error occurred with record ID {id}: {e}")
-                    handle_login_errors(driver)
-                    driver.refresh()
-                    
-                finally:
-                    if driver:
-                        try:
-                            driver.quit()
-                            logging.info(f"Browser closed for record ID {id}.")
-                        except Exception as quit_error:
-                            logging.error(f"Error closing the browser for record ID {id}: {quit_error}")
-                    driver = None
-
-            else:
-                logging.error(f"Invalid record format: {credentials}")
+        # Setup the database; only the credentials table is reflected
+        engine = create_database_engine(DATABASE_URL)
+        mh_table = reflect_mh_table(engine)
+        ensure_ledger_table(engine)
+
+        succeeded, failed = run_supervised(
+            iter_work_items(iter_mh_credential_batches(engine, work_filter, mh_table=mh_table)),
+            RunCheckpoint("mh"),
+            lambda credentials, get_driver: process_mh_account(credentials, get_driver, engine, get_staging_dir("mh")),
+            open_worker=lambda: launch_browser(get_staging_dir("mh")),
+            close_worker=quit_mh_browser,
+            reset_worker=reset_browser_session,
+            recycle_after=MH_ACCOUNTS_PER_BROWSER,
+            item_key=credential_key,
+        )
+        clear_checkpoints("mh")
+        logging.info(f"Maharashtra accounts processed: {succeeded} downloaded, {failed} failed.")
 
     except Exception as e:
         logging.error(f"An unexpected error occurred: {e}")
-        if driver:
-            manage_unexpected_alerts(driver)
-
-    finally:
-        if session:
-            session.close()
 
+    close_bill_parser()
+    close_outcome_writer()
+    close_ledger_writer()
+    clear_staging()
+    log_wait_summary()
+    log_command_profile()
+    log_stage_summary("mh")
     logging.info("Ending Maharashtra Website Automation Script.")
 
 
 if __name__ == "__main__":
 
-##    try:
-##        logging.info("Starting automation scripts for both websites.")
-##        main_mp_website()
-##    except Exception as e:
-##        logging.error(f"Script encountered an error: {e}. Restarting the script...")
-##        restart_script_for_mp_website()
-    
+    # Both portals run at the same time; failed items are retried by the supervisor
+    # and a restarted run resumes from the checkpoints.
     try:
-        main_mh_website()
+        logging.info("Starting automation scripts for both websites.")
+        run_orchestrator()
     except Exception as e:
-        logging.error(f"Script encountered an error: {e}. Restarting the script for Maharashtra Website...")
-        restart_script_for_mh_website()
+        logging.error(f"Script encountered an error: {e}.")
     
     logging.info("Ending automation scripts for both websites.")
 
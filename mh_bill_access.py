@@ -2,7 +2,8 @@
 
 import logging
 import time
-from typing import Tuple
+import functools
+from typing import List, NamedTuple, Optional, Tuple
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -10,18 +11,45 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.remote.webelement import WebElement
 from mh_automation.mh_config import configure_logging
-from mh_automation.mh_file_manager import handle_file_download, fetch_consumer_details
-from config import DOWNLOAD_PATH_2
+from mh_automation.mh_file_manager import (
+    handle_file_download, fetch_consumer_details, print_page_to_pdf, PRINT_DOWNLOAD_BUTTON_XPATH
+)
+from mh_automation.mh_error_handler import ERROR_BANNER_XPATH
+from dom_extract import FieldSpec, extract_record
+from download_watcher import get_download_watcher
+from browser_profiles import is_headless
+from stage_timing import timed_stage
+from config import DOWNLOAD_PATH_2, MH_PRINT_MODE, MH_BROWSER_PROFILE
 
 # Initialize logging
 logger = configure_logging()
 
 # Accessing and downloading the bill module
-    
+
+VIEW_BILL_BUTTON_ID = 'grdCustList_ctl02_viewHTMLBill'
+
+
+class ConsumerListPage(NamedTuple):
+    """State of the consumer list shown after login."""
+    view_bill_present: bool
+    consumer_rows: List[List[str]]
+    error_banners: List[str]
+
+
+CONSUMER_LIST_FIELDS = {
+    'view_bill_present': FieldSpec(f"//*[@id='{VIEW_BILL_BUTTON_ID}']", "exists"),
+    'consumer_rows': FieldSpec("//table[@id='grdCustList']//tr[td]", "rows", required=False),
+    'error_banners': FieldSpec(ERROR_BANNER_XPATH, "texts", required=False, ends_wait=True),
+}
+
+
 def get_view_bill_button(driver: webdriver.Chrome) -> WebElement:
     """
     Locate and return the 'View Bill' button element.
 
+    The consumer list is read in one round trip first, so an error banner fails
+    the account at once instead of after the full wait.
+
     Args:
         driver (webdriver.Chrome): Selenium WebDriver instance.
 
@@ -29,10 +57,14 @@ def get_view_bill_button(driver: webdriver.Chrome) -> WebElement:
         WebElement: The 'View Bill' button element.
     """
     try:
-        view_bill_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, 'grdCustList_ctl02_viewHTMLBill'))
-        )
-        logging.info("Located 'View Bill' button.")
+        page = extract_record(driver, ConsumerListPage, CONSUMER_LIST_FIELDS, 10, "mh_consumer_list",
+                              raise_on_timeout=False)
+        if page.error_banners:
+            raise RuntimeError(f"Consumer list reported an error: {'; '.join(page.error_banners)}")
+        if not page.view_bill_present:
+            raise TimeoutException("'View Bill' button not found on the consumer list.")
+        view_bill_button = driver.find_element(By.ID, VIEW_BILL_BUTTON_ID)
+        logging.info(f"Located 'View Bill' button ({len(page.consumer_rows)} consumer rows).")
         return view_bill_button
     except Exception as e:
         logging.error(f"Failed to locate 'View Bill' button: {e}")
@@ -87,21 +119,43 @@ def click_print_download_button(driver: webdriver.Chrome) -> None:
         driver (webdriver.Chrome): Selenium WebDriver instance.
     """
     print_download_button = WebDriverWait(driver, 15).until(
-        EC.element_to_be_clickable((By.XPATH, "//button[contains(., 'Print / Download')]"))
+        EC.element_to_be_clickable((By.XPATH, PRINT_DOWNLOAD_BUTTON_XPATH))
     )
     print_download_button.click()
     logging.info("Clicked on 'Print / Download' button.")
 
 
-def access_and_download_bill(driver: webdriver.Chrome) -> Tuple[str, str]:
+@functools.lru_cache(maxsize=None)
+def get_print_mode() -> str:
+    """
+    Return the print mode MH bills are captured with.
+
+    Headless Chrome has no print dialog for --kiosk-printing to confirm, so a
+    kiosk print never writes a PDF; headless profiles always use "cdp".
+
+    Returns:
+        str: "kiosk" or "cdp".
+    """
+    if MH_PRINT_MODE == "kiosk" and is_headless(MH_BROWSER_PROFILE):
+        logging.warning(f"MH_PRINT_MODE 'kiosk' does not work with the headless '{MH_BROWSER_PROFILE}' "
+                        f"profile; using 'cdp'.")
+        return "cdp"
+    return MH_PRINT_MODE
+
+
+@timed_stage
+def access_and_download_bill(driver: webdriver.Chrome, download_path: str = DOWNLOAD_PATH_2,
+                             destination_path: Optional[str] = None) -> Tuple[str, str, str]:
     """
     Access the bill and initiate the download process.
 
     Args:
         driver (webdriver.Chrome): Selenium WebDriver instance.
+        download_path (str): Directory the browser downloads into.
+        destination_path (Optional[str]): Directory the renamed bill is moved into. Defaults to download_path.
 
     Returns:
-        Tuple[str, str]: Consumer name and number.
+        Tuple[str, str, str]: Consumer name, consumer number and the path of the saved bill.
     """
     try:
         click_view_bill_button(driver)
@@ -111,16 +165,21 @@ def access_and_download_bill(driver: webdriver.Chrome) -> Tuple[str, str]:
 
         if not consumer_name or not consumer_number:
             logging.error("Consumer details not found. Cannot proceed with file renaming.")
-            return "", ""
+            return "", "", ""
         
         click_view_printable_version(driver)
         switch_to_new_window(driver)
+        if get_print_mode() == "cdp":
+            bill_path = print_page_to_pdf(driver, consumer_name, consumer_number, destination_path or download_path)
+            return consumer_name, consumer_number, bill_path
+
+        get_download_watcher(download_path)
+        download_started = time.time()
         click_print_download_button(driver)
-        
-        time.sleep(5)
-        
-        handle_file_download(driver, DOWNLOAD_PATH_2, consumer_name, consumer_number)
-        return consumer_name, consumer_number
+
+        bill_path = handle_file_download(driver, download_path, consumer_name, consumer_number,
+                                         since=download_started, destination_path=destination_path)
+        return consumer_name, consumer_number, bill_path
 
     except TimeoutException as e:
         logging.error(f"Timeout occurred: {e}")
@@ -0,0 +1,190 @@
+#mh_captcha_benchmark_module
+
+import os
+import math
+import time
+import argparse
+from typing import List, NamedTuple, Tuple
+from mh_automation.mh_captcha_ocr import recognize_captcha, CAPTCHA_PREPROCESSORS, OCR_BACKENDS
+
+# Offline captcha solver benchmark.
+#
+# The corpus is a directory of labelled captcha PNGs named `<label>.png` or
+# `<label>_<anything>.png` (see save_captcha_sample for collecting them). Every
+# backend/preprocessor combination is scored on accuracy and latency, and on the
+# expected time per successful login given the cost of a failed attempt.
+
+# Seconds a wrong captcha costs: login round trip, handle_login_errors and refresh_captcha
+DEFAULT_ATTEMPT_COST = 3.0
+
+
+class BenchmarkResult(NamedTuple):
+    """Scores of one backend/preprocessor combination over the corpus."""
+    backend: str
+    preprocessor: str
+    samples: int
+    exact_accuracy: float
+    char_accuracy: float
+    p50_ms: float
+    p95_ms: float
+    seconds_per_login: float
+
+
+def load_corpus(corpus_dir: str) -> List[Tuple[str, bytes]]:
+    """
+    Load the labelled captcha images of a corpus directory.
+
+    Args:
+        corpus_dir (str): Directory holding `<label>[_<suffix>].png` files.
+
+    Returns:
+        List[Tuple[str, bytes]]: Label and PNG bytes of every sample.
+    """
+    corpus = []
+    for file_name in sorted(os.listdir(corpus_dir)):
+        if not file_name.lower().endswith('.png'):
+            continue
+        label = os.path.splitext(file_name)[0].split('_')[0]
+        with open(os.path.join(corpus_dir, file_name), 'rb') as file:
+            corpus.append((label, file.read()))
+    return corpus
+
+
+def edit_distance(expected: str, actual: str) -> int:
+    """
+    Compute the Levenshtein distance between two strings.
+
+    Args:
+        expected (str): Labelled text.
+        actual (str): Recognized text.
+
+    Returns:
+        int: Number of single-character edits between the strings.
+    """
+    previous = list(range(len(actual) + 1))
+    for i, expected_char in enumerate(expected, 1):
+        current = [i]
+        for j, actual_char in enumerate(actual, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (expected_char != actual_char)))
+        previous = current
+    return previous[-1]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Return a percentile using the nearest-rank method.
+
+    Args:
+        values (List[float]): Measurements.
+        fraction (float): Percentile between 0 and 1.
+
+    Returns:
+        float: The percentile, or 0.0 for no measurements.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def benchmark_configuration(corpus: List[Tuple[str, bytes]], backend: str, preprocessor: str,
+                            attempt_cost: float = DEFAULT_ATTEMPT_COST) -> BenchmarkResult:
+    """
+    Score one backend/preprocessor combination over the corpus.
+
+    Args:
+        corpus (List[Tuple[str, bytes]]): Labelled samples.
+        backend (str): OCR backend name.
+        preprocessor (str): Preprocessor name.
+        attempt_cost (float): Seconds one login attempt costs besides solving the captcha.
+
+    Returns:
+        BenchmarkResult: Accuracy and latency scores.
+    """
+    latencies = []
+    exact = 0
+    char_scores = []
+    for label, png_bytes in corpus:
+        start_time = time.perf_counter()
+        text = recognize_captcha(png_bytes, preprocessor=preprocessor, backend=backend).text
+        latencies.append(time.perf_counter() - start_time)
+        exact += text == label
+        char_scores.append(max(0.0, 1 - edit_distance(label, text) / max(len(label), 1)))
+
+    exact_accuracy = exact / len(corpus)
+    mean_latency = sum(latencies) / len(latencies)
+    # Attempts are independent, so the expected number of attempts per login is 1 / accuracy
+    seconds_per_login = (mean_latency + attempt_cost) / exact_accuracy if exact_accuracy else float('inf')
+    return BenchmarkResult(
+        backend=backend,
+        preprocessor=preprocessor,
+        samples=len(corpus),
+        exact_accuracy=exact_accuracy,
+        char_accuracy=sum(char_scores) / len(char_scores),
+        p50_ms=percentile(latencies, 0.50) * 1000,
+        p95_ms=percentile(latencies, 0.95) * 1000,
+        seconds_per_login=seconds_per_login,
+    )
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    """
+    Format benchmark results as a table sorted by expected seconds per login.
+
+    Args:
+        results (List[BenchmarkResult]): Results to format.
+
+    Returns:
+        str: Plain-text table.
+    """
+    lines = [f"{'backend':<12} {'preprocessor':<20} {'n':>5} {'exact':>7} {'chars':>7} "
+             f"{'p50 ms':>8} {'p95 ms':>8} {'s/login':>8}"]
+    for result in sorted(results, key=lambda r: r.seconds_per_login):
+        lines.append(
+            f"{result.backend:<12} {result.preprocessor:<20} {result.samples:>5} "
+            f"{result.exact_accuracy:>7.1%} {result.char_accuracy:>7.1%} "
+            f"{result.p50_ms:>8.1f} {result.p95_ms:>8.1f} {result.seconds_per_login:>8.2f}"
+        )
+    return "\n".join(lines)
+
+
+def run_benchmark(corpus_dir: str, backends: List[str], preprocessors: List[str],
+                  attempt_cost: float = DEFAULT_ATTEMPT_COST) -> List[BenchmarkResult]:
+    """
+    Benchmark every backend/preprocessor combination over a corpus.
+
+    Args:
+        corpus_dir (str): Directory of labelled captcha PNGs.
+        backends (List[str]): OCR backend names.
+        preprocessors (List[str]): Preprocessor names.
+        attempt_cost (float): Seconds one login attempt costs besides solving the captcha.
+
+    Returns:
+        List[BenchmarkResult]: One result per combination.
+
+    Raises:
+        ValueError: If the corpus is empty.
+    """
+    corpus = load_corpus(corpus_dir)
+    if not corpus:
+        raise ValueError(f"No labelled captcha images found in {corpus_dir}")
+    return [
+        benchmark_configuration(corpus, backend, preprocessor, attempt_cost)
+        for backend in backends
+        for preprocessor in preprocessors
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark captcha OCR accuracy and latency.")
+    parser.add_argument("corpus_dir", help="Directory of <label>[_<suffix>].png captcha images")
+    parser.add_argument("--backends", nargs="+", default=sorted(OCR_BACKENDS), choices=sorted(OCR_BACKENDS))
+    parser.add_argument("--preprocessors", nargs="+", default=sorted(CAPTCHA_PREPROCESSORS),
+                        choices=sorted(CAPTCHA_PREPROCESSORS))
+    parser.add_argument("--attempt-cost", type=float, default=DEFAULT_ATTEMPT_COST,
+                        help="Seconds a failed login attempt costs besides solving the captcha")
+    args = parser.parse_args()
+
+    print(format_results(run_benchmark(args.corpus_dir, args.backends, args.preprocessors, args.attempt_cost)))
@@ -1,21 +1,23 @@
 import logging
-import time
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from PIL import Image
-import pytesseract
-from config import CAPTCHA_IMAGE_PATH
 from selenium.common.exceptions import (
     TimeoutException, NoSuchElementException, UnexpectedAlertPresentException, StaleElementReferenceException
 )
 from mh_automation.mh_config import configure_logging
 from mh_automation.mh_error_handler import handle_login_errors, restart_login_process
+from mh_automation.mh_captcha_ocr import recognize_captcha, save_captcha_sample
+from wait_engine import wait_until, get_element_html, element_changed
+from stage_timing import timed_stage
+
+CAPTCHA_LOCATOR = (By.ID, 'divCaptcha')
 
 # Initialize logging
 logger = configure_logging()
     
+@timed_stage
 def solve_captcha(driver: webdriver.Chrome) -> str:
     """
     Solve CAPTCHA by extracting the text from the CAPTCHA image.
@@ -28,17 +30,17 @@ def solve_captcha(driver: webdriver.Chrome) -> str:
     """
     try:
         captcha_image = WebDriverWait(driver, 10).until(
-            EC.visibility_of_element_located((By.ID, 'divCaptcha'))
+            EC.visibility_of_element_located(CAPTCHA_LOCATOR)
         )
-        captcha_image.screenshot(CAPTCHA_IMAGE_PATH)
-        
-        captcha_image = Image.open(CAPTCHA_IMAGE_PATH)
-        captcha_value = pytesseract.image_to_string(Image.open(CAPTCHA_IMAGE_PATH)).strip()
+        png_bytes = captcha_image.screenshot_as_png
+        ocr_result = recognize_captcha(png_bytes)
+        captcha_value = ocr_result.text
+        save_captcha_sample(png_bytes, captcha_value)
 
         if not captcha_value:
             raise ValueError("Extracted CAPTCHA value is empty.")
         
-        logger.info(f"Extracted CAPTCHA value: {captcha_value}")
+        logger.info(f"Extracted CAPTCHA value: {captcha_value} (confidence {ocr_result.confidence:.0f})")
         return captcha_value
     
     except Exception as e:
@@ -57,9 +59,11 @@ def refresh_captcha(driver: webdriver.Chrome) -> None:
         refresh_button = WebDriverWait(driver, 10).until(
             EC.element_to_be_clickable((By.ID, 'btnCaptchaRefLogin'))
         )
+        previous_captcha = get_element_html(driver, CAPTCHA_LOCATOR)
         refresh_button.click()
+        wait_until(driver, element_changed(CAPTCHA_LOCATOR, previous_captcha), 2, "mh_refresh_captcha",
+                   raise_on_timeout=False)
         logger.info("Successfully refreshed CAPTCHA.")
-        time.sleep(2)
 
     except (TimeoutException, StaleElementReferenceException) as e:
         logger.error(f"Failed to refresh CAPTCHA: {str(e)}")
@@ -108,10 +112,13 @@ def solve_captcha_and_login(driver: webdriver.Chrome) -> bool:
     while captcha_attempts < max_captcha_attempts:
         try:
             enter_captcha(driver)
-            driver.find_element(By.ID, 'loginButton').click()
-            time.sleep(5)
+            login_button = driver.find_element(By.ID, 'loginButton')
+            login_button.click()
+            # Either the portal rejects the login with an alert or it navigates away.
+            wait_until(driver, EC.any_of(EC.alert_is_present(), EC.staleness_of(login_button)), 10,
+                       "mh_login_outcome", raise_on_timeout=False)
 
-            if handle_login_errors(driver):
+            if handle_login_errors(driver, timeout=0):
                 logger.info("Login successful.")
                 return True
 
@@ -120,7 +127,8 @@ def solve_captcha_and_login(driver: webdriver.Chrome) -> bool:
         except NoSuchElementException as e:
             logger.warning(f"Login elements not found: {e}. Retrying...")
             captcha_attempts += 1
-            time.sleep(5)
+            wait_until(driver, EC.presence_of_element_located((By.ID, 'loginButton')), 5,
+                       "mh_login_elements", raise_on_timeout=False)
         except Exception as e:
             logger.error(f"Error during CAPTCHA handling: {e}")
             restart_login_process(driver)
@@ -0,0 +1,175 @@
+#mh_captcha_ocr_module
+
+import io
+import os
+import time
+import threading
+from typing import Callable, Dict, NamedTuple, Optional
+from PIL import Image, ImageOps
+import pytesseract
+from mh_automation.mh_config import configure_logging
+from mh_automation.mh_captcha_preprocess import build_pipeline
+from config import (
+    CAPTCHA_OCR_CONFIG, CAPTCHA_PREPROCESSOR, CAPTCHA_CORPUS_DIR, CAPTCHA_PIPELINES, CAPTCHA_PORTAL_PREPROCESSORS
+)
+
+try:
+    import tesserocr
+except ImportError:  # optional, falls back to pytesseract
+    tesserocr = None
+
+# Initialize logging
+logger = configure_logging()
+
+# In-memory OCR for captcha images. No file is written, so concurrent workers never
+# share a captcha image on disk.
+
+_engine_state = threading.local()
+
+
+class OcrResult(NamedTuple):
+    """Text read from a captcha image and the engine's mean confidence (0-100)."""
+    text: str
+    confidence: float
+
+
+def _get_tesserocr_engine():
+    """
+    Return this thread's long-lived Tesseract engine, creating it on first use.
+
+    Returns:
+        tesserocr.PyTessBaseAPI: Initialized engine.
+    """
+    engine = getattr(_engine_state, 'engine', None)
+    if engine is None:
+        engine = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_LINE)
+        _engine_state.engine = engine
+        logger.info("Started persistent Tesseract engine.")
+    return engine
+
+
+def _recognize_with_tesserocr(image: Image.Image) -> OcrResult:
+    """
+    Read text with the persistent tesserocr engine.
+
+    Args:
+        image (Image.Image): Captcha image.
+
+    Returns:
+        OcrResult: Recognized text and confidence.
+    """
+    engine = _get_tesserocr_engine()
+    engine.SetImage(image)
+    return OcrResult(engine.GetUTF8Text().strip(), float(engine.MeanTextConf()))
+
+
+def _recognize_with_pytesseract(image: Image.Image) -> OcrResult:
+    """
+    Read text with pytesseract.
+
+    Args:
+        image (Image.Image): Captcha image.
+
+    Returns:
+        OcrResult: Recognized text and the mean confidence of the recognized words.
+    """
+    data = pytesseract.image_to_data(image, config=CAPTCHA_OCR_CONFIG, output_type=pytesseract.Output.DICT)
+    words = []
+    confidences = []
+    for word, confidence in zip(data['text'], data['conf']):
+        if word.strip():
+            words.append(word.strip())
+            confidences.append(float(confidence))
+    confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    return OcrResult("".join(words), confidence)
+
+
+def _grayscale(image: Image.Image) -> Image.Image:
+    """Convert the captcha to grayscale."""
+    return ImageOps.grayscale(image)
+
+
+def _grayscale_upscale(image: Image.Image) -> Image.Image:
+    """Convert the captcha to grayscale and double its size."""
+    image = ImageOps.grayscale(image)
+    return image.resize((image.width * 2, image.height * 2), Image.LANCZOS)
+
+
+# Preprocessing applied before OCR, selectable by name
+CAPTCHA_PREPROCESSORS: Dict[str, Callable[[Image.Image], Image.Image]] = {
+    "none": lambda image: image,
+    "grayscale": _grayscale,
+    "grayscale_upscale": _grayscale_upscale,
+}
+# NumPy pipelines (see mh_captcha_preprocess.py), selectable like any other preprocessor
+CAPTCHA_PREPROCESSORS.update({name: build_pipeline(stages) for name, stages in CAPTCHA_PIPELINES.items()})
+
+OCR_BACKENDS: Dict[str, Callable[[Image.Image], OcrResult]] = {
+    "pytesseract": _recognize_with_pytesseract,
+}
+if tesserocr is not None:
+    OCR_BACKENDS["tesserocr"] = _recognize_with_tesserocr
+
+
+def get_default_backend() -> str:
+    """
+    Return the OCR backend used when none is requested.
+
+    Returns:
+        str: "tesserocr" when installed, otherwise "pytesseract".
+    """
+    return "tesserocr" if tesserocr is not None else "pytesseract"
+
+
+def get_portal_preprocessor(portal: str) -> str:
+    """
+    Return the preprocessor configured for a portal's captchas.
+
+    Args:
+        portal (str): Portal name, e.g. "mh".
+
+    Returns:
+        str: Name of a CAPTCHA_PREPROCESSORS entry; CAPTCHA_PREPROCESSOR when the portal has none.
+    """
+    return CAPTCHA_PORTAL_PREPROCESSORS.get(portal, CAPTCHA_PREPROCESSOR)
+
+
+def recognize_captcha(png_bytes: bytes, preprocessor: Optional[str] = None,
+                      backend: Optional[str] = None, portal: str = "mh") -> OcrResult:
+    """
+    Read the text of a captcha from PNG bytes.
+
+    Args:
+        png_bytes (bytes): PNG image, e.g. from WebElement.screenshot_as_png.
+        preprocessor (Optional[str]): Name of the entry of CAPTCHA_PREPROCESSORS to apply first;
+            defaults to the one configured for the portal.
+        backend (Optional[str]): Name of the entry of OCR_BACKENDS to use; defaults to the fastest installed.
+        portal (str): Portal the captcha comes from.
+
+    Returns:
+        OcrResult: Recognized text and confidence.
+    """
+    image = Image.open(io.BytesIO(png_bytes))
+    image.load()
+    image = CAPTCHA_PREPROCESSORS[preprocessor or get_portal_preprocessor(portal)](image)
+    return OCR_BACKENDS[backend or get_default_backend()](image)
+
+
+def save_captcha_sample(png_bytes: bytes, guess: str) -> None:
+    """
+    Save a captcha into CAPTCHA_CORPUS_DIR for later labelling, if configured.
+
+    Samples are written to `<corpus>/unlabelled/<guess>_<timestamp>.png`; labelling a
+    sample means fixing the part before the underscore and moving it into the corpus.
+
+    Args:
+        png_bytes (bytes): PNG image of the captcha.
+        guess (str): Text the OCR read, used as the initial label.
+    """
+    if not CAPTCHA_CORPUS_DIR:
+        return
+    directory = os.path.join(CAPTCHA_CORPUS_DIR, "unlabelled")
+    os.makedirs(directory, exist_ok=True)
+    safe_guess = "".join(c for c in guess if c.isalnum()) or "unknown"
+    with open(os.path.join(directory, f"{safe_guess}_{time.time_ns()}.png"), "wb") as file:
+        file.write(png_bytes)
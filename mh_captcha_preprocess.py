@@ -0,0 +1,249 @@
+#mh_captcha_preprocess_module
+
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+from PIL import Image
+
+# Vectorized captcha preprocessing.
+#
+# Each stage maps a uint8 array to a uint8 array using whole-array NumPy
+# operations (no per-pixel Python loops), so a full pipeline runs in about ten
+# milliseconds on a login captcha. Stages after "adaptive_threshold" work on a
+# binary image with black ink on white. Pipelines are lists of stage names,
+# configured in CAPTCHA_PIPELINES and registered as CAPTCHA_PREPROCESSORS entries.
+
+INK = 0
+PAPER = 255
+ADAPTIVE_WINDOW = 15
+ADAPTIVE_OFFSET = 10
+# Ink pixels with fewer 8-connected ink neighbours are treated as noise.
+DESPECKLE_MIN_NEIGHBOURS = 2
+# A straight line is treated as noise only when its ink covers at least this
+# fraction of the image's columns: glyph strokes, whatever their direction, span
+# a single character. Lines steeper than LINE_MAX_SLOPE are not searched for.
+LINE_MIN_COVERAGE = 0.6
+LINE_MAX_SLOPE = 1.0
+# Rows on each side of a line's centre that belong to the line.
+LINE_HALF_WIDTH = 1.5
+CROP_MARGIN = 4
+UPSCALE_FACTOR = 3
+
+
+def _to_gray(array: np.ndarray) -> np.ndarray:
+    """Return a 2-D luminance array, converting from RGB if needed."""
+    if array.ndim == 2:
+        return array
+    luminance = array[..., :3].astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    return np.clip(luminance, 0, 255).astype(np.uint8)
+
+
+def _box_sum(array: np.ndarray, size: int, mode: str = 'edge') -> np.ndarray:
+    """
+    Sum every size x size window centred on each pixel, using an integral image.
+
+    Args:
+        array (np.ndarray): 2-D array.
+        size (int): Odd window size.
+        mode (str): np.pad mode for the border: 'edge' replicates it, 'constant' pads with zeros.
+
+    Returns:
+        np.ndarray: Window sums with the shape of `array`.
+    """
+    radius = size // 2
+    padded = np.pad(array.astype(np.int64), radius + 1, mode=mode)
+    padded[0, :] = 0
+    padded[:, 0] = 0
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    height, width = array.shape
+    return (integral[size:size + height, size:size + width] - integral[:height, size:size + width]
+            - integral[size:size + height, :width] + integral[:height, :width])
+
+
+def _find_lines(ink: np.ndarray) -> List[Tuple[float, float]]:
+    """
+    Find the straight lines whose ink covers at least LINE_MIN_COVERAGE of the columns.
+
+    Every ink pixel votes for each (slope, intercept) it lies on; a column counts once
+    per line however thick the line is there.
+
+    Args:
+        ink (np.ndarray): Boolean ink mask.
+
+    Returns:
+        List[Tuple[float, float]]: Slope and intercept (row at column 0) of each line.
+    """
+    height, width = ink.shape
+    rows, columns = np.nonzero(ink)
+    if not rows.size:
+        return []
+    # On a grid of 2 / width steps the nearest slope is at most one row off at the line's far end
+    max_slope = min(LINE_MAX_SLOPE, (height - 1) / (LINE_MIN_COVERAGE * width))
+    steps = int(max_slope * width / 2)
+    slopes = np.arange(-steps, steps + 1) * 2 / width
+    intercepts = np.rint(rows[None, :] - slopes[:, None] * columns[None, :]).astype(np.int64)
+    lowest = intercepts.min() - 1
+    voted = np.zeros((slopes.size, intercepts.max() - lowest + 2, width), dtype=bool)
+    slope_indices = np.broadcast_to(np.arange(slopes.size)[:, None], intercepts.shape)
+    # Rasterized lines wander one row off their ideal intercept, so vote for the neighbours too
+    for shift in (-1, 0, 1):
+        voted[slope_indices, intercepts - lowest + shift, columns[None, :]] = True
+    coverage = voted.sum(axis=2)
+    # Neighbouring slopes and intercepts of a line cover almost as much: keep the peaks only
+    padded = np.pad(coverage, 1, mode='constant')
+    neighbourhood = np.max([padded[dy:dy + coverage.shape[0], dx:dx + coverage.shape[1]]
+                            for dy in range(3) for dx in range(3)], axis=0)
+    peaks = (coverage >= LINE_MIN_COVERAGE * width) & (coverage == neighbourhood)
+    slope_indices, intercept_bins = np.nonzero(peaks)
+    return list(zip(slopes[slope_indices], (intercept_bins + lowest).astype(float)))
+
+
+def _line_pixels(ink: np.ndarray, slope: float, intercept: float) -> np.ndarray:
+    """
+    Mark the ink of a line, except where a glyph stroke crosses it.
+
+    A stroke crosses the line where there is ink in the two rows just above it and
+    in the two rows just below it, within a few columns of each other; a glyph
+    overlaps it where the line is thicker than along most of its length. The line
+    is kept there, so it is cut away from the paper but not from the glyphs.
+
+    Args:
+        ink (np.ndarray): Boolean ink mask.
+        slope (float): Line slope in rows per column.
+        intercept (float): Row of the line at column 0.
+
+    Returns:
+        np.ndarray: Boolean mask of the pixels to remove.
+    """
+    height, width = ink.shape
+    columns = np.arange(width)
+    centre = intercept + slope * columns
+    reach = LINE_HALF_WIDTH * np.hypot(1.0, slope)
+    sides = []
+    for edge in (np.floor(centre - reach), np.ceil(centre + reach)):
+        side = np.zeros(width, dtype=bool)
+        for gap in (1, 2):
+            row = (edge + np.sign(edge - centre) * gap).astype(np.int64)
+            inside = (row >= 0) & (row < height)
+            side[inside] |= ink[row[inside], columns[inside]]
+        sides.append(side)
+    above, below = sides
+    # A slanted stroke leaves the band a few columns from where it entered: join such columns
+    spread = int(np.ceil(reach)) + 1
+    window = np.ones(2 * spread + 1)
+    touched = np.convolve(above | below, window, mode='same') > 0
+    touched = np.convolve(~touched, window, mode='same') == 0
+    starts = touched & ~np.concatenate(([False], touched[:-1]))
+    runs = np.cumsum(starts) * touched
+    crossed = (np.bincount(runs[above], minlength=runs.max() + 1) > 0) \
+        & (np.bincount(runs[below], minlength=runs.max() + 1) > 0)
+    crossed[0] = False
+    band = ink & (np.abs(np.arange(height)[:, None] - centre[None, :]) <= reach)
+    # Columns holding more ink than the line is thick are where it overlaps a glyph
+    thickness = band.sum(axis=0)
+    overlapped = thickness > np.median(thickness[thickness > 0])
+    return band & ~(crossed[runs] | overlapped)[None, :]
+
+
+def _binary(mask: np.ndarray) -> np.ndarray:
+    return np.where(mask, INK, PAPER).astype(np.uint8)
+
+
+def grayscale(array: np.ndarray) -> np.ndarray:
+    """Convert to luminance."""
+    return _to_gray(array)
+
+
+def adaptive_threshold(array: np.ndarray) -> np.ndarray:
+    """Binarize against the local mean, so uneven backgrounds and gradients drop out."""
+    gray = _to_gray(array)
+    local_mean = _box_sum(gray, ADAPTIVE_WINDOW) / (ADAPTIVE_WINDOW * ADAPTIVE_WINDOW)
+    return _binary(gray < local_mean - ADAPTIVE_OFFSET)
+
+
+def remove_lines(array: np.ndarray) -> np.ndarray:
+    """
+    Remove the straight noise lines drawn across the text.
+
+    Only lines covering LINE_MIN_COVERAGE of the image's width are removed, so glyph
+    strokes of any direction survive, and a line is kept in the columns where a glyph
+    crosses or overlaps it, so it is not cut out of the glyphs either.
+    """
+    ink = _to_gray(array) < 128
+    noise = np.zeros_like(ink)
+    for slope, intercept in _find_lines(ink):
+        noise |= _line_pixels(ink, slope, intercept)
+    return _binary(ink & ~noise)
+
+
+def despeckle(array: np.ndarray) -> np.ndarray:
+    """Remove isolated ink pixels."""
+    ink = _to_gray(array) < 128
+    neighbours = _box_sum(ink.astype(np.uint8), 3, mode='constant') - ink
+    return _binary(ink & (neighbours >= DESPECKLE_MIN_NEIGHBOURS))
+
+
+def crop(array: np.ndarray) -> np.ndarray:
+    """Crop to the ink's bounding box plus a margin."""
+    gray = _to_gray(array)
+    ink = gray < 128
+    rows = np.flatnonzero(ink.any(axis=1))
+    columns = np.flatnonzero(ink.any(axis=0))
+    if not rows.size:
+        return gray
+    cropped = gray[rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1]
+    return np.pad(cropped, CROP_MARGIN, mode='constant', constant_values=PAPER)
+
+
+def upscale(array: np.ndarray) -> np.ndarray:
+    """Enlarge by UPSCALE_FACTOR with nearest-neighbour sampling, keeping edges sharp."""
+    return np.repeat(np.repeat(array, UPSCALE_FACTOR, axis=0), UPSCALE_FACTOR, axis=1)
+
+
+CAPTCHA_STAGES: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "grayscale": grayscale,
+    "adaptive_threshold": adaptive_threshold,
+    "remove_lines": remove_lines,
+    "despeckle": despeckle,
+    "crop": crop,
+    "upscale": upscale,
+}
+
+
+def image_to_array(image: Image.Image) -> np.ndarray:
+    """
+    Convert a captcha to an RGB array, flattening transparency onto white.
+
+    Args:
+        image (Image.Image): Captcha image in any mode.
+
+    Returns:
+        np.ndarray: Height x width x 3 uint8 array.
+    """
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        image = Image.alpha_composite(Image.new("RGBA", image.size, "white"), image)
+    return np.asarray(image.convert("RGB"))
+
+
+def build_pipeline(stages: List[str]) -> Callable[[Image.Image], Image.Image]:
+    """
+    Compose stages into a preprocessor usable in CAPTCHA_PREPROCESSORS.
+
+    Args:
+        stages (List[str]): Names of CAPTCHA_STAGES entries, applied in order.
+
+    Returns:
+        Callable[[Image.Image], Image.Image]: The preprocessor.
+
+    Raises:
+        KeyError: If a stage name is unknown.
+    """
+    functions = [CAPTCHA_STAGES[stage] for stage in stages]
+
+    def _preprocess(image: Image.Image) -> Image.Image:
+        array = image_to_array(image)
+        for function in functions:
+            array = function(array)
+        return Image.fromarray(np.ascontiguousarray(array))
+
+    return _preprocess
@@ -2,10 +2,13 @@
 
 import logging
 import os
+import shutil
 from selenium import webdriver
-from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.service import Service
-from config import CHROMEDRIVER_PATH
+from browser_profiles import apply_browser_profile, prepare_browser
+from profile_template import apply_profile_template
+from command_profiler import install_command_profiler
+from config import CHROMEDRIVER_PATH, MH_BROWSER_PROFILE
 
 # Initialize logging
 def configure_logging() -> logging.Logger:
@@ -13,6 +16,8 @@ def configure_logging() -> logging.Logger:
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     return logging.getLogger(__name__)
 
+logger = configure_logging()
+
 def configure_chrome_options(download_path: str) -> webdriver.ChromeOptions:
     """
     Configure Chrome options for file download and print preview.
@@ -47,6 +52,7 @@ def configure_chrome_options(download_path: str) -> webdriver.ChromeOptions:
     options.add_argument("--disable-popup-blocking")
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
+    apply_browser_profile(options, "mh", MH_BROWSER_PROFILE)
 
     return options
 
@@ -66,11 +72,23 @@ def launch_browser(download_path: str) -> webdriver.Chrome:
     if not os.path.exists(download_path):
         os.makedirs(download_path)
     options = configure_chrome_options(download_path)
+    clone_dir = apply_profile_template(options, "mh")
     service = Service(CHROMEDRIVER_PATH)
+    driver = None
     try:
         driver = webdriver.Chrome(service=service, options=options)
-        driver.maximize_window()
-    except WebDriverException as e:
+        driver.profile_clone_dir = clone_dir
+        install_command_profiler(driver)
+        prepare_browser(driver, "mh", MH_BROWSER_PROFILE, download_path)
+    except Exception as e:
         logger.error(f"Failed to initialize driver: {e}")
+        # A browser that started but could not be prepared must not outlive the failure.
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception as quit_error:
+                logger.error(f"Failed to quit driver: {quit_error}")
+        if clone_dir:
+            shutil.rmtree(clone_dir, ignore_errors=True)
         raise
     return driver
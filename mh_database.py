@@ -1,10 +1,12 @@
 #mh_database_module
 
 import logging
-from sqlalchemy import create_engine, MetaData, Table
+from sqlalchemy import MetaData, Table
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import OperationalError
 from typing import Tuple
+from db_engine import get_engine
 from config import DATABASE_URL
 from mh_automation.mh_config import configure_logging
 
@@ -12,6 +14,19 @@ from mh_automation.mh_config import configure_logging
 logger = configure_logging()
 
 
+def reflect_mh_table(engine: Engine) -> Table:
+    """
+    Reflect the mh_website_credentials table, and only that table.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+
+    Returns:
+        Table: The reflected mh_website_credentials table.
+    """
+    return Table('mh_website_credentials', MetaData(), autoload_with=engine)
+
+
 def setup_maharashtra_db_connection() -> Tuple[sessionmaker, Table]:
     """
     Set up database connection for the Maharashtra website.
@@ -19,12 +34,10 @@ def setup_maharashtra_db_connection() -> Tuple[sessionmaker, Table]:
     Returns:
         Tuple[sessionmaker, Table]: A tuple containing the session factory and mh_website_credentials table.
     """
-    engine = create_engine(DATABASE_URL)
+    engine = get_engine(DATABASE_URL)
     try:
         Session = sessionmaker(bind=engine)
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
-        mh_table = Table('mh_website_credentials', metadata, autoload_with=engine)
+        mh_table = reflect_mh_table(engine)
     except OperationalError as e:
         logger.error(f"Database connection failed: {e}")
         raise
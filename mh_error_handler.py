@@ -1,30 +1,35 @@
 #mh_error_handling_module
 
 import logging
-import time
 from selenium import webdriver
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, UnexpectedAlertPresentException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from mh_automation.mh_config import configure_logging
-from mp_automation.mp_alert_handler import terminate_chrome_browser_instances
+from wait_engine import wait_until, get_element_html, element_changed
+from dom_extract import FieldSpec, extract_fields
 
 # Initialize logging
 logger = configure_logging()
 
-def handle_login_errors(driver: webdriver.Chrome) -> bool:
+ERROR_BANNER_XPATH = "//div[contains(@class, 'error-message')]"
+LOGIN_ERROR_TEXT = "An error occurred during the login process, please try again"
+
+def handle_login_errors(driver: webdriver.Chrome, timeout: float = 5) -> bool:
     """
     Handle login errors by checking for specific alert messages.
 
     Args:
         driver (webdriver.Chrome): Selenium WebDriver instance.
+        timeout (float): Time to wait for an alert. Pass 0 when the login outcome has
+            already settled to check only once.
 
     Returns:
         bool: True if login was successful, False otherwise.
     """
     try:
-        alert = WebDriverWait(driver, 5).until(
+        alert = WebDriverWait(driver, timeout).until(
             EC.alert_is_present()
         )
         alert_text = alert.text
@@ -56,15 +61,11 @@ def check_login_error(driver: webdriver.Chrome) -> bool:
     Returns:
         bool: True if login error is detected, False otherwise.
     """
-    try:
-        error_message_element = WebDriverWait(driver, 10).until(
-            EC.visibility_of_element_located((By.XPATH, "//div[contains(@class, 'error-message') and contains(text(), 'An error occurred during the login process, please try again')]"))
-        )
-        if error_message_element:
-            logger.error("Login error detected on the website.")
-            return True
-    except TimeoutException:
-        return False
+    login_error = FieldSpec(f"{ERROR_BANNER_XPATH}[contains(text(), '{LOGIN_ERROR_TEXT}')]", "exists")
+    extraction = extract_fields(driver, {'login_error': login_error}, 10, "mh_login_error", raise_on_timeout=False)
+    if extraction.values['login_error']:
+        logger.error("Login error detected on the website.")
+        return True
     return False
 
 def restart_login_process(driver: webdriver.Chrome) -> None:
@@ -89,9 +90,11 @@ def restart_login_process(driver: webdriver.Chrome) -> None:
     # Click the CAPTCHA refresh button
     try:
         captcha_refresh_button = driver.find_element(By.ID, "btnCaptchaRefLogin")
+        previous_captcha = get_element_html(driver, (By.ID, 'divCaptcha'))
         captcha_refresh_button.click()
+        wait_until(driver, element_changed((By.ID, 'divCaptcha'), previous_captcha), 3,
+                   "mh_restart_login_captcha", raise_on_timeout=False)
         logger.info("CAPTCHA refreshed.")
-        time.sleep(3)  # Wait for CAPTCHA to refresh
     except NoSuchElementException:
         logger.error("CAPTCHA refresh button not found.")
     
@@ -116,7 +119,7 @@ def restart_login_process(driver: webdriver.Chrome) -> None:
 
 def manage_unexpected_alerts(driver: webdriver.Chrome) -> None:
     """
-    Handle expected and unexpected alerts by restarting the script if necessary.
+    Accept an expected or unexpected alert so the browser can be closed cleanly.
 
     Args:
         driver (webdriver.Chrome): Selenium WebDriver instance.
@@ -125,22 +128,5 @@ def manage_unexpected_alerts(driver: webdriver.Chrome) -> None:
         alert = WebDriverWait(driver, 10).until(EC.alert_is_present())
         alert.accept()
         logger.info("Unexpected alert handled.")
-        restart_script_for_mh_website()
     except TimeoutException:
         logger.error("No unexpected alert detected.")
-
-
-def restart_script_for_mh_website() -> None:
-    """
-    Restart the automation script for Website 2.
-    """
-    from main_program import main_mh_website
-
-    logger.info("Restarting Maharashtra Website script...")
-    terminate_chrome_browser_instances()
-    # Restart the script by invoking the main function
-    try:
-        main_mh_website()
-    except Exception as e:
-        logging.error(f"Failed to restart the script: {e}")
-        sys.exit(1)
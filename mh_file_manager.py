@@ -1,9 +1,9 @@
 #mh_file_management_module
 
+import base64
 import logging
 import os
-import time
-from typing import Tuple
+from typing import List, NamedTuple, Optional, Tuple
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import (
@@ -12,36 +12,54 @@ from selenium.common.exceptions import (
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from mh_automation.mh_config import configure_logging
+from mh_automation.mh_error_handler import ERROR_BANNER_XPATH
+from wait_engine import wait_until, download_completed, document_ready
+from download_watcher import wait_for_download
+from bill_store import store_bill_file, store_bill_bytes
+from dom_extract import FieldSpec, extract_record
+from stage_timing import timed_stage
 
 # Initialize logging
 logger = configure_logging()
 
-def wait_for_download_to_complete(download_path: str, timeout: int = 120) -> str:
+
+class MHBillPage(NamedTuple):
+    """Consumer details and error banners of the bill page."""
+    consumer_number: str
+    consumer_name: str
+    error_banners: List[str]
+
+
+MH_BILL_PAGE_FIELDS = {
+    'consumer_number': FieldSpec("//td[@class='tdLabel' and contains(text(), 'Consumer No.')]/following-sibling::td"),
+    'consumer_name': FieldSpec("//td[@class='tdLabel' and contains(text(), 'Consumer Name')]/following-sibling::td"),
+    'error_banners': FieldSpec(ERROR_BANNER_XPATH, "texts", required=False, ends_wait=True),
+}
+
+@timed_stage
+def wait_for_download_to_complete(download_path: str, timeout: int = 120, since: float = 0.0,
+                                  key: str = "") -> str:
     """
     Wait for the download to complete by checking if the file is present in the download directory.
 
     Args:
         download_path (str): The path where files are downloaded.
         timeout (int): The maximum time to wait for the download to complete.
+        since (float): Epoch timestamp taken just before the download was triggered. Only PDFs
+            written after it are considered; the default accepts any PDF.
+        key (str): Consumer the download belongs to, used to correlate it.
 
     Returns:
         str: The path to the downloaded file.
     """
-    start_time = time.time()
-    while True:
-        files = os.listdir(download_path)
-        pdf_files = [f for f in files if f.endswith('.pdf') and not f.endswith('.pdf.part')]
-        if pdf_files:
-            latest_file = max(pdf_files, key=lambda f: os.path.getctime(os.path.join(download_path, f)))
-            return os.path.join(download_path, latest_file)
-        
-        if time.time() - start_time > timeout:
-            raise TimeoutError("Download did not complete within the specified timeout.")
-        
-        time.sleep(1)
+    downloaded_file_path = wait_for_download(download_path, key, since, timeout, "mh_download_complete")
+    if not downloaded_file_path:
+        raise TimeoutError("Download did not complete within the specified timeout.")
+    return downloaded_file_path
 
 
-def handle_file_download(driver: webdriver.Chrome, download_path: str, consumer_name: str, consumer_number: str) -> None:
+def handle_file_download(driver: webdriver.Chrome, download_path: str, consumer_name: str, consumer_number: str,
+                         since: float = 0.0, destination_path: Optional[str] = None) -> str:
     """
     Handles the file download process by ensuring the file is saved and renamed directly.
 
@@ -50,19 +68,24 @@ def handle_file_download(driver: webdriver.Chrome, download_path: str, consumer_
         download_path (str): The path where files are to be downloaded.
         consumer_name (str): The name of the consumer used for renaming the downloaded file.
         consumer_number (str): The number of the consumer used for renaming the downloaded file.
+        since (float): Epoch timestamp taken just before the download was triggered.
+        destination_path (Optional[str]): Directory the renamed bill is moved into. Defaults to download_path.
+
+    Returns:
+        str: Path of the renamed bill.
 
     Raises:
         Exception: If any error occurs during the file download or renaming process.
     """
     try:
         # Wait for the download to complete and get the file path
-        downloaded_file_path = wait_for_download_to_complete(download_path)
+        downloaded_file_path = wait_for_download_to_complete(download_path, since=since, key=consumer_number)
         
-        # Rename the file with consumer details
+        # Store the file under the consumer details
         new_filename = f"{consumer_name}_{consumer_number}.pdf"
-        new_file_path = os.path.join(download_path, new_filename)
-        os.rename(downloaded_file_path, new_file_path)
+        new_file_path = store_bill_file(downloaded_file_path, destination_path or download_path, new_filename).path
         logging.info(f"File successfully downloaded and renamed to {new_file_path}")
+        return new_file_path
 
     except Exception as e:
         logging.error(f"Error in file download: {e}")
@@ -74,10 +97,66 @@ def handle_file_download(driver: webdriver.Chrome, download_path: str, consumer_
         logging.info("Browser closed and switched back to the first window.")
 
 
+PRINT_DOWNLOAD_BUTTON_XPATH = "//button[contains(., 'Print / Download')]"
+
+# Page.printToPDF options: A4 with backgrounds, honouring the page's own @page size.
+PRINT_TO_PDF_OPTIONS = {
+    'printBackground': True,
+    'preferCSSPageSize': True,
+    'paperWidth': 8.27,
+    'paperHeight': 11.69,
+}
+
+
+@timed_stage
+def print_page_to_pdf(driver: webdriver.Chrome, consumer_name: str, consumer_number: str,
+                      destination_path: str) -> str:
+    """
+    Render the current page to PDF through DevTools and store it under the consumer details.
+
+    The PDF bytes come back in the command's response, so there is no print
+    dialog and no download directory to poll. The bill is written atomically.
+
+    Args:
+        driver (webdriver.Chrome): The Selenium WebDriver instance, on the printable bill.
+        consumer_name (str): The name of the consumer used for naming the bill.
+        consumer_number (str): The number of the consumer used for naming the bill.
+        destination_path (str): Directory the bill is exposed in.
+
+    Returns:
+        str: Path of the saved bill.
+
+    Raises:
+        Exception: If any error occurs while rendering or saving the bill.
+    """
+    try:
+        # The printable window opens blank; its Print / Download button marks the rendered bill.
+        wait_until(driver, EC.presence_of_element_located((By.XPATH, PRINT_DOWNLOAD_BUTTON_XPATH)), 15,
+                   "mh_printable_ready")
+        wait_until(driver, document_ready, 30, "mh_printable_loaded")
+        result = driver.execute_cdp_cmd("Page.printToPDF", PRINT_TO_PDF_OPTIONS)
+        new_filename = f"{consumer_name}_{consumer_number}.pdf"
+        new_file_path = store_bill_bytes(base64.b64decode(result['data']), destination_path, new_filename).path
+        logging.info(f"Printable bill rendered to {new_file_path}")
+        return new_file_path
+
+    except Exception as e:
+        logging.error(f"Error rendering the printable bill: {e}")
+        raise
+
+    finally:
+        driver.close()
+        driver.switch_to.window(driver.window_handles[0])
+        logging.info("Browser closed and switched back to the first window.")
+
+
+@timed_stage
 def fetch_consumer_details(driver: webdriver.Chrome) -> Tuple[str, str]:
     """
     Fetch the consumer name and number from the page.
 
+    Both fields and any error banner are read in a single round trip.
+
     Args:
         driver (webdriver.Chrome): Selenium WebDriver instance.
 
@@ -85,22 +164,18 @@ def fetch_consumer_details(driver: webdriver.Chrome) -> Tuple[str, str]:
         Tuple[str, str]: Consumer name and number.
     """
     try:
-        consumer_number_element = WebDriverWait(driver, 20).until(
-            EC.visibility_of_element_located((By.XPATH, "//td[@class='tdLabel' and contains(text(), 'Consumer No.')]/following-sibling::td"))
-        )
-        consumer_number = consumer_number_element.text.strip()
-        
-        consumer_name_element = WebDriverWait(driver, 20).until(
-            EC.visibility_of_element_located((By.XPATH, "//td[@class='tdLabel' and contains(text(), 'Consumer Name')]/following-sibling::td"))
-        )
-        consumer_name = consumer_name_element.text.strip()
+        page = extract_record(driver, MHBillPage, MH_BILL_PAGE_FIELDS, 20, "mh_consumer_details",
+                              raise_on_timeout=False)
+        if page.error_banners:
+            logging.error(f"Bill page reported an error: {'; '.join(page.error_banners)}")
+            return "", ""
+        if not page.consumer_number or not page.consumer_name:
+            logging.error("Timeout: Consumer details not found.")
+            return "", ""
+
+        logging.info(f"Consumer Name: {page.consumer_name}, Consumer Number: {page.consumer_number}")
+        return page.consumer_name, page.consumer_number
 
-        logging.info(f"Consumer Name: {consumer_name}, Consumer Number: {consumer_number}")
-        return consumer_name, consumer_number
-
-    except TimeoutException:
-        logging.error("Timeout: Consumer details not found.")
-        return "", ""
     except Exception as e:
         logging.error(f"An error occurred while fetching consumer details: {e}")
         return "", ""
@@ -118,36 +193,14 @@ def rename_file(source_path: str, consumer_name: str, consumer_number: str) -> N
     Raises:
         FileNotFoundError: If no PDF file is found or if the file to be renamed does not exist.
     """
-    timeout = 60
-    start_time = time.time()
-    
-    while time.time() - start_time < timeout:
-        files = os.listdir(source_path)
-        pdf_files = [f for f in files if f.endswith('.pdf')]
-        
-        if pdf_files:
-            latest_file = max(pdf_files, key=lambda f: os.path.getctime(os.path.join(source_path, f)))
-            old_filename = os.path.join(source_path, latest_file)
-            new_filename = os.path.join(source_path, f"{consumer_name}_{consumer_number}.pdf")
-            
-            if os.path.exists(old_filename):
-                if not os.path.exists(new_filename):
-                    os.rename(old_filename, new_filename)
-                    logging.info(f"File renamed to: {new_filename}")
-                else:
-                    logging.warning(f"File {new_filename} already exists. Attempting to rename with a new pattern.")
-                    # Handle file naming conflict
-                    counter = 1
-                    while os.path.exists(new_filename):
-                        new_filename = os.path.join(source_path, f"{consumer_name}_{consumer_number}_{counter}.pdf")
-                        counter += 1
-                    os.rename(old_filename, new_filename)
-                    logging.info(f"File renamed to: {new_filename}")
-                return
-            
-        time.sleep(1)
+    old_filename = wait_until(source_path, download_completed(source_path), 60, "mh_rename_file",
+                              raise_on_timeout=False)
+
+    if old_filename:
+        # An existing name is repointed at the new bill; the previous bill stays in the store
+        new_filename = store_bill_file(old_filename, source_path, f"{consumer_name}_{consumer_number}.pdf").path
+        logging.info(f"File renamed to: {new_filename}")
+        return
 
     logging.error("No PDF file found in the source directory within the timeout period.")
     raise FileNotFoundError("No PDF file found in the source directory within the timeout period.")
-
-
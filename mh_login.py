@@ -1,5 +1,4 @@
 import logging
-import time
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -9,8 +8,11 @@ from selenium.common.exceptions import (
     NoSuchElementException, UnexpectedAlertPresentException
 )
 from mh_automation.mh_captcha_handler import refresh_captcha, solve_captcha_and_login
-from mh_automation.mh_error_handler import handle_login_errors, restart_script_for_mh_website
+from mh_automation.mh_error_handler import handle_login_errors
 from mh_automation.mh_config import configure_logging
+from wait_engine import wait_until, network_idle
+from stage_timing import timed_stage, record_span
+from browser_profiles import measure_page_load
 from config import LOGIN_URL_MH
 
 # Initialize logging
@@ -41,7 +43,7 @@ def navigate_to_login_page(driver: webdriver.Chrome) -> None:
     WebDriverWait(driver, 10).until(
         EC.element_to_be_clickable((By.LINK_TEXT, "Login"))
     ).click()
-    time.sleep(2)
+    wait_until(driver, EC.visibility_of_element_located((By.ID, 'loginId')), 10, "mh_login_page")
 
 def enter_login_details(driver: webdriver.Chrome, username: str, password: str) -> None:
     """
@@ -68,6 +70,7 @@ def enter_login_details(driver: webdriver.Chrome, username: str, password: str)
         logger.error(f"Login input fields not found: {e}")
         raise
 
+@timed_stage
 def perform_login(driver: webdriver.Chrome, username: str, password: str) -> None:
     """
     Perform login operation on the website with retry logic for CAPTCHA failures,
@@ -77,15 +80,16 @@ def perform_login(driver: webdriver.Chrome, username: str, password: str) -> Non
         driver (webdriver.Chrome): Selenium WebDriver instance.
         username (str): Username for login.
         password (str): Password for login.
-    """
-    from main_program import main_mh_website
 
+    Raises:
+        RuntimeError: If the login did not succeed within the CAPTCHA attempts.
+    """
     driver.get(LOGIN_URL_MH)
+    record_span("page_load", measure_page_load(driver), "ok")
     
     try:
         select_language(driver, 'English')
         navigate_to_login_page(driver)
-        time.sleep(2)
 
         max_captcha_attempts = 10
         captcha_attempts = 0
@@ -105,7 +109,7 @@ def perform_login(driver: webdriver.Chrome, username: str, password: str) -> Non
 
                 logger.info(f"CAPTCHA entered: {captcha_value}")
 
-                if handle_login_errors(driver):
+                if handle_login_errors(driver, timeout=0):
                     break
                 else:
                     logger.info("Login failed due to CAPTCHA. Retrying...")
@@ -124,21 +128,22 @@ def perform_login(driver: webdriver.Chrome, username: str, password: str) -> Non
             except NoSuchElementException as e:
                 logger.warning(f"Login elements not found: {e}. Retrying...")
                 captcha_attempts += 1
-                time.sleep(5)
+                wait_until(driver, EC.presence_of_element_located((By.ID, 'loginId')), 5,
+                           "mh_login_elements", raise_on_timeout=False)
 
             except Exception as e:
                 logger.error(f"Error during CAPTCHA handling: {e}")
                 driver.refresh()
-                time.sleep(5)
+                wait_until(driver, network_idle(), 10, "mh_login_refresh", raise_on_timeout=False)
                 captcha_attempts += 1
 
         if captcha_attempts >= max_captcha_attempts:
-            logger.error("Max CAPTCHA attempts exceeded. Restarting script...")
-            restart_script_for_mh_website()
+            logger.error("Max CAPTCHA attempts exceeded.")
+            raise RuntimeError("Max CAPTCHA attempts exceeded.")
 
     except Exception as e:
         logger.error(f"Unexpected error during login process: {e}")
-        restart_script_for_mh_website()
+        raise
 
 
 
@@ -0,0 +1,89 @@
+#mh_pipeline_module
+
+from typing import Any, Callable, Dict, Optional
+from selenium import webdriver
+from sqlalchemy.engine import Engine
+from mh_automation.mh_config import configure_logging
+from mh_automation.mh_login import perform_login
+from mh_automation.mh_bill_access import access_and_download_bill
+from mh_automation.mh_error_handler import handle_login_errors
+from mh_automation.mh_session_store import restore_mh_session, save_mh_session, forget_mh_session
+from bill_ledger import try_record_fetched_bill
+from bill_outcomes import set_outcome_file_path
+from bill_parser import submit_bill_for_parsing
+from browser_profiles import log_browser_footprint
+from profile_template import remove_profile_clone
+from storage_layout import get_archive_dir
+from config import DOWNLOAD_PATH_2
+
+# Initialize logging
+logger = configure_logging()
+
+# Per-account bill pipeline for the Maharashtra website
+
+
+def process_mh_account(credentials: Dict[str, Any], get_driver: Callable[[], webdriver.Chrome],
+                       engine: Engine, download_path: str = DOWNLOAD_PATH_2,
+                       destination_path: Optional[str] = None) -> bool:
+    """
+    Log in with one credential record, download its bill and record it in the ledger.
+
+    A saved session of the account is reused when it is still valid, skipping the captcha login.
+
+    Args:
+        credentials (Dict[str, Any]): Credential record with 'id', 'login_name' and 'password'.
+        get_driver (Callable[[], webdriver.Chrome]): Returns the worker's browser, starting it if needed.
+        engine (Engine): SQLAlchemy engine used for the ledger.
+        download_path (str): Directory the browser downloads into.
+        destination_path (Optional[str]): Directory the renamed bill is exposed in. Defaults to the
+            account's archive directory.
+
+    Returns:
+        bool: Always True; failures, including a bill that was not saved, raise so the supervisor
+            recycles the browser and retries the account.
+    """
+    id = credentials['id']
+    username = credentials.get('login_name')
+    password = credentials.get('password')
+    if not username or not password:
+        logger.error(f"Missing username or password for record ID {id}. Skipping.")
+        return True
+
+    destination_path = destination_path or get_archive_dir("mh", id)
+    driver = get_driver()
+    try:
+        if not restore_mh_session(driver, id):
+            perform_login(driver, username, password)
+            save_mh_session(driver, id)
+        _, consumer_number, bill_path = access_and_download_bill(driver, download_path, destination_path)
+        if not bill_path:
+            # Raised so the supervisor retries the account instead of checkpointing it as done.
+            raise RuntimeError(f"No bill was saved for record ID {id}.")
+    except Exception as e:
+        logger.error(f"An error occurred with record ID {id}: {e}")
+        # The retry starts from a full login in case the saved session is to blame.
+        forget_mh_session(id)
+        handle_login_errors(driver)
+        raise
+
+    set_outcome_file_path(bill_path)
+    try_record_fetched_bill(engine, "mh", id, bill_path)
+    submit_bill_for_parsing("mh", consumer_number, bill_path)
+    logger.info(f"Successfully processed record ID {id}.")
+    return True
+
+
+def quit_mh_browser(driver: webdriver.Chrome) -> None:
+    """
+    Quit a Maharashtra browser, logging instead of raising on failure.
+
+    Args:
+        driver (webdriver.Chrome): Selenium WebDriver instance.
+    """
+    log_browser_footprint(driver, "mh")
+    try:
+        driver.quit()
+        logger.info("Browser closed.")
+    except Exception as quit_error:
+        logger.error(f"Error closing the browser: {quit_error}")
+    remove_profile_clone(driver)
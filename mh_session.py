@@ -0,0 +1,71 @@
+#mh_session_module
+
+from urllib.parse import urlsplit
+from selenium import webdriver
+from mh_automation.mh_config import configure_logging
+from config import LOGIN_URL_MH
+
+# Initialize logging
+logger = configure_logging()
+
+# Storage cleared between accounts. The HTTP cache is deliberately kept so the next
+# account loads the portal's static assets from a warm cache.
+SESSION_STORAGE_TYPES = "cookies,local_storage,session_storage,indexeddb,websql,service_workers,cache_storage"
+
+
+def get_portal_origin(url: str = LOGIN_URL_MH) -> str:
+    """
+    Return the scheme and host of a portal URL.
+
+    Args:
+        url (str): Any URL on the portal.
+
+    Returns:
+        str: Origin such as "https://wss.mahadiscom.in".
+    """
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def close_secondary_windows(driver: webdriver.Chrome) -> None:
+    """
+    Close every window except the first one and switch back to it.
+
+    Args:
+        driver (webdriver.Chrome): Selenium WebDriver instance.
+    """
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+
+
+def reset_browser_session(driver: webdriver.Chrome) -> None:
+    """
+    Log the current account out by wiping its cookies and storage so the same
+    browser can be handed to the next account.
+
+    Args:
+        driver (webdriver.Chrome): Selenium WebDriver instance.
+
+    Raises:
+        Exception: If the browser cannot be reset; the caller should recycle it.
+    """
+    close_secondary_windows(driver)
+    storage_script = getattr(driver, 'restored_storage_script', None)
+    if storage_script:
+        # Storage of a restored session (see mh_session_store.py) must not leak into the next account.
+        driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": storage_script})
+        driver.restored_storage_script = None
+    driver.execute_script(
+        "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}"
+    )
+    driver.delete_all_cookies()
+    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+        "origin": get_portal_origin(),
+        "storageTypes": SESSION_STORAGE_TYPES,
+    })
+    driver.get("about:blank")
+    logger.info("Browser session reset for the next account.")
@@ -0,0 +1,220 @@
+#mh_session_store_module
+
+import os
+import json
+import time
+import tempfile
+from typing import Any, Dict, Optional
+from cryptography.fernet import Fernet, InvalidToken
+from selenium import webdriver
+from mh_automation.mh_config import configure_logging
+from mh_automation.mh_session import reset_browser_session
+from mh_automation.mh_bill_access import VIEW_BILL_BUTTON_ID
+from dom_extract import FieldSpec, extract_fields
+from stage_timing import timed_stage
+from config import MH_PERSIST_SESSIONS, MH_SESSION_DIR, MH_SESSION_KEY_PATH, MH_SESSION_MAX_AGE_HOURS
+
+# Initialize logging
+logger = configure_logging()
+
+# Persisted login sessions per credential.
+#
+# After a successful login the portal's cookies and web storage are saved to
+# MH_SESSION_DIR/<credential id>.session, encrypted with Fernet. The key comes
+# from the MH_SESSION_KEY environment variable or is generated once into
+# MH_SESSION_KEY_PATH. The next run restores the state through DevTools, opens
+# the page the login landed on and checks in one round trip whether the
+# consumer list is shown. Only when the session has expired does the account go
+# through the captcha login again.
+
+SESSION_KEY_ENV = "MH_SESSION_KEY"
+# CookieParam fields accepted by Network.setCookies.
+COOKIE_FIELDS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires')
+
+CAPTURE_STORAGE_SCRIPT = """
+try {
+  return {origin: location.origin, local: Object.assign({}, localStorage), session: Object.assign({}, sessionStorage)};
+} catch (e) {
+  return {origin: location.origin, local: {}, session: {}};
+}
+"""
+
+RESTORE_STORAGE_SCRIPT = """
+(function (state) {
+  if (location.origin !== state.origin) { return; }
+  try {
+    Object.keys(state.local).forEach(function (key) { localStorage.setItem(key, state.local[key]); });
+    Object.keys(state.session).forEach(function (key) { sessionStorage.setItem(key, state.session[key]); });
+  } catch (e) {}
+})(%s);
+"""
+
+SESSION_CHECK_FIELDS = {
+    'logged_in': FieldSpec(f"//*[@id='{VIEW_BILL_BUTTON_ID}']", "exists"),
+    'login_prompt': FieldSpec("//*[@id='loginId' or @id='topnav_hreflanguage']", "exists",
+                              required=False, ends_wait=True),
+}
+
+_fernet: Optional[Fernet] = None
+
+
+def get_session_cipher() -> Fernet:
+    """
+    Return the cipher sessions are encrypted with, creating the key file on first use.
+
+    Returns:
+        Fernet: Cipher for the session files.
+    """
+    global _fernet
+    if _fernet is None:
+        key = os.environ.get(SESSION_KEY_ENV, "").encode()
+        if not key:
+            if not os.path.exists(MH_SESSION_KEY_PATH):
+                file_descriptor = os.open(MH_SESSION_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(file_descriptor, 'wb') as file:
+                    file.write(Fernet.generate_key())
+                logger.info(f"Generated session key {MH_SESSION_KEY_PATH}.")
+            with open(MH_SESSION_KEY_PATH, 'rb') as file:
+                key = file.read().strip()
+        _fernet = Fernet(key)
+    return _fernet
+
+
+def get_session_path(credential_id: Any) -> str:
+    """
+    Return the session file of a credential.
+
+    Args:
+        credential_id (Any): Credential id.
+
+    Returns:
+        str: Path of the encrypted session file.
+    """
+    return os.path.join(MH_SESSION_DIR, f"{credential_id}.session")
+
+
+def forget_mh_session(credential_id: Any) -> None:
+    """
+    Delete the saved session of a credential, if any.
+
+    Args:
+        credential_id (Any): Credential id.
+    """
+    try:
+        os.remove(get_session_path(credential_id))
+    except FileNotFoundError:
+        pass
+
+
+def save_mh_session(driver: webdriver.Chrome, credential_id: Any) -> None:
+    """
+    Save the logged-in browser state of a credential, encrypted.
+
+    Call right after a successful login, while the browser shows the page the
+    login landed on. Failures are logged; the run continues without a saved session.
+
+    Args:
+        driver (webdriver.Chrome): Selenium WebDriver instance.
+        credential_id (Any): Credential id.
+    """
+    if not MH_PERSIST_SESSIONS:
+        return
+    try:
+        state = {
+            'saved_at': time.time(),
+            'landing_url': driver.current_url,
+            'cookies': driver.execute_cdp_cmd("Network.getAllCookies", {})['cookies'],
+            'storage': driver.execute_script(CAPTURE_STORAGE_SCRIPT),
+        }
+        token = get_session_cipher().encrypt(json.dumps(state).encode())
+        os.makedirs(MH_SESSION_DIR, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=MH_SESSION_DIR, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                file.write(token)
+            os.replace(temp_path, get_session_path(credential_id))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        logger.info(f"Saved session for record ID {credential_id}.")
+    except Exception as e:
+        logger.error(f"Failed to save session for record ID {credential_id}: {e}")
+
+
+def load_mh_session(credential_id: Any) -> Optional[Dict[str, Any]]:
+    """
+    Load and decrypt the saved session of a credential.
+
+    Sessions older than MH_SESSION_MAX_AGE_HOURS, or that cannot be decrypted
+    (e.g. after a key change), are deleted.
+
+    Args:
+        credential_id (Any): Credential id.
+
+    Returns:
+        Optional[Dict[str, Any]]: Saved state, or None if there is no usable session.
+    """
+    path = get_session_path(credential_id)
+    if not MH_PERSIST_SESSIONS or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as file:
+            state = json.loads(get_session_cipher().decrypt(file.read()))
+    except (InvalidToken, ValueError) as e:
+        logger.warning(f"Discarding unreadable session for record ID {credential_id}: {e!r}")
+        forget_mh_session(credential_id)
+        return None
+    if time.time() - state['saved_at'] > MH_SESSION_MAX_AGE_HOURS * 3600:
+        forget_mh_session(credential_id)
+        return None
+    return state
+
+
+@timed_stage
+def restore_mh_session(driver: webdriver.Chrome, credential_id: Any) -> bool:
+    """
+    Restore the saved session of a credential and check that it is still logged in.
+
+    Cookies are set through DevTools and web storage is injected before the
+    page's own scripts run, then the landing page is opened: the consumer list
+    means the session is valid, the login form means it expired.
+
+    Args:
+        driver (webdriver.Chrome): Selenium WebDriver instance with no account logged in.
+        credential_id (Any): Credential id.
+
+    Returns:
+        bool: True if the browser is logged in and on the consumer list; False if a full login is needed.
+    """
+    state = load_mh_session(credential_id)
+    if state is None:
+        return False
+    try:
+        cookies = [
+            {field: cookie[field] for field in COOKIE_FIELDS if field in cookie}
+            for cookie in state['cookies']
+        ]
+        for cookie in cookies:
+            # Session cookies are reported with expires -1 and must be set without it.
+            if cookie.get('expires', 0) < 0:
+                del cookie['expires']
+        driver.execute_cdp_cmd("Network.setCookies", {'cookies': cookies})
+        storage = state.get('storage') or {}
+        if storage.get('local') or storage.get('session'):
+            driver.restored_storage_script = driver.execute_cdp_cmd(
+                "Page.addScriptToEvaluateOnNewDocument", {'source': RESTORE_STORAGE_SCRIPT % json.dumps(storage)}
+            )['identifier']
+
+        driver.get(state['landing_url'])
+        extraction = extract_fields(driver, SESSION_CHECK_FIELDS, 10, "mh_session_check", raise_on_timeout=False)
+        if extraction.values['logged_in']:
+            logger.info(f"Restored session for record ID {credential_id}; skipping login.")
+            return True
+        logger.info(f"Saved session for record ID {credential_id} has expired.")
+    except Exception as e:
+        logger.warning(f"Failed to restore session for record ID {credential_id}: {e}")
+
+    forget_mh_session(credential_id)
+    reset_browser_session(driver)
+    return False
@@ -0,0 +1,459 @@
+import json
+import time
+import uuid
+import random
+import string
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import date, timedelta
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit, parse_qs
+from config import (
+    MOCK_PORTAL_HOST, MOCK_MP_PORT, MOCK_MH_PORT, MOCK_PORTAL_LATENCY_MS, MOCK_PORTAL_JITTER_MS,
+    MOCK_PORTAL_ERROR_RATE
+)
+
+# Local stand-ins for the M.P. and Maharashtra portals.
+#
+# Each server reproduces only what the automation depends on: the element ids,
+# classes and texts it locates, the alerts it handles and the downloads it waits
+# for. Every request is delayed by the configured latency, and the configured
+# share of form submissions, logins and bill requests fails the way the real
+# portal does (an alert or a server error), so the real flows can be load-tested
+# without touching the discom sites. Point the flows at them with the
+# LOGIN_URL_MP / LOGIN_URL_MH environment variables.
+
+MOCK_LOGIN_PATHS = {"mp": "/westdiscom/home", "mh": "/wss/wss"}
+MOCK_SESSION_COOKIE = "ASP.NET_SessionId"
+CAPTCHA_ALPHABET = string.ascii_uppercase + string.digits
+
+
+class MockPortalSettings(NamedTuple):
+    """Behaviour of a mock portal."""
+    latency_ms: float = MOCK_PORTAL_LATENCY_MS
+    jitter_ms: float = MOCK_PORTAL_JITTER_MS
+    error_rate: float = MOCK_PORTAL_ERROR_RATE
+    captcha_noise: int = 0
+
+
+def get_mock_account(key: str) -> Dict[str, str]:
+    """
+    Return the deterministic bill details of a mock IVRS number or login name.
+
+    Args:
+        key (str): IVRS number or login name.
+
+    Returns:
+        Dict[str, str]: Consumer number and name, bill month, units, amount and due date.
+    """
+    seed = int(hashlib.sha1(key.encode()).hexdigest()[:12], 16)
+    today = date.today()
+    units = 50 + seed % 450
+    return {
+        'consumer_number': f"{seed % 10 ** 12:012d}",
+        'consumer_name': f"MOCK CONSUMER {key.upper()}",
+        'bill_month': today.strftime("%b-%Y").upper(),
+        'units': str(units),
+        'amount': f"{units * 7.35 + 120:.2f}",
+        'due_date': (today.replace(day=1) + timedelta(days=20)).strftime("%d-%m-%Y"),
+    }
+
+
+def get_bill_lines(portal: str, key: str) -> List[str]:
+    """
+    Return the text lines of a mock bill.
+
+    Args:
+        portal (str): "mp" or "mh".
+        key (str): IVRS number or login name.
+
+    Returns:
+        List[str]: Lines in the format the bill parser expects.
+    """
+    account = get_mock_account(key)
+    title = "M.P. Paschim Kshetra Vidyut Vitaran Co. Ltd." if portal == "mp" else "MSEDCL Electricity Bill"
+    label = f"IVRS No: {key}" if portal == "mp" else f"Consumer No.: {account['consumer_number']}"
+    return [
+        f"{title} (mock)",
+        label,
+        f"Consumer Name: {account['consumer_name']}",
+        f"Bill Month: {account['bill_month']}",
+        f"Units Consumed: {account['units']}",
+        f"Due Date: {account['due_date']}",
+        f"Net Amount Payable: Rs. {account['amount']}",
+    ]
+
+
+def build_bill_pdf(lines: List[str]) -> bytes:
+    """
+    Build a one-page PDF with a line of text per entry.
+
+    Args:
+        lines (List[str]): Text lines.
+
+    Returns:
+        bytes: PDF document.
+    """
+    def pdf_string(text: str) -> str:
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    stream = "BT /F1 11 Tf 14 TL 50 780 Td " + " ".join(f"({pdf_string(line)}) Tj T*" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        "/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    document = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(document))
+        document += f"{number} 0 obj\n{body}\nendobj\n"
+    xref_offset = len(document)
+    document += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    document += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    document += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+    return document.encode("latin-1")
+
+
+def build_captcha_svg(text: str, noise: int = 0) -> bytes:
+    """
+    Render a captcha as an SVG image.
+
+    Args:
+        text (str): Captcha text.
+        noise (int): Number of random lines drawn across the text.
+
+    Returns:
+        bytes: SVG document.
+    """
+    lines = "".join(
+        f'<line x1="{random.randint(0, 160)}" y1="{random.randint(0, 50)}" '
+        f'x2="{random.randint(0, 160)}" y2="{random.randint(0, 50)}" stroke="#555" stroke-width="1"/>'
+        for _ in range(noise)
+    )
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" width="160" height="50">'
+        '<rect width="160" height="50" fill="#f2f2f2"/>'
+        f'<text x="14" y="35" font-family="monospace" font-size="28" letter-spacing="4" fill="#222">{text}</text>'
+        f'{lines}</svg>'
+    ).encode()
+
+
+def render_page(title: str, body: str) -> str:
+    """
+    Wrap a page body in a minimal HTML document.
+
+    Args:
+        title (str): Page title.
+        body (str): HTML body.
+
+    Returns:
+        str: HTML document.
+    """
+    return f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{escape(title)}</title></head><body>{body}</body></html>"
+
+
+class MockPortalHandler(BaseHTTPRequestHandler):
+    """Request handler shared by the mock portals: routing, latency and error injection."""
+    routes: Dict[str, str] = {}
+
+    @property
+    def settings(self) -> MockPortalSettings:
+        return self.server.settings
+
+    def log_message(self, format: str, *args) -> None:
+        logging.debug(f"{self.server.portal} mock: {format % args}")
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str) -> None:
+        parts = urlsplit(self.path)
+        self.query = {name: values[0] for name, values in parse_qs(parts.query).items()}
+        self.form = {}
+        if method == "POST":
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length).decode()
+            self.form = {name: values[0] for name, values in parse_qs(body).items()}
+        handler = self.routes.get(f"{method} {parts.path}")
+        self._delay()
+        if handler is None:
+            self.send_html(render_page("Not Found", "<h1>404 Not Found</h1>"), status=404)
+            return
+        getattr(self, handler)()
+
+    def _delay(self) -> None:
+        latency = self.settings.latency_ms + random.uniform(-1, 1) * self.settings.jitter_ms
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def should_fail(self) -> bool:
+        """Return True for the configured share of requests that must fail."""
+        return random.random() < self.settings.error_rate
+
+    def get_session(self) -> Dict[str, str]:
+        """Return the server-side session of this request, creating it (and its cookie) if needed."""
+        cookies = dict(
+            part.strip().split("=", 1) for part in (self.headers.get("Cookie") or "").split(";") if "=" in part
+        )
+        session_id = cookies.get(MOCK_SESSION_COOKIE)
+        with self.server.lock:
+            if session_id not in self.server.sessions:
+                session_id = uuid.uuid4().hex
+                self.server.sessions[session_id] = {}
+                self.new_session_id = session_id
+            return self.server.sessions[session_id]
+
+    def send_body(self, body: bytes, content_type: str, status: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> None:
+        """Send a complete response, attaching the session cookie when one was created."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        if getattr(self, "new_session_id", None):
+            self.send_header("Set-Cookie", f"{MOCK_SESSION_COOKIE}={self.new_session_id}; Path=/")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_html(self, html: str, status: int = 200) -> None:
+        self.send_body(html.encode(), "text/html; charset=utf-8", status)
+
+    def send_json(self, payload: Dict) -> None:
+        self.send_body(json.dumps(payload).encode(), "application/json")
+
+    def send_redirect(self, location: str) -> None:
+        self.send_body(b"", "text/plain", 302, {"Location": location})
+
+    def send_server_error(self) -> None:
+        self.send_html(render_page("Server Error", "<h1>500 Internal Server Error</h1>"), status=500)
+
+    def send_pdf(self, content: bytes, file_name: str) -> None:
+        self.send_body(content, "application/pdf", headers={
+            "Content-Disposition": f'attachment; filename="{file_name}"',
+        })
+
+
+class MockMPHandler(MockPortalHandler):
+    """M.P. portal: IVRS form, bill summary and the full bill PDF."""
+    routes = {
+        "GET /westdiscom/home": "home",
+        "POST /westdiscom/viewBill": "view_bill",
+        "GET /westdiscom/fullBill": "full_bill",
+    }
+
+    def home(self) -> None:
+        self.send_html(render_page("West Discom (mock)", """
+            <form method="post" action="/westdiscom/viewBill">
+              <input type="text" class="form-control" name="ivrs" placeholder="IVRS No.">
+              <input type="submit" class="btn btn-warning" value="Submit">
+            </form>"""))
+
+    def view_bill(self) -> None:
+        ivrs_no = self.form.get("ivrs", "").strip()
+        if not ivrs_no.isdigit() or self.should_fail():
+            message = "Please enter a valid IVRS number." if not ivrs_no.isdigit() else "Service temporarily unavailable."
+            self.send_html(render_page("West Discom (mock)", f"<script>alert({json.dumps(message)});</script>"))
+            return
+        account = get_mock_account(ivrs_no)
+        self.send_html(render_page("Bill Summary (mock)", f"""
+            <table><tr><td>IVRS No.</td><td>{escape(ivrs_no)}</td></tr>
+            <tr><td>Bill Month</td><td>{account['bill_month']}</td></tr>
+            <tr><td>Amount</td><td>{account['amount']}</td></tr></table>
+            <button type="button" onclick="window.location.href='/westdiscom/fullBill?ivrs={escape(ivrs_no)}'">View Full Bill (English)</button>"""))
+
+    def full_bill(self) -> None:
+        ivrs_no = self.query.get("ivrs", "")
+        if not ivrs_no.isdigit() or self.should_fail():
+            self.send_server_error()
+            return
+        self.send_pdf(build_bill_pdf(get_bill_lines("mp", ivrs_no)), f"{ivrs_no}_bill.pdf")
+
+
+MH_LOGIN_SCRIPT = """
+function refreshCaptcha() {
+  document.getElementById('divCaptcha').innerHTML = '<img src="/wss/captcha?v=' + Date.now() + '">';
+}
+function submitLogin() {
+  var login = document.getElementById('loginId').value;
+  var password = document.getElementById('password').value;
+  var captcha = document.getElementById('txtInput').value;
+  if (!login) { alert('Please enter Login Name'); return; }
+  if (!password) { alert('Please enter Password'); return; }
+  if (!captcha) { alert('Enter CAPTCHA First'); return; }
+  fetch('/wss/login', {method: 'POST', body: new URLSearchParams({loginId: login, password: password, captcha: captcha})})
+    .then(function (response) { return response.json(); })
+    .then(function (result) { if (result.ok) { window.location.href = result.next; } else { alert(result.message); } });
+}
+"""
+
+
+class MockMHHandler(MockPortalHandler):
+    """Maharashtra portal: language picker, captcha login, consumer grid, bill and printable version."""
+    routes = {
+        "GET /wss/wss": "home",
+        "GET /wss/login": "login_page",
+        "GET /wss/captcha": "captcha",
+        "POST /wss/login": "login",
+        "GET /wss/consumers": "consumers",
+        "GET /wss/bill": "bill",
+        "GET /wss/bill/print": "printable_bill",
+    }
+
+    def home(self) -> None:
+        self.get_session()
+        self.send_html(render_page("Mahavitaran (mock)", """
+            <a id="topnav_hreflanguage" href="#"
+               onclick="document.getElementById('languages').style.display='block'; return false;">Language</a>
+            <div id="languages" style="display:none">
+              <a href="#" onclick="document.cookie='lang=en; path=/'; this.parentNode.style.display='none'; return false;">English</a>
+              <a href="#" onclick="return false;">Marathi</a>
+            </div>
+            <a href="/wss/login">Login</a>"""))
+
+    def login_page(self) -> None:
+        self.get_session()
+        self.send_html(render_page("Login (mock)", f"""
+            <input type="text" id="loginId">
+            <input type="password" id="password">
+            <div id="divCaptcha"><img src="/wss/captcha?v={time.time_ns()}"></div>
+            <input type="button" id="btnCaptchaRefLogin" value="Refresh" onclick="refreshCaptcha()">
+            <input type="text" id="txtInput">
+            <input type="button" id="loginButton" value="Login" onclick="submitLogin()">
+            <script>{MH_LOGIN_SCRIPT}</script>"""))
+
+    def captcha(self) -> None:
+        session = self.get_session()
+        session['captcha'] = "".join(random.choices(CAPTCHA_ALPHABET, k=6))
+        self.send_body(build_captcha_svg(session['captcha'], self.settings.captcha_noise), "image/svg+xml")
+
+    def login(self) -> None:
+        session = self.get_session()
+        if self.should_fail():
+            self.send_json({'ok': False, 'message': "Service temporarily unavailable. Please try again."})
+        elif self.form.get("captcha", "").strip().upper() != session.get('captcha'):
+            self.send_json({'ok': False, 'message': "Invalid CAPTCHA"})
+        else:
+            session['login'] = self.form.get("loginId", "")
+            self.send_json({'ok': True, 'next': "/wss/consumers"})
+
+    def _require_login(self) -> Optional[str]:
+        login = self.get_session().get('login')
+        if not login:
+            self.send_redirect(MOCK_LOGIN_PATHS["mh"])
+        return login
+
+    def consumers(self) -> None:
+        login = self._require_login()
+        if not login:
+            return
+        account = get_mock_account(login)
+        self.send_html(render_page("Consumer List (mock)", f"""
+            <table id="grdCustList">
+              <tr><th>Consumer No.</th><th>Consumer Name</th><th></th></tr>
+              <tr><td>{account['consumer_number']}</td><td>{escape(account['consumer_name'])}</td>
+                <td><a id="grdCustList_ctl02_viewHTMLBill" href="/wss/bill" target="_blank">View Bill</a></td></tr>
+            </table>"""))
+
+    def bill(self) -> None:
+        login = self._require_login()
+        if not login:
+            return
+        if self.should_fail():
+            self.send_server_error()
+            return
+        account = get_mock_account(login)
+        self.send_html(render_page("Bill (mock)", f"""
+            <table>
+              <tr><td class="tdLabel">Consumer No.</td><td>{account['consumer_number']}</td></tr>
+              <tr><td class="tdLabel">Consumer Name</td><td>{escape(account['consumer_name'])}</td></tr>
+              <tr><td class="tdLabel">Bill Month</td><td>{account['bill_month']}</td></tr>
+            </table>
+            <a href="/wss/bill/print" target="_blank">View Printable Version</a>"""))
+
+    def printable_bill(self) -> None:
+        login = self._require_login()
+        if not login:
+            return
+        account = get_mock_account(login)
+        lines = "".join(f"<p>{escape(line)}</p>" for line in get_bill_lines("mh", login))
+        self.send_html(render_page(f"Bill_{account['consumer_number']}",
+                                   f"{lines}<button onclick='window.print()'>Print / Download</button>"))
+
+
+MOCK_HANDLERS = {"mp": MockMPHandler, "mh": MockMHHandler}
+MOCK_PORTS = {"mp": MOCK_MP_PORT, "mh": MOCK_MH_PORT}
+
+
+def start_mock_portal(portal: str, settings: MockPortalSettings = MockPortalSettings(),
+                      host: str = MOCK_PORTAL_HOST, port: Optional[int] = None) -> ThreadingHTTPServer:
+    """
+    Start a mock portal on a background thread.
+
+    Args:
+        portal (str): "mp" or "mh".
+        settings (MockPortalSettings): Latency, error rate and captcha noise.
+        host (str): Interface to listen on.
+        port (Optional[int]): Port to listen on; defaults to the portal's configured port.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer((host, MOCK_PORTS[portal] if port is None else port), MOCK_HANDLERS[portal])
+    server.daemon_threads = True
+    server.portal = portal
+    server.settings = settings
+    server.sessions = {}
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name=f"mock-{portal}", daemon=True).start()
+    logging.info(f"Mock {portal} portal listening on {get_mock_login_url(portal, server)}")
+    return server
+
+
+def get_mock_login_url(portal: str, server: ThreadingHTTPServer) -> str:
+    """
+    Return the URL the flows should open for a running mock portal.
+
+    Args:
+        portal (str): "mp" or "mh".
+        server (ThreadingHTTPServer): Server returned by start_mock_portal.
+
+    Returns:
+        str: Login URL, suitable for LOGIN_URL_MP / LOGIN_URL_MH.
+    """
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}{MOCK_LOGIN_PATHS[portal]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the mock M.P. and Maharashtra portals.")
+    parser.add_argument("--portals", nargs="+", default=sorted(MOCK_HANDLERS), choices=sorted(MOCK_HANDLERS))
+    parser.add_argument("--host", default=MOCK_PORTAL_HOST)
+    parser.add_argument("--latency-ms", type=float, default=MOCK_PORTAL_LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=MOCK_PORTAL_JITTER_MS)
+    parser.add_argument("--error-rate", type=float, default=MOCK_PORTAL_ERROR_RATE)
+    parser.add_argument("--captcha-noise", type=int, default=0, help="Random lines drawn across each captcha")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    settings = MockPortalSettings(args.latency_ms, args.jitter_ms, args.error_rate, args.captcha_noise)
+    servers = [start_mock_portal(portal, settings, args.host) for portal in args.portals]
+    for portal, server in zip(args.portals, servers):
+        print(f"export LOGIN_URL_{portal.upper()}={get_mock_login_url(portal, server)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
@@ -1,15 +1,23 @@
 import logging
 from typing import List
-from sqlalchemy import create_engine, Table, Column, Integer, String, MetaData, select
+from sqlalchemy import Table, Column, Integer, String, MetaData, select
 from sqlalchemy.engine import Engine
+from db_engine import get_engine
 from config import DATABASE_URL
 
+metadata = MetaData()
+mp_table = Table(
+    'mp_website_credentials', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('ivrs_no', String, nullable=False)
+)
+
 def create_database_engine(database_url: str) -> Engine:
     """
-    Create and return a SQLAlchemy engine for the database connection.
+    Return the shared, pooled SQLAlchemy engine for the database connection.
     """
     try:
-        return create_engine(database_url)
+        return get_engine(database_url)
     except Exception as e:
         logging.error(f"Database connection failed: {e}")
         raise
@@ -27,13 +35,6 @@ def retrieve_ivrs_numbers(engine: Engine) -> List[str]:
     Raises:
         ValueError: If no IVRS numbers are found.
     """
-    metadata = MetaData()
-    mp_table = Table(
-        'mp_website_credentials', metadata,
-        Column('id', Integer, primary_key=True),
-        Column('ivrs_no', String, nullable=False)
-    )
-
     try:
         with engine.connect() as connection:
             query = select(mp_table.c.ivrs_no)
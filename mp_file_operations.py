@@ -1,40 +1,52 @@
 import os
-import time
 import logging
+from download_watcher import wait_for_download
+from bill_store import store_bill_file
 
-def rename_latest_pdf_file(download_path: str, ivrs_no: str) -> None:
+# Maximum time to wait for the bill download to finish
+DOWNLOAD_TIMEOUT = 60
+
+def get_bill_file_name(ivrs_no: str) -> str:
+    """
+    Return the human file name of an IVRS number's bill.
+
+    Args:
+        ivrs_no (str): IVRS number the bill belongs to.
+
+    Returns:
+        str: `IVRS-<no>.pdf`.
+    """
+    return f"IVRS-{ivrs_no}.pdf"
+
+def rename_latest_pdf_file(download_path: str, ivrs_no: str, destination_path: str = None,
+                           since: float = 0.0) -> str:
     """
     Rename the latest downloaded PDF file using the IVRS number.
 
+    The file is ingested into the bill store; the IVRS name is a link to its
+    blob and always points at the latest bill.
+
     Args:
         download_path (str): Directory path where files are downloaded.
         ivrs_no (str): IVRS number to be used for renaming the file.
+        destination_path (str): Directory the renamed file is moved into. Defaults to download_path.
+        since (float): Epoch timestamp taken just before the download was triggered. Only PDFs
+            written after it are considered; the default accepts any PDF.
+
+    Returns:
+        str: Path of the renamed file.
 
     Raises:
         FileNotFoundError: If no PDF file is found in the download directory.
     """
-    time.sleep(10)
-    
-    files = os.listdir(download_path)
-    pdf_files = [f for f in files if f.endswith('.pdf')]
-    
-    if pdf_files:
-        latest_file = max(pdf_files, key=lambda f: os.path.getctime(os.path.join(download_path, f)))
-        old_filename = os.path.join(download_path, latest_file)
-        new_filename = os.path.join(download_path, f"IVRS-{ivrs_no}.pdf")
-        
+    destination_path = destination_path or download_path
+    old_filename = wait_for_download(download_path, ivrs_no, since, DOWNLOAD_TIMEOUT, "mp_download_complete")
+
+    if old_filename:
         if os.path.exists(old_filename):
-            if not os.path.exists(new_filename):
-                os.rename(old_filename, new_filename)
-                logging.info(f"Renamed file to: {new_filename}")
-            else:
-                logging.warning(f"File {new_filename} already exists. Attempting to rename with a new pattern.")
-                counter = 1
-                while os.path.exists(new_filename):
-                    new_filename = os.path.join(download_path, f"IVRS-{ivrs_no}_{counter}.pdf")
-                    counter += 1
-                os.rename(old_filename, new_filename)
-                logging.info(f"Renamed file to: {new_filename}")
+            new_filename = store_bill_file(old_filename, destination_path, get_bill_file_name(ivrs_no)).path
+            logging.info(f"Renamed file to: {new_filename}")
+            return new_filename
         else:
             logging.error(f"Original file {old_filename} not found.")
             raise FileNotFoundError(f"Original file {old_filename} not found.")
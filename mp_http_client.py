@@ -0,0 +1,411 @@
+import os
+import re
+import html
+import json
+import logging
+import argparse
+import tempfile
+from http.cookies import SimpleCookie
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, quote_plus
+import urllib3
+from mp_automation.mp_file_operations import get_bill_file_name
+from bill_store import store_bill_bytes
+from stage_timing import timed_stage
+from config import LOGIN_URL_MP, DOWNLOAD_PATH_1, MP_HTTP_TEMPLATE_PATH, MP_HTTP_POOL_SIZE, MP_HTTP_TIMEOUT
+
+# Browserless fast path for the M.P. website.
+#
+# The request sequence behind "navigate, enter IVRS, submit, View Full Bill" is
+# captured once through selenium-wire and saved as a JSON template. Each bill is
+# then fetched by replaying that sequence over a pooled HTTP client. Templates use
+# {{BASE_URL}} for the portal origin (taken from LOGIN_URL_MP, so a local stand-in
+# server can be targeted) and {{IVRS_NO}} for the IVRS number. A step may also
+# define "extract": {"name": "regex"}; the first group of the regex is read from
+# that step's response (HTML-unescaped) and substituted as {{name}} in later
+# steps, or URL-encoded as {{name|url}}. Capture generates these rules for the
+# hidden form fields (__VIEWSTATE, CSRF tokens, ...) that later requests post back.
+
+IVRS_PLACEHOLDER = "{{IVRS_NO}}"
+BASE_URL_PLACEHOLDER = "{{BASE_URL}}"
+
+STATIC_SUFFIXES = ('.js', '.css', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico',
+                   '.woff', '.woff2', '.ttf', '.eot', '.map')
+DROPPED_HEADERS = {'cookie', 'content-length', 'host', 'connection', 'accept-encoding'}
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+INPUT_TAG_PATTERN = re.compile(r'<input\b[^>]*>', re.IGNORECASE)
+ATTRIBUTE_PATTERN = re.compile(r'([\w-]+)\s*=\s*(["\'])(.*?)\2', re.DOTALL)
+
+_http_pool: Optional[urllib3.PoolManager] = None
+
+
+class BillPageShapeChanged(Exception):
+    """Raised when the portal's responses no longer match the captured request template."""
+
+
+def get_portal_base_url() -> str:
+    """
+    Return the origin of the M.P. website.
+
+    Returns:
+        str: Scheme and host of LOGIN_URL_MP.
+    """
+    parts = urlsplit(LOGIN_URL_MP)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_http_pool() -> urllib3.PoolManager:
+    """
+    Return the process-wide pooled HTTP client, creating it on first use.
+
+    Returns:
+        urllib3.PoolManager: Connection pool shared by all bills of this process.
+    """
+    global _http_pool
+    if _http_pool is None:
+        _http_pool = urllib3.PoolManager(
+            maxsize=MP_HTTP_POOL_SIZE,
+            block=False,
+            timeout=urllib3.Timeout(total=MP_HTTP_TIMEOUT),
+            retries=urllib3.Retry(total=2, backoff_factor=0.5, redirect=False),
+        )
+    return _http_pool
+
+
+def load_mp_request_template(template_path: str = MP_HTTP_TEMPLATE_PATH) -> Optional[List[Dict]]:
+    """
+    Load the captured request sequence.
+
+    Args:
+        template_path (str): Path of the JSON template.
+
+    Returns:
+        Optional[List[Dict]]: The request steps, or None if no template was captured yet.
+    """
+    if not os.path.exists(template_path):
+        return None
+    with open(template_path) as file:
+        return json.load(file)["steps"]
+
+
+def _substitute(text: str, values: Dict[str, str]) -> str:
+    """
+    Replace {{name}} and URL-encoded {{name|url}} placeholders in a template string.
+
+    Args:
+        text (str): Template string.
+        values (Dict[str, str]): Placeholder values by name.
+
+    Returns:
+        str: The string with every known placeholder replaced.
+    """
+    for name, value in values.items():
+        text = text.replace("{{" + name + "|url}}", quote_plus(value)).replace("{{" + name + "}}", value)
+    return text
+
+
+def _is_pdf(response: urllib3.HTTPResponse) -> bool:
+    """
+    Check whether a response carries a PDF document.
+
+    Args:
+        response (urllib3.HTTPResponse): Response to check.
+
+    Returns:
+        bool: True if the body starts with the PDF signature.
+    """
+    return response.data[:5] == b'%PDF-'
+
+
+def write_bill_atomically(content: bytes, destination_path: str, ivrs_no: str) -> str:
+    """
+    Store the bill and expose it under its IVRS name, each in one atomic step.
+
+    Args:
+        content (bytes): PDF bytes.
+        destination_path (str): Directory the bill is saved in.
+        ivrs_no (str): IVRS number used for the file name.
+
+    Returns:
+        str: Path of the saved bill.
+    """
+    return store_bill_bytes(content, destination_path, get_bill_file_name(ivrs_no)).path
+
+
+@timed_stage
+def fetch_bill_over_http(ivrs_no: str, destination_path: str = DOWNLOAD_PATH_1,
+                         steps: Optional[List[Dict]] = None) -> str:
+    """
+    Download the bill for an IVRS number by replaying the captured request sequence.
+
+    Args:
+        ivrs_no (str): IVRS number for which the bill is to be downloaded.
+        destination_path (str): Directory the bill is saved in.
+        steps (Optional[List[Dict]]): Request steps; loaded from MP_HTTP_TEMPLATE_PATH when omitted.
+
+    Returns:
+        str: Path of the downloaded bill.
+
+    Raises:
+        BillPageShapeChanged: If there is no template or a response does not match it.
+    """
+    steps = steps if steps is not None else load_mp_request_template()
+    if not steps:
+        raise BillPageShapeChanged("No MP request template captured yet.")
+
+    pool = get_http_pool()
+    values = {"BASE_URL": get_portal_base_url(), "IVRS_NO": ivrs_no}
+    cookies: Dict[str, str] = {}
+    response = None
+
+    for index, step in enumerate(steps):
+        headers = {name: _substitute(value, values) for name, value in step.get("headers", {}).items()}
+        if cookies:
+            headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in cookies.items())
+        body = step.get("body")
+        response = pool.request(
+            step["method"],
+            _substitute(step["url"], values),
+            body=_substitute(body, values).encode() if body else None,
+            headers=headers,
+            redirect=False,
+        )
+
+        if response.status != step.get("status", response.status):
+            raise BillPageShapeChanged(
+                f"Step {index} returned HTTP {response.status}, expected {step['status']}."
+            )
+        for set_cookie in response.headers.getlist("Set-Cookie"):
+            parsed = SimpleCookie()
+            parsed.load(set_cookie)
+            cookies.update({name: morsel.value for name, morsel in parsed.items()})
+        for name, pattern in step.get("extract", {}).items():
+            match = re.search(pattern, response.data.decode("utf-8", errors="ignore"))
+            if not match:
+                raise BillPageShapeChanged(f"Step {index} response has no match for '{name}'.")
+            values[name] = html.unescape(match.group(1))
+
+    if response is None or not _is_pdf(response):
+        raise BillPageShapeChanged("Last step of the MP request template did not return a PDF.")
+
+    bill_path = write_bill_atomically(response.data, destination_path, ivrs_no)
+    logging.info(f"Bill fetched over HTTP for IVRS number {ivrs_no}: {bill_path}")
+    return bill_path
+
+
+def try_fetch_bill_over_http(ivrs_no: str, destination_path: str = DOWNLOAD_PATH_1) -> Optional[str]:
+    """
+    Try the HTTP fast path and report whether the browser path is still needed.
+
+    Args:
+        ivrs_no (str): IVRS number for which the bill is to be downloaded.
+        destination_path (str): Directory the bill is saved in.
+
+    Returns:
+        Optional[str]: Path of the downloaded bill, or None if the caller must fall back to Selenium.
+    """
+    try:
+        return fetch_bill_over_http(ivrs_no, destination_path)
+    except (BillPageShapeChanged, urllib3.exceptions.HTTPError) as e:
+        logging.warning(f"HTTP fast path failed for IVRS number {ivrs_no}: {e}. Falling back to the browser.")
+        return None
+
+
+def find_hidden_fields(page: str) -> Dict[str, str]:
+    """
+    Read the hidden inputs of an HTML page.
+
+    Args:
+        page (str): HTML document.
+
+    Returns:
+        Dict[str, str]: Unescaped value of every named hidden input.
+    """
+    fields = {}
+    for tag in INPUT_TAG_PATTERN.findall(page):
+        attributes = {name.lower(): value for name, _, value in ATTRIBUTE_PATTERN.findall(tag)}
+        if attributes.get('type', '').lower() == 'hidden' and attributes.get('name'):
+            fields[attributes['name']] = html.unescape(attributes.get('value', ''))
+    return fields
+
+
+def hidden_field_pattern(name: str) -> str:
+    """
+    Build the extract rule reading a hidden input's value, whatever the attribute order.
+
+    Args:
+        name (str): Name of the hidden input.
+
+    Returns:
+        str: Regex whose first group is the input's value.
+    """
+    return rf"""<input(?=[^>]*\bname=["']{re.escape(name)}["'])[^>]*\bvalue=["']([^"']*)["']"""
+
+
+def _generalize_fields(query: str, ivrs_no: str,
+                       hidden_fields: Dict[str, Tuple[str, int]]) -> Tuple[Optional[str], List[str]]:
+    """
+    Replace the IVRS number and posted-back hidden fields in a URL-encoded field list.
+
+    Only values equal to the IVRS number or to a hidden field served earlier are
+    replaced; every other field is kept as captured.
+
+    Args:
+        query (str): URL-encoded fields, from a query string or a form body.
+        ivrs_no (str): IVRS number used during capture.
+        hidden_fields (Dict[str, Tuple[str, int]]): Hidden fields seen so far, with the step that served them.
+
+    Returns:
+        Tuple[Optional[str], List[str]]: The generalized fields, or None when nothing was replaced,
+            and the names of the hidden fields that were replaced.
+    """
+    parts = []
+    replaced = []
+    changed = False
+    for name, value in parse_qsl(query, keep_blank_values=True):
+        if value == ivrs_no:
+            parts.append(f"{quote_plus(name)}={IVRS_PLACEHOLDER}")
+            changed = True
+        elif value and name in hidden_fields and hidden_fields[name][0] == value:
+            parts.append(f"{quote_plus(name)}={{{{{name}|url}}}}")
+            replaced.append(name)
+            changed = True
+        else:
+            parts.append(f"{quote_plus(name)}={quote_plus(value)}")
+    return ("&".join(parts) if changed else None), replaced
+
+
+def _generalize_url(url: str, ivrs_no: str, base_url: str) -> str:
+    """
+    Replace the portal origin and an IVRS number query parameter in a URL.
+
+    Args:
+        url (str): Captured URL.
+        ivrs_no (str): IVRS number used during capture.
+        base_url (str): Portal origin used during capture.
+
+    Returns:
+        str: URL template.
+    """
+    if url.startswith(base_url):
+        url = BASE_URL_PLACEHOLDER + url[len(base_url):]
+    parts = urlsplit(url)
+    query, _ = _generalize_fields(parts.query, ivrs_no, {})
+    return urlunsplit(parts._replace(query=query)) if query is not None else url
+
+
+def _template_from_request(request, ivrs_no: str, base_url: str,
+                           hidden_fields: Dict[str, Tuple[str, int]]) -> Tuple[Dict, List[str]]:
+    """
+    Convert a captured selenium-wire request into a template step.
+
+    The IVRS number is only replaced where it is a parameter value, in the query
+    string or the form body; hidden fields posted back from an earlier page
+    become placeholders filled from that page's response.
+
+    Args:
+        request: selenium-wire request with its response.
+        ivrs_no (str): IVRS number used during capture.
+        base_url (str): Portal origin used during capture.
+        hidden_fields (Dict[str, Tuple[str, int]]): Hidden fields seen so far, with the step that served them.
+
+    Returns:
+        Tuple[Dict, List[str]]: Template step and the hidden fields it posts back.
+    """
+    headers = {}
+    for name, value in request.headers.items():
+        if name.lower() in DROPPED_HEADERS:
+            continue
+        headers[name] = _generalize_url(value, ivrs_no, base_url) if name.lower() == 'referer' \
+            else value.replace(base_url, BASE_URL_PLACEHOLDER)
+    step = {
+        "method": request.method,
+        "url": _generalize_url(request.url, ivrs_no, base_url),
+        "headers": headers,
+        "status": request.response.status_code,
+    }
+    replaced = []
+    if request.body:
+        body = request.body.decode("utf-8", errors="ignore")
+        if request.headers.get('Content-Type', '').startswith(FORM_CONTENT_TYPE):
+            generalized, replaced = _generalize_fields(body, ivrs_no, hidden_fields)
+            body = generalized if generalized is not None else body
+        step["body"] = body
+    return step, replaced
+
+
+def capture_mp_request_template(ivrs_no: str, template_path: str = MP_HTTP_TEMPLATE_PATH) -> List[Dict]:
+    """
+    Run the browser flow once through selenium-wire and save its request sequence.
+
+    Static assets and requests to other hosts are dropped; the sequence ends with
+    the first response carrying a PDF. Hidden form fields posted back by a step
+    get an extract rule on the step whose page served them.
+
+    Args:
+        ivrs_no (str): A valid IVRS number to run the flow with.
+        template_path (str): Where the JSON template is written.
+
+    Returns:
+        List[Dict]: The captured request steps.
+
+    Raises:
+        ValueError: If the flow did not produce a PDF response.
+    """
+    from seleniumwire import webdriver as wire_webdriver
+    from seleniumwire.utils import decode
+    from selenium.webdriver.chrome.service import Service
+    from mp_automation.mp_webdriver import configure_chrome_download_preferences
+    from mp_automation.mp_website import download_bill_for_ivrs
+    from config import CHROMEDRIVER_PATH
+
+    base_url = get_portal_base_url()
+    portal_host = urlsplit(base_url).netloc
+    download_path = tempfile.mkdtemp(prefix="mp_capture_")
+    driver = wire_webdriver.Chrome(service=Service(CHROMEDRIVER_PATH),
+                                   options=configure_chrome_download_preferences(download_path))
+    try:
+        download_bill_for_ivrs(driver, ivrs_no, download_path)
+        steps = []
+        # Hidden field name -> (value, index of the step whose response served it)
+        hidden_fields: Dict[str, Tuple[str, int]] = {}
+        for request in driver.requests:
+            parts = urlsplit(request.url)
+            if request.response is None or parts.netloc != portal_host:
+                continue
+            if parts.path.lower().endswith(STATIC_SUFFIXES):
+                continue
+            step, posted_back = _template_from_request(request, ivrs_no, base_url, hidden_fields)
+            for name in posted_back:
+                source = hidden_fields[name][1]
+                steps[source].setdefault("extract", {})[name] = hidden_field_pattern(name)
+            steps.append(step)
+            content_type = request.response.headers.get('Content-Type', '')
+            if content_type.startswith('application/pdf') or request.response.body[:5] == b'%PDF-':
+                break
+            if content_type.startswith('text/html'):
+                body = decode(request.response.body, request.response.headers.get('Content-Encoding', 'identity'))
+                for name, value in find_hidden_fields(body.decode("utf-8", errors="ignore")).items():
+                    hidden_fields[name] = (value, len(steps) - 1)
+        else:
+            raise ValueError("Captured MP flow did not return a PDF response.")
+    finally:
+        driver.quit()
+
+    with open(template_path, "w") as file:
+        json.dump({"steps": steps}, file, indent=2)
+    logging.info(f"Captured {len(steps)} MP request steps into {template_path}.")
+    return steps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture or try the MP HTTP fast path.")
+    parser.add_argument("command", choices=["capture", "fetch"])
+    parser.add_argument("ivrs_no")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == "capture":
+        capture_mp_request_template(args.ivrs_no)
+    else:
+        fetch_bill_over_http(args.ivrs_no)
@@ -0,0 +1,69 @@
+import logging
+from typing import Callable
+from selenium import webdriver
+from sqlalchemy.engine import Engine
+from mp_automation.mp_website import download_bill_for_ivrs
+from mp_automation.mp_alert_handler import handle_unexpected_alert
+from mp_automation.mp_http_client import try_fetch_bill_over_http
+from bill_ledger import try_record_fetched_bill
+from bill_outcomes import set_outcome_file_path
+from bill_parser import submit_bill_for_parsing
+from browser_profiles import log_browser_footprint
+from profile_template import remove_profile_clone
+from storage_layout import get_archive_dir
+from config import DOWNLOAD_PATH_1, MP_DOWNLOAD_ENGINE, MP_ALERT_CHECK_TIMEOUT
+
+# Per-IVRS bill pipeline shared by the single-browser loop and the worker pool
+
+
+def process_ivrs_number(ivrs_no: str, get_driver: Callable[[], webdriver.Chrome], engine: Engine,
+                        download_path: str = DOWNLOAD_PATH_1, destination_path: str = None) -> bool:
+    """
+    Download and record the bill of one IVRS number.
+
+    With the HTTP engine the browser is only requested when the fast path fails.
+
+    Args:
+        ivrs_no (str): IVRS number for which the bill is to be downloaded.
+        get_driver (Callable[[], webdriver.Chrome]): Returns the worker's browser, starting it if needed.
+        engine (Engine): SQLAlchemy engine used for the ledger.
+        download_path (str): Directory the browser downloads into.
+        destination_path (str): Directory the renamed bill is exposed in. Defaults to the IVRS
+            number's archive directory.
+
+    Returns:
+        bool: False if the browser hit an unexpected alert and should be recycled.
+    """
+    destination_path = destination_path or get_archive_dir("mp", ivrs_no)
+    bill_path = None
+    if MP_DOWNLOAD_ENGINE == "http":
+        bill_path = try_fetch_bill_over_http(ivrs_no, destination_path)
+    if bill_path:
+        set_outcome_file_path(bill_path)
+        try_record_fetched_bill(engine, "mp", ivrs_no, bill_path)
+        submit_bill_for_parsing("mp", ivrs_no, bill_path)
+        logging.info("Process completed over HTTP for IVRS number: %s", ivrs_no)
+        return True
+
+    driver = get_driver()
+    bill_path = download_bill_for_ivrs(driver, ivrs_no, download_path, destination_path)
+    set_outcome_file_path(bill_path)
+    try_record_fetched_bill(engine, "mp", ivrs_no, bill_path)
+    submit_bill_for_parsing("mp", ivrs_no, bill_path)
+    logging.info("Process completed successfully for IVRS number: %s", ivrs_no)
+    return handle_unexpected_alert(driver, MP_ALERT_CHECK_TIMEOUT)
+
+
+def quit_mp_driver(driver: webdriver.Chrome) -> None:
+    """
+    Quit a browser, logging instead of raising on failure.
+
+    Args:
+        driver (webdriver.Chrome): WebDriver instance.
+    """
+    log_browser_footprint(driver, "mp")
+    try:
+        driver.quit()
+    except Exception as e:
+        logging.error(f"Failed to quit driver: {e}")
+    remove_profile_clone(driver)
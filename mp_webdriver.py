@@ -1,4 +1,5 @@
 import logging
+import shutil
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -7,17 +8,21 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.common.exceptions import TimeoutException
-from config import CHROMEDRIVER_PATH
+from browser_profiles import apply_browser_profile, prepare_browser
+from profile_template import apply_profile_template
+from command_profiler import install_command_profiler
+from config import CHROMEDRIVER_PATH, MP_BROWSER_PROFILE
 
 # WebDriver Initialization
 
 
-def configure_chrome_download_preferences(download_path: str) -> Options:
+def configure_chrome_download_preferences(download_path: str, debugging_port: int = 9222) -> Options:
     """
     Configure Chrome options for downloading files.
     
     Args:
         download_path (str): Directory path where files will be downloaded.
+        debugging_port (int): Remote debugging port, unique per running Chrome instance.
     
     Returns:
         Options: Configured ChromeOptions instance.
@@ -34,28 +39,45 @@ def configure_chrome_download_preferences(download_path: str) -> Options:
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--remote-debugging-port=9222")
+    chrome_options.add_argument(f"--remote-debugging-port={debugging_port}")
+    apply_browser_profile(chrome_options, "mp", MP_BROWSER_PROFILE)
 
     return chrome_options
 
-def initialize_chrome_driver(download_path: str) -> webdriver.Chrome:
+def initialize_chrome_driver(download_path: str, debugging_port: int = 9222) -> webdriver.Chrome:
     """
     Initialize the Chrome WebDriver with specified options.
+
+    When a profile template is built, Chrome starts from a private clone of it
+    so the portal's static assets are already cached.
     
     Args:
         download_path (str): Directory path where files will be downloaded.
+        debugging_port (int): Remote debugging port for this Chrome instance.
     
     Returns:
         webdriver.Chrome: Configured WebDriver instance.
     """
-    chrome_options = configure_chrome_download_preferences(download_path)
+    chrome_options = configure_chrome_download_preferences(download_path, debugging_port)
+    clone_dir = apply_profile_template(chrome_options, "mp")
     service = Service(CHROMEDRIVER_PATH)
+    driver = None
     try:
         driver = webdriver.Chrome(service=service, options=chrome_options)
-        driver.maximize_window()
+        driver.profile_clone_dir = clone_dir
+        install_command_profiler(driver)
+        prepare_browser(driver, "mp", MP_BROWSER_PROFILE, download_path)
         return driver
     except Exception as e:
         logging.error(f"Failed to initialize Chrome driver: {e}")
+        # A browser that started but could not be prepared must not outlive the failure.
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception as quit_error:
+                logging.error(f"Failed to quit driver: {quit_error}")
+        if clone_dir:
+            shutil.rmtree(clone_dir, ignore_errors=True)
         raise
 
 
@@ -3,11 +3,19 @@ import time
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium import webdriver
+from selenium.webdriver.support import expected_conditions as EC
 from mp_automation.mp_web_interaction import wait_for_page_load, locate_element, click_on_element
 from mp_automation.mp_file_operations import rename_latest_pdf_file
+from wait_engine import wait_until
+from download_watcher import get_download_watcher
+from stage_timing import timed_stage, record_span
+from browser_profiles import measure_page_load
 from config import LOGIN_URL_MP, DOWNLOAD_PATH_1
 
+FULL_BILL_BUTTON_XPATH = "//button[contains(text(), 'View Full Bill (English)')]"
 
+
+@timed_stage
 def navigate_to_mp_website(driver: webdriver.Chrome) -> None:
     """
     Navigate to the website and perform initial setup.
@@ -17,8 +25,10 @@ def navigate_to_mp_website(driver: webdriver.Chrome) -> None:
     """
     driver.get(LOGIN_URL_MP)
     wait_for_page_load(driver)
+    record_span("page_load", measure_page_load(driver), "ok")
     logging.info("Navigated to M.P. Pashchim Kshetra Vidyut Vitaran Co. Ltd. website.")
 
+@timed_stage
 def input_ivrs_number(driver: webdriver.Chrome, ivrs_no: str) -> None:
     """
     Input IVRS number into the form.
@@ -36,6 +46,7 @@ def input_ivrs_number(driver: webdriver.Chrome, ivrs_no: str) -> None:
         logging.error(f"Error entering IVRS number {ivrs_no}: {e}")
         raise
 
+@timed_stage
 def submit_form(driver: webdriver.Chrome, ivrs_no: str) -> None:
     """
     Submit the form to view the bill.
@@ -45,9 +56,14 @@ def submit_form(driver: webdriver.Chrome, ivrs_no: str) -> None:
         ivrs_no (str): IVRS number used for logging.
     """
     click_on_element(driver, By.XPATH, "//input[contains(@class, 'btn-warning')]")
-    time.sleep(5)
+    # The bill view renders the full bill button; an invalid IVRS raises an alert instead.
+    wait_until(driver, EC.any_of(
+        EC.presence_of_element_located((By.XPATH, FULL_BILL_BUTTON_XPATH)),
+        EC.alert_is_present(),
+    ), 30, "mp_submit_form")
     logging.info("Login submitted for IVRS number: %s", ivrs_no)
 
+@timed_stage
 def click_full_bill_button(driver: webdriver.Chrome) -> None:
     """
     Click the "Full Bill" button.
@@ -55,30 +71,46 @@ def click_full_bill_button(driver: webdriver.Chrome) -> None:
     Args:
         driver (webdriver.Chrome): WebDriver instance.
     """
-    click_on_element(driver, By.XPATH, "//button[contains(text(), 'View Full Bill (English)')]")
-    time.sleep(5)
+    click_on_element(driver, By.XPATH, FULL_BILL_BUTTON_XPATH)
 
-def handle_post_download(ivrs_no: str) -> None:
+@timed_stage
+def handle_post_download(ivrs_no: str, download_path: str = DOWNLOAD_PATH_1, destination_path: str = None,
+                         since: float = 0.0) -> str:
     """
     Handle post-download steps such as renaming the file.
     
     Args:
         ivrs_no (str): IVRS number used for renaming the file.
+        download_path (str): Directory this browser downloads into.
+        destination_path (str): Directory the renamed bill is moved into. Defaults to download_path.
+        since (float): Epoch timestamp taken just before the download was triggered.
+
+    Returns:
+        str: Path of the renamed bill.
     """
-    rename_latest_pdf_file(DOWNLOAD_PATH_1, ivrs_no)
+    bill_path = rename_latest_pdf_file(download_path, ivrs_no, destination_path, since)
     logging.info(f"Bill downloaded and renamed for IVRS number: {ivrs_no}")
+    return bill_path
 
-def download_bill_for_ivrs(driver: webdriver.Chrome, ivrs_no: str) -> None:
+def download_bill_for_ivrs(driver: webdriver.Chrome, ivrs_no: str, download_path: str = DOWNLOAD_PATH_1,
+                           destination_path: str = None) -> str:
     """
     Download the bill for the provided IVRS number.
     
     Args:
         driver (webdriver.Chrome): WebDriver instance.
         ivrs_no (str): IVRS number for which the bill is to be downloaded.
+        download_path (str): Directory the driver was configured to download into.
+        destination_path (str): Directory the renamed bill is moved into. Defaults to download_path.
+
+    Returns:
+        str: Path of the downloaded bill.
     """
     navigate_to_mp_website(driver)
     input_ivrs_number(driver, ivrs_no)
     submit_form(driver, ivrs_no)
-    click_full_bill_button(driver)  
-    handle_post_download(ivrs_no)
+    get_download_watcher(download_path)
+    download_started = time.time()
+    click_full_bill_button(driver)
+    return handle_post_download(ivrs_no, download_path, destination_path, download_started)
 
@@ -0,0 +1,108 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Tuple
+from mp_automation.mp_webdriver import initialize_chrome_driver
+from mp_automation.mp_database import create_database_engine
+from mp_automation.mp_pipeline import process_ivrs_number, quit_mp_driver
+from wait_engine import log_wait_summary
+from download_watcher import close_download_watcher
+from command_profiler import log_command_profile
+from bill_ledger import close_ledger_writer
+from bill_outcomes import close_outcome_writer
+from bill_parser import close_bill_parser
+from supervisor import RunCheckpoint, run_supervised
+from work_source import WorkFilter, iter_ivrs_batches, iter_work_items
+from storage_layout import get_staging_dir
+from config import DATABASE_URL, MP_BASE_DEBUGGING_PORT
+
+# Parallel worker pool for the M.P. website
+
+
+def get_worker_download_path(worker_id: int) -> str:
+    """
+    Return the private download directory of a worker.
+
+    Args:
+        worker_id (int): Worker index.
+
+    Returns:
+        str: Staging directory only this worker's Chrome downloads into during this run.
+    """
+    return get_staging_dir("mp", worker_id)
+
+
+def run_mp_worker(worker_id: int, work_filter: WorkFilter) -> Tuple[int, int]:
+    """
+    Download the bills of one shard with a dedicated Chrome instance.
+
+    The worker streams its own shard of IVRS numbers from the database. Its
+    Chrome downloads into its own directory and listens on its own debugging
+    port, so `rename_latest_pdf_file` only ever sees this worker's files.
+    Renamed bills are exposed in the archive. The worker runs under the
+    supervisor with its own checkpoint: on an error or unexpected alert only this
+    worker's browser is recycled and the failing IVRS number is retried.
+
+    Args:
+        worker_id (int): Worker index.
+        work_filter (WorkFilter): Rows of this worker, including its shard.
+
+    Returns:
+        Tuple[int, int]: Number of bills downloaded and number of IVRS numbers that failed.
+    """
+    download_path = get_worker_download_path(worker_id)
+    debugging_port = MP_BASE_DEBUGGING_PORT + worker_id
+    logging.info(f"Worker {worker_id} starting with shard {work_filter.shard} on port {debugging_port}.")
+
+    engine = create_database_engine(DATABASE_URL)
+    succeeded, failed = run_supervised(
+        iter_work_items(iter_ivrs_batches(engine, work_filter)),
+        RunCheckpoint("mp", worker_id),
+        lambda ivrs_no, get_driver: process_ivrs_number(ivrs_no, get_driver, engine, download_path),
+        open_worker=lambda: initialize_chrome_driver(download_path, debugging_port),
+        close_worker=quit_mp_driver,
+    )
+
+    close_bill_parser()
+    close_outcome_writer()
+    close_ledger_writer()
+    close_download_watcher(download_path)
+    log_wait_summary()
+    log_command_profile()
+    logging.info(f"Worker {worker_id} finished: {succeeded} downloaded, {failed} failed.")
+    return succeeded, failed
+
+
+def run_mp_worker_pool(worker_count: int, work_filter: WorkFilter = WorkFilter()) -> Tuple[int, int]:
+    """
+    Process the IVRS numbers with a pool of independent browser workers.
+
+    Each worker runs in its own process so throughput scales with cores, and
+    reads only its own shard (id % worker_count) of the credentials table.
+
+    Args:
+        worker_count (int): Number of parallel workers.
+        work_filter (WorkFilter): Rows to process; its shard is set per worker.
+
+    Returns:
+        Tuple[int, int]: Total bills downloaded and total IVRS numbers that failed.
+    """
+    logging.info(f"Starting MP worker pool with {worker_count} workers.")
+
+    succeeded = 0
+    failed = 0
+    with ProcessPoolExecutor(max_workers=worker_count) as executor:
+        futures = {
+            executor.submit(run_mp_worker, worker_id, work_filter._replace(shard=(worker_id, worker_count))): worker_id
+            for worker_id in range(worker_count)
+        }
+        for future in as_completed(futures):
+            worker_id = futures[future]
+            try:
+                worker_succeeded, worker_failed = future.result()
+                succeeded += worker_succeeded
+                failed += worker_failed
+            except Exception as e:
+                logging.error(f"Worker {worker_id} crashed: {e}")
+
+    logging.info(f"MP worker pool finished: {succeeded} downloaded, {failed} failed.")
+    return succeeded, failed
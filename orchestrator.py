@@ -0,0 +1,307 @@
+import math
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+from mp_automation.mp_database import create_database_engine
+from mp_automation.mp_webdriver import initialize_chrome_driver
+from mp_automation.mp_pipeline import process_ivrs_number, quit_mp_driver
+from mh_automation.mh_config import launch_browser
+from mh_automation.mh_database import reflect_mh_table
+from mh_automation.mh_session import reset_browser_session
+from mh_automation.mh_pipeline import process_mh_account, quit_mh_browser
+from bill_ledger import ensure_ledger_table, close_ledger_writer
+from bill_outcomes import close_outcome_writer
+from bill_parser import close_bill_parser
+from stage_timing import get_run_id, log_stage_summary
+from supervisor import RunCheckpoint, run_supervised, load_processed_keys, clear_checkpoints
+from wait_engine import log_wait_summary
+from command_profiler import log_command_profile
+from work_source import WorkFilter, iter_ivrs_batches, iter_mh_credential_batches, iter_work_items, credential_key
+from storage_layout import get_staging_dir, clear_staging
+from config import (DATABASE_URL, MP_BASE_DEBUGGING_PORT, MH_ACCOUNTS_PER_BROWSER,
+                    SKIP_FETCHED_BILLS, ORCHESTRATOR_MAX_BROWSERS, ORCHESTRATOR_MP_RECYCLE_AFTER)
+
+# Runs both portals concurrently in one process.
+#
+# Each portal is processed by several lanes. A lane is one supervised loop with
+# its own browser, download directory and checkpoint, run in the portal's
+# bounded thread pool; all lanes of a portal pull from one shared work stream.
+# Browsers are opened through a FairBrowserCap, so the total stays under
+# ORCHESTRATOR_MAX_BROWSERS and a busy portal cannot starve the other one.
+
+PORTALS = ("mp", "mh")
+
+
+class FairBrowserCap:
+    """
+    Global limit on open browsers, shared fairly between portals.
+
+    A portal may always use free slots while no other portal is waiting. Once
+    another portal waits, a portal holding its fair share (capacity divided by
+    the portals wanting browsers) gets no new slot until the waiting portal
+    has caught up. Lanes recycle their browsers periodically, so slots rotate.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Create the cap.
+
+        Args:
+            capacity (int): Most browsers open at the same time.
+        """
+        self.capacity = capacity
+        self._in_use: Dict[str, int] = {}
+        self._waiting: Dict[str, int] = {}
+        self._condition = threading.Condition()
+
+    def _may_acquire(self, portal: str) -> bool:
+        """
+        Check whether a portal may take a slot now; the caller holds the condition.
+
+        Args:
+            portal (str): Requesting portal.
+
+        Returns:
+            bool: True if a slot is free and taking it stays within the portal's fair share.
+        """
+        if sum(self._in_use.values()) >= self.capacity:
+            return False
+        others_waiting = any(count for name, count in self._waiting.items() if name != portal)
+        if not others_waiting:
+            return True
+        demanding = {name for name, count in self._in_use.items() if count} | \
+                    {name for name, count in self._waiting.items() if count}
+        fair_share = math.ceil(self.capacity / max(len(demanding), 1))
+        return self._in_use.get(portal, 0) < fair_share
+
+    def acquire(self, portal: str) -> None:
+        """
+        Block until the portal may open one more browser.
+
+        Args:
+            portal (str): Requesting portal.
+        """
+        with self._condition:
+            self._waiting[portal] = self._waiting.get(portal, 0) + 1
+            try:
+                self._condition.wait_for(lambda: self._may_acquire(portal))
+            finally:
+                self._waiting[portal] -= 1
+            self._in_use[portal] = self._in_use.get(portal, 0) + 1
+
+    def release(self, portal: str) -> None:
+        """
+        Give a browser slot back.
+
+        Args:
+            portal (str): Portal that closed a browser.
+        """
+        with self._condition:
+            self._in_use[portal] -= 1
+            self._condition.notify_all()
+
+
+class SharedItems:
+    """Thread-safe iterator handing the items of one work stream to several lanes."""
+
+    def __init__(self, items: Iterable[Any], item_key: Callable[[Any], str], skip_keys: Iterable[str] = ()):
+        """
+        Wrap a work stream.
+
+        Args:
+            items (Iterable[Any]): Work items.
+            item_key (Callable[[Any], str]): Returns the checkpoint key of an item.
+            skip_keys (Iterable[str]): Keys already processed in this run by any lane.
+        """
+        self._items = iter(items)
+        self._item_key = item_key
+        self._skip_keys = set(skip_keys)
+        self._lock = threading.Lock()
+
+    def __iter__(self) -> Iterator[Any]:
+        return self
+
+    def __next__(self) -> Any:
+        """Return the next item not processed yet; lanes call this from their own threads."""
+        with self._lock:
+            while True:
+                item = next(self._items)
+                if self._item_key(item) not in self._skip_keys:
+                    return item
+
+
+def get_lane_download_path(portal: str, lane_id: int) -> str:
+    """
+    Return the private download directory of a lane.
+
+    Args:
+        portal (str): "mp" or "mh".
+        lane_id (int): Lane index.
+
+    Returns:
+        str: Staging directory only this lane's browser downloads into during this run.
+    """
+    return get_staging_dir(portal, lane_id)
+
+
+def _run_lane(portal: str, lane_id: int, items: SharedItems, engine, cap: FairBrowserCap) -> Tuple[int, int]:
+    """
+    Run one supervised lane of a portal; blocking, meant for an executor thread.
+
+    Args:
+        portal (str): "mp" or "mh".
+        lane_id (int): Lane index.
+        items (SharedItems): Work stream shared by the portal's lanes.
+        engine: SQLAlchemy engine instance.
+        cap (FairBrowserCap): Global browser cap.
+
+    Returns:
+        Tuple[int, int]: Number of items processed successfully and number that failed.
+    """
+    download_path = get_lane_download_path(portal, lane_id)
+
+    if portal == "mp":
+        debugging_port = MP_BASE_DEBUGGING_PORT + lane_id
+        open_browser = lambda: initialize_chrome_driver(download_path, debugging_port)
+        close_browser = quit_mp_driver
+        process_item = lambda ivrs_no, get_driver: process_ivrs_number(
+            ivrs_no, get_driver, engine, download_path)
+        options = {'recycle_after': ORCHESTRATOR_MP_RECYCLE_AFTER}
+    else:
+        open_browser = lambda: launch_browser(download_path)
+        close_browser = quit_mh_browser
+        process_item = lambda credentials, get_driver: process_mh_account(
+            credentials, get_driver, engine, download_path)
+        options = {'reset_worker': reset_browser_session, 'recycle_after': MH_ACCOUNTS_PER_BROWSER,
+                   'item_key': credential_key}
+
+    def open_worker():
+        cap.acquire(portal)
+        try:
+            return open_browser()
+        except Exception:
+            cap.release(portal)
+            raise
+
+    def close_worker(driver) -> None:
+        try:
+            close_browser(driver)
+        finally:
+            cap.release(portal)
+
+    return run_supervised(items, RunCheckpoint(portal, lane_id), process_item,
+                          open_worker=open_worker, close_worker=close_worker, **options)
+
+
+async def run_portal(portal: str, cap: FairBrowserCap, lanes: int,
+                     work_filter: Optional[WorkFilter] = None) -> Tuple[int, int]:
+    """
+    Process one portal with several lanes in a bounded thread pool.
+
+    The portal's checkpoints are only cleared when every lane finished and no
+    item failed; otherwise they are kept so the next run resumes where this one stopped.
+
+    Args:
+        portal (str): "mp" or "mh".
+        cap (FairBrowserCap): Global browser cap shared with the other portal.
+        lanes (int): Number of lanes, which bounds the portal's threads.
+        work_filter (Optional[WorkFilter]): Rows to process.
+
+    Returns:
+        Tuple[int, int]: Number of items processed successfully and number that failed.
+
+    Raises:
+        RuntimeError: If a lane crashed.
+    """
+    loop = asyncio.get_running_loop()
+    work_filter = work_filter or WorkFilter(due_only=SKIP_FETCHED_BILLS)
+    engine = create_database_engine(DATABASE_URL)
+    await loop.run_in_executor(None, ensure_ledger_table, engine)
+
+    if portal == "mp":
+        stream = iter_work_items(iter_ivrs_batches(engine, work_filter))
+        items = SharedItems(stream, str, load_processed_keys(portal))
+    else:
+        mh_table = await loop.run_in_executor(None, reflect_mh_table, engine)
+        stream = iter_work_items(iter_mh_credential_batches(engine, work_filter, mh_table=mh_table))
+        items = SharedItems(stream, credential_key, load_processed_keys(portal))
+
+    logging.info(f"Starting {portal} with {lanes} lanes.")
+    with ThreadPoolExecutor(max_workers=lanes, thread_name_prefix=f"{portal}-lane") as executor:
+        results = await asyncio.gather(*[
+            loop.run_in_executor(executor, _run_lane, portal, lane_id, items, engine, cap)
+            for lane_id in range(lanes)
+        ], return_exceptions=True)
+
+    succeeded = 0
+    failed = 0
+    crashed = 0
+    for lane_id, result in enumerate(results):
+        if isinstance(result, Exception):
+            logging.error(f"{portal} lane {lane_id} crashed: {result}")
+            crashed += 1
+            continue
+        succeeded += result[0]
+        failed += result[1]
+
+    logging.info(f"{portal} finished: {succeeded} downloaded, {failed} failed.")
+    log_stage_summary(portal)
+    if crashed:
+        raise RuntimeError(f"{crashed} of {lanes} {portal} lanes crashed; checkpoints kept for the next run.")
+    if failed:
+        logging.warning(f"{failed} {portal} items failed; checkpoints kept for the next run.")
+    else:
+        clear_checkpoints(portal)
+    return succeeded, failed
+
+
+async def run_all_portals(portals: Iterable[str] = PORTALS,
+                          max_browsers: int = ORCHESTRATOR_MAX_BROWSERS) -> Dict[str, Tuple[int, int]]:
+    """
+    Run several portals at the same time under one browser cap.
+
+    Each portal gets as many lanes as the cap allows, so a portal can use every
+    slot once the other one has finished.
+
+    Args:
+        portals (Iterable[str]): Portals to run.
+        max_browsers (int): Most browsers open at the same time across all portals.
+
+    Returns:
+        Dict[str, Tuple[int, int]]: Successes and failures per portal.
+    """
+    portals = list(portals)
+    cap = FairBrowserCap(max_browsers)
+    results = await asyncio.gather(*[run_portal(portal, cap, max_browsers) for portal in portals],
+                                   return_exceptions=True)
+    outcome: Dict[str, Tuple[int, int]] = {}
+    for portal, result in zip(portals, results):
+        if isinstance(result, Exception):
+            logging.error(f"{portal} run failed: {result}")
+            continue
+        outcome[portal] = result
+    return outcome
+
+
+def run_orchestrator(portals: Iterable[str] = PORTALS) -> Dict[str, Tuple[int, int]]:
+    """
+    Run the portals concurrently and finish the run's reporting.
+
+    Args:
+        portals (Iterable[str]): Portals to run.
+
+    Returns:
+        Dict[str, Tuple[int, int]]: Successes and failures per portal.
+    """
+    logging.info(f"Run id: {get_run_id()}")
+    try:
+        return asyncio.run(run_all_portals(portals))
+    finally:
+        close_bill_parser()
+        close_outcome_writer()
+        close_ledger_writer()
+        clear_staging()
+        log_wait_summary()
+        log_command_profile()
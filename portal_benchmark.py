@@ -0,0 +1,237 @@
+import os
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Tuple
+from selenium import webdriver
+from mp_automation.mp_webdriver import initialize_chrome_driver
+from mp_automation.mp_website import download_bill_for_ivrs
+from mp_automation.mp_pipeline import quit_mp_driver
+from mh_automation.mh_config import launch_browser
+from mh_automation.mh_login import perform_login
+from mh_automation.mh_bill_access import access_and_download_bill
+from mh_automation.mh_session import reset_browser_session
+from mh_automation.mh_pipeline import quit_mh_browser
+from mh_automation.mh_captcha_benchmark import percentile
+from mock_portals import MockPortalSettings, start_mock_portal, get_mock_login_url
+from storage_layout import get_staging_dir
+from download_watcher import close_download_watcher
+from stage_timing import set_item_context
+from command_profiler import log_command_profile
+from config import (
+    BILL_ARCHIVE_DIR, MP_BASE_DEBUGGING_PORT, BENCHMARK_WORKER_COUNTS, BENCHMARK_BILLS,
+    MOCK_PORTAL_LATENCY_MS, MOCK_PORTAL_JITTER_MS, MOCK_PORTAL_ERROR_RATE
+)
+
+# End-to-end throughput benchmark against the mock portals.
+#
+# The real bill flows (download_bill_for_ivrs for M.P., perform_login and
+# access_and_download_bill for Maharashtra) run in one browser per worker process
+# against the servers of mock_portals.py, for each worker count in turn. Workers
+# are spawned after LOGIN_URL_* and the bill directories have been pointed at the
+# mock portals and a scratch directory, so nothing touches the real sites or the
+# real bill store. A failed bill recycles the worker's browser, as the supervisor does.
+
+MOCK_PASSWORD = "mock-password"
+
+
+class ThroughputResult(NamedTuple):
+    """Throughput of one portal at one worker count."""
+    portal: str
+    workers: int
+    bills: int
+    failed: int
+    seconds: float
+    bills_per_minute: float
+    p50_seconds: float
+    p95_seconds: float
+
+
+def get_benchmark_items(portal: str, count: int) -> List[str]:
+    """
+    Return synthetic IVRS numbers or login names for the mock portals.
+
+    Args:
+        portal (str): "mp" or "mh".
+        count (int): Number of items.
+
+    Returns:
+        List[str]: Items the mock portal accepts.
+    """
+    if portal == "mp":
+        return [str(9000000000 + index) for index in range(count)]
+    return [f"mockuser{index:05d}" for index in range(count)]
+
+
+def open_benchmark_browser(portal: str, worker_id: int, download_path: str) -> webdriver.Chrome:
+    """
+    Launch the browser a portal's flow normally runs in.
+
+    Args:
+        portal (str): "mp" or "mh".
+        worker_id (int): Worker index, used for the M.P. debugging port.
+        download_path (str): Directory the browser downloads into.
+
+    Returns:
+        webdriver.Chrome: WebDriver instance.
+    """
+    if portal == "mp":
+        return initialize_chrome_driver(download_path, MP_BASE_DEBUGGING_PORT + worker_id)
+    return launch_browser(download_path)
+
+
+def run_benchmark_worker(portal: str, worker_id: int, items: List[str]) -> List[Tuple[bool, float]]:
+    """
+    Fetch the bills of a share of the items with one browser.
+
+    Args:
+        portal (str): "mp" or "mh".
+        worker_id (int): Worker index.
+        items (List[str]): IVRS numbers or login names of this worker.
+
+    Returns:
+        List[Tuple[bool, float]]: Whether each bill was saved and how many seconds it took.
+    """
+    download_path = get_staging_dir(portal, worker_id)
+    destination_path = os.path.join(BILL_ARCHIVE_DIR, portal, f"worker_{worker_id}")
+    close_browser = quit_mp_driver if portal == "mp" else quit_mh_browser
+    driver = None
+    results = []
+    for item in items:
+        set_item_context(portal, item)
+        started = time.perf_counter()
+        try:
+            driver = driver or open_benchmark_browser(portal, worker_id, download_path)
+            if portal == "mp":
+                saved = bool(download_bill_for_ivrs(driver, item, download_path, destination_path))
+            else:
+                perform_login(driver, item, MOCK_PASSWORD)
+                saved = bool(access_and_download_bill(driver, download_path, destination_path)[2])
+                reset_browser_session(driver)
+        except Exception as e:
+            logging.error(f"Benchmark worker {worker_id} failed on {item}: {e}")
+            saved = False
+            if driver:
+                close_browser(driver)
+                driver = None
+        results.append((saved, time.perf_counter() - started))
+    if driver:
+        close_browser(driver)
+    close_download_watcher(download_path)
+    log_command_profile()
+    return results
+
+
+def measure_throughput(portal: str, worker_count: int, items: List[str]) -> ThroughputResult:
+    """
+    Run the items through worker_count browsers and measure bills per minute.
+
+    Browser start-up is part of the measured time, as it is in a real run.
+
+    Args:
+        portal (str): "mp" or "mh".
+        worker_count (int): Number of parallel browsers.
+        items (List[str]): Items to fetch, split round-robin between the workers.
+
+    Returns:
+        ThroughputResult: Throughput and per-bill latency.
+    """
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=worker_count, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            executor.submit(run_benchmark_worker, portal, worker_id, items[worker_id::worker_count])
+            for worker_id in range(worker_count)
+        ]
+        for future in futures:
+            results.extend(future.result())
+    seconds = time.perf_counter() - started
+
+    saved = sum(1 for ok, _ in results if ok)
+    durations = [duration for ok, duration in results if ok]
+    return ThroughputResult(
+        portal, worker_count, saved, len(results) - saved, seconds,
+        saved / seconds * 60 if seconds else 0.0,
+        percentile(durations, 0.5), percentile(durations, 0.95),
+    )
+
+
+def format_results(results: List[ThroughputResult]) -> str:
+    """
+    Format benchmark results as a table.
+
+    Args:
+        results (List[ThroughputResult]): Results to format.
+
+    Returns:
+        str: Plain-text table.
+    """
+    lines = [f"{'portal':<7} {'workers':>7} {'bills':>6} {'failed':>6} {'seconds':>8} "
+             f"{'bills/min':>9} {'p50 s':>7} {'p95 s':>7}"]
+    for result in results:
+        lines.append(
+            f"{result.portal:<7} {result.workers:>7} {result.bills:>6} {result.failed:>6} "
+            f"{result.seconds:>8.1f} {result.bills_per_minute:>9.1f} "
+            f"{result.p50_seconds:>7.2f} {result.p95_seconds:>7.2f}"
+        )
+    return "\n".join(lines)
+
+
+def run_portal_benchmark(portals: List[str], worker_counts: List[int], bills: int,
+                         settings: MockPortalSettings = MockPortalSettings(),
+                         keep_files: bool = False) -> List[ThroughputResult]:
+    """
+    Start the mock portals and benchmark every portal at every worker count.
+
+    Args:
+        portals (List[str]): Portals to benchmark.
+        worker_counts (List[int]): Worker counts to measure.
+        bills (int): Bills fetched per measurement.
+        settings (MockPortalSettings): Latency, error rate and captcha noise of the mock portals.
+        keep_files (bool): Keep the scratch directory with the downloaded bills.
+
+    Returns:
+        List[ThroughputResult]: One result per portal and worker count.
+    """
+    scratch_dir = tempfile.mkdtemp(prefix="portal_benchmark_")
+    for name in ("BILL_STORE_DIR", "BILL_STAGING_DIR", "BILL_ARCHIVE_DIR"):
+        os.environ[name] = os.path.join(scratch_dir, name.lower())
+    servers = {portal: start_mock_portal(portal, settings, port=0) for portal in portals}
+    results = []
+    try:
+        for portal, server in servers.items():
+            os.environ[f"LOGIN_URL_{portal.upper()}"] = get_mock_login_url(portal, server)
+            items = get_benchmark_items(portal, bills)
+            for worker_count in worker_counts:
+                result = measure_throughput(portal, worker_count, items)
+                logging.info(f"{portal} with {worker_count} workers: {result.bills_per_minute:.1f} bills/min.")
+                results.append(result)
+    finally:
+        for server in servers.values():
+            server.shutdown()
+        if keep_files:
+            logging.info(f"Benchmark files kept in {scratch_dir}.")
+        else:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bill throughput against the mock portals.")
+    parser.add_argument("--portals", nargs="+", default=["mp", "mh"], choices=["mp", "mh"])
+    parser.add_argument("--workers", nargs="+", type=int, default=BENCHMARK_WORKER_COUNTS)
+    parser.add_argument("--bills", type=int, default=BENCHMARK_BILLS, help="Bills fetched per measurement")
+    parser.add_argument("--latency-ms", type=float, default=MOCK_PORTAL_LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=MOCK_PORTAL_JITTER_MS)
+    parser.add_argument("--error-rate", type=float, default=MOCK_PORTAL_ERROR_RATE)
+    parser.add_argument("--captcha-noise", type=int, default=0, help="Random lines drawn across each captcha")
+    parser.add_argument("--keep-files", action="store_true", help="Keep the downloaded bills")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    settings = MockPortalSettings(args.latency_ms, args.jitter_ms, args.error_rate, args.captcha_noise)
+    print(format_results(run_portal_benchmark(args.portals, args.workers, args.bills, settings, args.keep_files)))
@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import socket
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from wait_engine import wait_until, network_idle
+from config import (LOGIN_URL_MP, LOGIN_URL_MH, BROWSER_PROFILE_TEMPLATE_DIR, USE_BROWSER_PROFILE_TEMPLATE,
+                    BROWSER_PROFILE_TEMPLATE_MAX_AGE_DAYS)
+
+# Pre-built Chrome profile templates.
+#
+# A template is a user-data-dir built once per portal by loading the portal's
+# pages, so its disk cache already holds the static JS, CSS and images. Every new
+# browser gets a private clone of the template (copy-on-write through APFS
+# clonefile on macOS and reflinks on btrfs/XFS, a plain copy otherwise; hardlinks
+# are not used because Chrome rewrites cache files in place). Session state is stripped from the
+# template so a clone starts logged out.
+
+WARMUP_URLS: Dict[str, List[str]] = {
+    "mp": [LOGIN_URL_MP],
+    "mh": [LOGIN_URL_MH],
+}
+
+# Files a running Chrome leaves behind, and session state a clone must not inherit
+STRIPPED_PATHS = [
+    "SingletonLock", "SingletonSocket", "SingletonCookie",
+    os.path.join("Default", "Cookies"), os.path.join("Default", "Cookies-journal"),
+    os.path.join("Default", "Local Storage"), os.path.join("Default", "Session Storage"),
+    os.path.join("Default", "Sessions"), os.path.join("Default", "Current Session"),
+    os.path.join("Default", "Current Tabs"),
+]
+STAMP_FILE = "template.json"
+
+
+def get_template_dir(portal: str) -> str:
+    """
+    Return the directory of a portal's profile template.
+
+    Args:
+        portal (str): "mp" or "mh".
+
+    Returns:
+        str: Template user-data-dir.
+    """
+    return os.path.abspath(os.path.join(BROWSER_PROFILE_TEMPLATE_DIR, portal))
+
+
+def read_template_stamp(portal: str) -> Optional[Dict]:
+    """
+    Read the build information of a portal's profile template.
+
+    Args:
+        portal (str): "mp" or "mh".
+
+    Returns:
+        Optional[Dict]: Build time and warmed URLs, or None if no template was built.
+    """
+    stamp_path = os.path.join(get_template_dir(portal), STAMP_FILE)
+    if not os.path.exists(stamp_path):
+        return None
+    with open(stamp_path) as file:
+        return json.load(file)
+
+
+def _strip_session_state(profile_dir: str) -> None:
+    """
+    Remove lock files and session state from a user-data-dir.
+
+    Args:
+        profile_dir (str): User-data-dir to clean.
+    """
+    for relative_path in STRIPPED_PATHS:
+        path = os.path.join(profile_dir, relative_path)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.lexists(path):
+            os.remove(path)
+
+
+def _free_port() -> int:
+    """Return a TCP port nothing listens on right now."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def build_profile_template(portal: str) -> str:
+    """
+    Build (or rebuild) a portal's profile template by loading its pages once.
+
+    The template is built in a temporary directory and swapped in when complete,
+    so browsers starting meanwhile keep cloning the previous template. The build
+    browser uses a free debugging port so it never collides with a running MP browser.
+
+    Args:
+        portal (str): "mp" or "mh".
+
+    Returns:
+        str: Template user-data-dir.
+    """
+    from selenium.webdriver.chrome.service import Service
+    from mp_automation.mp_webdriver import configure_chrome_download_preferences
+    from mh_automation.mh_config import configure_chrome_options
+    from config import CHROMEDRIVER_PATH
+
+    template_dir = get_template_dir(portal)
+    os.makedirs(os.path.dirname(template_dir), exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=f".{portal}_build_", dir=os.path.dirname(template_dir))
+    download_path = tempfile.mkdtemp(prefix=f"{portal}_template_downloads_")
+    try:
+        options = (configure_chrome_download_preferences(download_path, _free_port()) if portal == "mp"
+                   else configure_chrome_options(download_path))
+        options.add_argument(f"--user-data-dir={build_dir}")
+
+        driver = webdriver.Chrome(service=Service(CHROMEDRIVER_PATH), options=options)
+        try:
+            for url in WARMUP_URLS[portal]:
+                driver.get(url)
+                wait_until(driver, network_idle(), 60, f"template_warmup_{portal}", raise_on_timeout=False)
+        finally:
+            driver.quit()
+
+        _strip_session_state(build_dir)
+        with open(os.path.join(build_dir, STAMP_FILE), "w") as file:
+            json.dump({"built_at": datetime.now().isoformat(), "urls": WARMUP_URLS[portal]}, file)
+
+        previous_dir = None
+        if os.path.exists(template_dir):
+            previous_dir = f"{build_dir}.old"
+            os.rename(template_dir, previous_dir)
+        os.rename(build_dir, template_dir)
+        if previous_dir:
+            shutil.rmtree(previous_dir, ignore_errors=True)
+    finally:
+        # Left behind only when the build failed before the swap
+        shutil.rmtree(build_dir, ignore_errors=True)
+        shutil.rmtree(download_path, ignore_errors=True)
+    logging.info(f"Built {portal} browser profile template in {template_dir}.")
+    return template_dir
+
+
+def clone_profile_template(portal: str) -> Optional[str]:
+    """
+    Clone a portal's profile template into a private user-data-dir.
+
+    Args:
+        portal (str): "mp" or "mh".
+
+    Returns:
+        Optional[str]: The cloned user-data-dir, or None when templates are disabled or not built.
+    """
+    if not USE_BROWSER_PROFILE_TEMPLATE:
+        return None
+    stamp = read_template_stamp(portal)
+    if stamp is None:
+        return None
+    built_at = datetime.fromisoformat(stamp["built_at"])
+    if datetime.now() - built_at > timedelta(days=BROWSER_PROFILE_TEMPLATE_MAX_AGE_DAYS):
+        logging.warning(f"The {portal} profile template is older than {BROWSER_PROFILE_TEMPLATE_MAX_AGE_DAYS} days; "
+                        f"refresh it with `python profile_template.py build {portal}`.")
+
+    clone_dir = tempfile.mkdtemp(prefix=f"{portal}_profile_")
+    template_dir = get_template_dir(portal)
+    if sys.platform == "darwin":
+        # BSD cp -c clones every file with clonefile(2), sharing its blocks on APFS
+        command = ["cp", "-c", "-R", "-p", f"{template_dir}/.", clone_dir]
+    else:
+        # GNU cp shares the file extents on btrfs/XFS and silently copies elsewhere
+        command = ["cp", "-a", "--reflink=auto", f"{template_dir}/.", clone_dir]
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        logging.warning(f"Copy-on-write clone of the {portal} profile template failed, copying it: {e}")
+        shutil.copytree(template_dir, clone_dir, dirs_exist_ok=True)
+    return clone_dir
+
+
+def apply_profile_template(options: Options, portal: str) -> Optional[str]:
+    """
+    Point Chrome options at a fresh clone of the portal's profile template.
+
+    Args:
+        options (Options): Chrome options of the browser about to start.
+        portal (str): "mp" or "mh".
+
+    Returns:
+        Optional[str]: The cloned user-data-dir to remove once the browser quits, or None.
+    """
+    clone_dir = clone_profile_template(portal)
+    if clone_dir:
+        options.add_argument(f"--user-data-dir={clone_dir}")
+    return clone_dir
+
+
+def remove_profile_clone(driver: webdriver.Chrome) -> None:
+    """
+    Delete the cloned user-data-dir of a browser that has quit.
+
+    Args:
+        driver (webdriver.Chrome): WebDriver instance started with apply_profile_template.
+    """
+    clone_dir = getattr(driver, "profile_clone_dir", None)
+    if clone_dir:
+        shutil.rmtree(clone_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect the Chrome profile templates.")
+    parser.add_argument("command", choices=["build", "status"])
+    parser.add_argument("portals", nargs="*", choices=["mp", "mh"], default=["mp", "mh"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    for portal in args.portals:
+        if args.command == "build":
+            build_profile_template(portal)
+        else:
+            stamp = read_template_stamp(portal)
+            print(f"{portal}: " + (f"built {stamp['built_at']}" if stamp else "not built"))
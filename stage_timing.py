@@ -0,0 +1,252 @@
+import os
+import json
+import math
+import time
+import uuid
+import logging
+import functools
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+from config import SPAN_LOG_PATH, PROMETHEUS_TEXTFILE_DIR
+
+# Per-stage latency spans for the bill pipelines.
+#
+# Stage functions are decorated with @timed_stage. Each call becomes a span
+# tagged with the portal, the IVRS number or account id, the attempt number and
+# the outcome, appended to SPAN_LOG_PATH. Worker processes append to the same
+# file, so run summaries are computed from it, filtered by the run id.
+
+RUN_ID_ENV = "BILL_RUN_ID"
+SUMMARY_QUANTILES = (0.5, 0.95, 0.99)
+
+_context = threading.local()
+_span_file_lock = threading.Lock()
+
+
+def get_run_id() -> str:
+    """
+    Return the id of the current run, creating it on first use.
+
+    The id is kept in the environment so worker processes inherit it.
+
+    Returns:
+        str: Run id.
+    """
+    if RUN_ID_ENV not in os.environ:
+        os.environ[RUN_ID_ENV] = uuid.uuid4().hex[:12]
+    return os.environ[RUN_ID_ENV]
+
+
+def set_item_context(portal: str, item_id: Any, attempt: int = 1) -> None:
+    """
+    Tag the spans recorded by this thread with the item being processed.
+
+    Args:
+        portal (str): "mp" or "mh".
+        item_id (Any): IVRS number or account id.
+        attempt (int): Attempt number of the item.
+    """
+    _context.portal = portal
+    _context.item_id = str(item_id)
+    _context.attempt = attempt
+
+
+def get_item_context() -> Dict[str, Any]:
+    """
+    Return the tags of the item this thread is processing.
+
+    Returns:
+        Dict[str, Any]: portal, item_id and attempt.
+    """
+    return {
+        'portal': getattr(_context, 'portal', ''),
+        'item_id': getattr(_context, 'item_id', ''),
+        'attempt': getattr(_context, 'attempt', 0),
+    }
+
+
+def record_span(stage: str, duration: float, outcome: str) -> None:
+    """
+    Append a span to the span log.
+
+    Args:
+        stage (str): Stage name.
+        duration (float): Duration in seconds.
+        outcome (str): "ok" or the class name of the raised exception.
+    """
+    span = {
+        'run_id': get_run_id(),
+        'stage': stage,
+        'duration_ms': round(duration * 1000, 3),
+        'outcome': outcome,
+        'ts': time.time(),
+        'pid': os.getpid(),
+        **get_item_context(),
+    }
+    line = json.dumps(span) + "\n"
+    try:
+        with _span_file_lock, open(SPAN_LOG_PATH, 'a') as file:
+            file.write(line)
+    except OSError as e:
+        logging.error(f"Failed to write span for stage {stage}: {e}")
+
+
+def timed_stage(function: Optional[Callable] = None, *, stage: Optional[str] = None) -> Callable:
+    """
+    Decorate a pipeline stage so every call is recorded as a span.
+
+    Usable as @timed_stage or @timed_stage(stage="name"); the stage name defaults
+    to the function name.
+
+    Args:
+        function (Optional[Callable]): Function being decorated.
+        stage (Optional[str]): Stage name.
+
+    Returns:
+        Callable: The wrapped function.
+    """
+    def decorator(func: Callable) -> Callable:
+        stage_name = stage or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start_time = time.perf_counter()
+            outcome = "ok"
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                outcome = type(e).__name__
+                raise
+            finally:
+                record_span(stage_name, time.perf_counter() - start_time, outcome)
+
+        return wrapper
+
+    return decorator(function) if function is not None else decorator
+
+
+def load_spans(run_id: Optional[str] = None, portal: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Read the spans of a run from the span log.
+
+    Args:
+        run_id (Optional[str]): Run id; defaults to the current run.
+        portal (Optional[str]): Only return spans of this portal.
+
+    Returns:
+        List[Dict[str, Any]]: Matching spans.
+    """
+    run_id = run_id or get_run_id()
+    spans = []
+    if not os.path.exists(SPAN_LOG_PATH):
+        return spans
+    with open(SPAN_LOG_PATH) as file:
+        for line in file:
+            try:
+                span = json.loads(line)
+            except ValueError:
+                continue
+            if span.get('run_id') == run_id and (portal is None or span.get('portal') == portal):
+                spans.append(span)
+    return spans
+
+
+def quantile(values: List[float], fraction: float) -> float:
+    """
+    Return a quantile of sorted values using the nearest-rank method.
+
+    Args:
+        values (List[float]): Values sorted in ascending order.
+        fraction (float): Quantile between 0 and 1.
+
+    Returns:
+        float: The quantile.
+    """
+    index = min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+def summarize_spans(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    Compute per-stage count, error count, total and quantiles of span durations.
+
+    Args:
+        spans (List[Dict[str, Any]]): Spans to summarize.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Summary per stage, durations in milliseconds.
+    """
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+    for span in spans:
+        durations[span['stage']].append(span['duration_ms'])
+        errors[span['stage']] += span['outcome'] != "ok"
+
+    summary = {}
+    for stage, values in durations.items():
+        values.sort()
+        summary[stage] = {
+            'count': len(values),
+            'errors': errors[stage],
+            'sum': sum(values),
+            **{f"p{int(q * 100)}": quantile(values, q) for q in SUMMARY_QUANTILES},
+        }
+    return summary
+
+
+def write_prometheus_textfile(portal: str, summary: Dict[str, Dict[str, float]]) -> str:
+    """
+    Write a stage summary as a Prometheus textfile, replacing the previous one atomically.
+
+    Args:
+        portal (str): "mp" or "mh".
+        summary (Dict[str, Dict[str, float]]): Output of summarize_spans.
+
+    Returns:
+        str: Path of the written file.
+    """
+    lines = [
+        "# HELP bill_stage_duration_seconds Duration of bill pipeline stages in the last run.",
+        "# TYPE bill_stage_duration_seconds summary",
+    ]
+    for stage, stats in sorted(summary.items()):
+        labels = f'portal="{portal}",stage="{stage}"'
+        for q in SUMMARY_QUANTILES:
+            lines.append(f'bill_stage_duration_seconds{{{labels},quantile="{q}"}} '
+                         f'{stats[f"p{int(q * 100)}"] / 1000:.6f}')
+        lines.append(f"bill_stage_duration_seconds_sum{{{labels}}} {stats['sum'] / 1000:.6f}")
+        lines.append(f"bill_stage_duration_seconds_count{{{labels}}} {stats['count']}")
+    lines.append("# HELP bill_stage_errors_total Failed calls of bill pipeline stages in the last run.")
+    lines.append("# TYPE bill_stage_errors_total gauge")
+    for stage, stats in sorted(summary.items()):
+        lines.append(f'bill_stage_errors_total{{portal="{portal}",stage="{stage}"}} {stats["errors"]}')
+
+    os.makedirs(PROMETHEUS_TEXTFILE_DIR, exist_ok=True)
+    path = os.path.join(PROMETHEUS_TEXTFILE_DIR, f"bill_stages_{portal}.prom")
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as file:
+        file.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+    return path
+
+
+def log_stage_summary(portal: str) -> None:
+    """
+    Log per-stage p50/p95/p99 of the current run and export them for Prometheus.
+
+    Args:
+        portal (str): "mp" or "mh".
+    """
+    summary = summarize_spans(load_spans(portal=portal))
+    if not summary:
+        logging.info(f"No {portal} stage spans recorded in this run.")
+        return
+    logging.info(f"{portal.upper()} stage latency (ms) for run {get_run_id()}:")
+    for stage, stats in sorted(summary.items(), key=lambda item: -item[1]['sum']):
+        logging.info(f"  {stage:<32} n={stats['count']:<6} errors={stats['errors']:<4} "
+                     f"p50={stats['p50']:.0f} p95={stats['p95']:.0f} p99={stats['p99']:.0f}")
+    try:
+        write_prometheus_textfile(portal, summary)
+    except OSError as e:
+        logging.error(f"Failed to write Prometheus textfile: {e}")
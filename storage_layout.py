@@ -0,0 +1,82 @@
+import os
+import shutil
+import hashlib
+import logging
+from datetime import date
+from typing import Optional
+from stage_timing import get_run_id
+from download_watcher import close_download_watcher
+from config import BILL_STAGING_DIR, BILL_ARCHIVE_DIR, BILL_ARCHIVE_SHARDS
+
+# Directory layout of downloaded bills.
+#
+# Browsers download into a staging directory private to the run and the worker,
+# so a download directory only ever holds the few files in flight. Finished
+# bills are exposed in an archive sharded as <portal>/<year>/<month>/<shard>,
+# where the shard is derived from the IVRS number or account id, so no archive
+# directory grows with the number of years or consumers kept.
+
+
+def get_staging_dir(portal: str, worker_id: Optional[int] = None) -> str:
+    """
+    Return (and create) the staging directory of this run and worker.
+
+    Args:
+        portal (str): "mp" or "mh".
+        worker_id (Optional[int]): Worker or lane index when several browsers run.
+
+    Returns:
+        str: Absolute staging directory.
+    """
+    parts = [BILL_STAGING_DIR, get_run_id(), portal]
+    if worker_id is not None:
+        parts.append(f"worker_{worker_id}")
+    staging_dir = os.path.abspath(os.path.join(*parts))
+    os.makedirs(staging_dir, exist_ok=True)
+    return staging_dir
+
+
+def clear_staging(run_id: Optional[str] = None) -> None:
+    """
+    Remove a run's staging directories, including downloads left unfinished.
+
+    Args:
+        run_id (Optional[str]): Run to clear; defaults to the current run.
+    """
+    staging_dir = os.path.join(BILL_STAGING_DIR, run_id or get_run_id())
+    close_download_watcher(staging_dir)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    logging.info(f"Cleared staging directory {staging_dir}.")
+
+
+def get_archive_shard(item_key: str) -> str:
+    """
+    Return the archive shard of an IVRS number or account id.
+
+    Args:
+        item_key (str): IVRS number or account id.
+
+    Returns:
+        str: Two-digit hex shard, stable for the same key.
+    """
+    digest = hashlib.sha1(str(item_key).encode()).digest()
+    return f"{int.from_bytes(digest[:4], 'big') % BILL_ARCHIVE_SHARDS:02x}"
+
+
+def get_archive_dir(portal: str, item_key: str, when: Optional[date] = None) -> str:
+    """
+    Return the archive directory a bill is exposed in.
+
+    The directory is created by the bill store when the bill is linked.
+
+    Args:
+        portal (str): "mp" or "mh".
+        item_key (str): IVRS number or account id.
+        when (Optional[date]): Date the bill was fetched; defaults to today.
+
+    Returns:
+        str: <BILL_ARCHIVE_DIR>/<portal>/<year>/<month>/<shard>.
+    """
+    when = when or date.today()
+    return os.path.join(BILL_ARCHIVE_DIR, portal, f"{when.year:04d}", f"{when.month:02d}",
+                        get_archive_shard(item_key))
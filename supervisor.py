@@ -0,0 +1,226 @@
+import os
+import json
+import glob
+import time
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+from stage_timing import set_item_context, record_span
+from bill_outcomes import record_outcome
+from config import CHECKPOINT_DIR, ITEM_MAX_RETRIES, ITEM_RETRY_BACKOFF
+
+# Checkpointed supervisor for the bill loops.
+#
+# Every processed item is appended to a checkpoint file as soon as it finishes.
+# A crashed worker is restarted on its own and retries the failing item a
+# bounded number of times; a restarted run skips everything already in the
+# checkpoint, so recovery costs one item instead of the whole run.
+
+
+class RunCheckpoint:
+    """
+    Append-only record of the items a worker has processed in the current run.
+
+    Each line of the checkpoint file is a JSON object with the item key, its
+    status ("done" or "failed") and, for failures, the last error.
+    """
+
+    def __init__(self, portal: str, worker_id: Optional[int] = None):
+        """
+        Open the checkpoint of a portal (and worker), loading its previous entries.
+
+        Args:
+            portal (str): "mp" or "mh".
+            worker_id (Optional[int]): Worker index when the run is split across workers.
+        """
+        self.portal = portal
+        name = portal if worker_id is None else f"{portal}_worker{worker_id}"
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        self.path = os.path.join(CHECKPOINT_DIR, f"{name}.jsonl")
+        self.processed: Set[str] = read_checkpoint_file(self.path)
+
+    def is_processed(self, key: str) -> bool:
+        """
+        Check whether an item was already processed in this run.
+
+        Args:
+            key (str): Item key.
+
+        Returns:
+            bool: True if the item is done or has exhausted its retries.
+        """
+        return str(key) in self.processed
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        """
+        Append one entry and flush it to disk.
+
+        Args:
+            entry (Dict[str, Any]): Entry to write.
+        """
+        entry['at'] = datetime.utcnow().isoformat()
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(entry) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self.processed.add(entry['key'])
+
+    def mark_done(self, key: str) -> None:
+        """
+        Record an item as processed successfully.
+
+        Args:
+            key (str): Item key.
+        """
+        self._append({'key': str(key), 'status': 'done'})
+
+    def mark_failed(self, key: str, error: str) -> None:
+        """
+        Record an item that failed on every retry.
+
+        Args:
+            key (str): Item key.
+            error (str): Last error message.
+        """
+        self._append({'key': str(key), 'status': 'failed', 'error': error})
+
+
+def read_checkpoint_file(path: str) -> Set[str]:
+    """
+    Read the item keys recorded in a checkpoint file.
+
+    A partially written last line (from a crash mid-write) is ignored.
+
+    Args:
+        path (str): Checkpoint file path.
+
+    Returns:
+        Set[str]: Keys of processed items.
+    """
+    keys = set()
+    if not os.path.exists(path):
+        return keys
+    with open(path) as file:
+        for line in file:
+            try:
+                keys.add(json.loads(line)['key'])
+            except (ValueError, KeyError):
+                logging.warning(f"Ignoring damaged checkpoint line in {path}.")
+    return keys
+
+
+def load_processed_keys(portal: str) -> Set[str]:
+    """
+    Return the items processed by any worker of the portal's current run.
+
+    Args:
+        portal (str): "mp" or "mh".
+
+    Returns:
+        Set[str]: Keys of processed items.
+    """
+    keys = set()
+    for path in glob.glob(os.path.join(CHECKPOINT_DIR, f"{portal}*.jsonl")):
+        keys |= read_checkpoint_file(path)
+    return keys
+
+
+def clear_checkpoints(portal: str) -> None:
+    """
+    Remove the portal's checkpoints once its run has completed.
+
+    Args:
+        portal (str): "mp" or "mh".
+    """
+    for path in glob.glob(os.path.join(CHECKPOINT_DIR, f"{portal}*.jsonl")):
+        os.remove(path)
+    logging.info(f"Cleared {portal} checkpoints.")
+
+
+def run_supervised(items: Iterable, checkpoint: RunCheckpoint,
+                   process_item: Callable[[Any, Callable[[], Any]], bool],
+                   open_worker: Callable[[], Any], close_worker: Callable[[Any], None],
+                   reset_worker: Optional[Callable[[Any], None]] = None, recycle_after: int = 0,
+                   max_retries: int = ITEM_MAX_RETRIES,
+                   item_key: Callable[[Any], str] = str) -> Tuple[int, int]:
+    """
+    Process items one by one, restarting only the worker resource when an item fails.
+
+    The worker resource (usually a browser) is opened lazily through the getter
+    passed to process_item. When an item raises, the resource is closed and the
+    same item is retried with a fresh one, up to max_retries attempts. Items
+    already in the checkpoint are skipped.
+
+    Args:
+        items (Iterable): Items to process.
+        checkpoint (RunCheckpoint): Checkpoint of this worker.
+        process_item (Callable[[Any, Callable[[], Any]], bool]): Processes one item given a worker getter;
+            returns False when the worker should be recycled even though the item succeeded.
+        open_worker (Callable[[], Any]): Creates a worker resource.
+        close_worker (Callable[[Any], None]): Releases a worker resource without raising.
+        reset_worker (Optional[Callable[[Any], None]]): Prepares a kept worker for the next item.
+        recycle_after (int): Recycle the worker after this many items; 0 never recycles.
+        max_retries (int): Attempts per item before it is recorded as failed.
+        item_key (Callable[[Any], str]): Returns the checkpoint key of an item.
+
+    Returns:
+        Tuple[int, int]: Number of items processed successfully and number that failed.
+    """
+    state = {'worker': None, 'items': 0}
+
+    def get_worker() -> Any:
+        if state['worker'] is None:
+            state['worker'] = open_worker()
+            state['items'] = 0
+        return state['worker']
+
+    def recycle() -> None:
+        if state['worker'] is not None:
+            close_worker(state['worker'])
+            state['worker'] = None
+
+    succeeded = 0
+    failed = 0
+    try:
+        for item in items:
+            key = item_key(item)
+            if checkpoint.is_processed(key):
+                continue
+            for attempt in range(1, max_retries + 1):
+                set_item_context(checkpoint.portal, key, attempt)
+                start_time = time.perf_counter()
+                try:
+                    healthy = process_item(item, get_worker)
+                    duration = time.perf_counter() - start_time
+                    record_span("item", duration, "ok")
+                    record_outcome(checkpoint.portal, key, attempt, "ok", duration)
+                except Exception as e:
+                    duration = time.perf_counter() - start_time
+                    record_span("item", duration, type(e).__name__)
+                    record_outcome(checkpoint.portal, key, attempt, "error", duration, type(e).__name__)
+                    logging.error(f"Attempt {attempt}/{max_retries} failed for {key}: {e}")
+                    recycle()
+                    if attempt == max_retries:
+                        checkpoint.mark_failed(key, str(e))
+                        failed += 1
+                    else:
+                        time.sleep(ITEM_RETRY_BACKOFF * attempt)
+                    continue
+
+                checkpoint.mark_done(key)
+                succeeded += 1
+                if state['worker'] is not None:
+                    state['items'] += 1
+                    if not healthy or (recycle_after and state['items'] >= recycle_after):
+                        recycle()
+                    elif reset_worker is not None:
+                        try:
+                            reset_worker(state['worker'])
+                        except Exception as e:
+                            logging.error(f"Failed to reset worker after {key}: {e}")
+                            recycle()
+                break
+    finally:
+        recycle()
+
+    return succeeded, failed
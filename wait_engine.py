@@ -0,0 +1,203 @@
+import os
+import time
+import logging
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+# Event-driven waits shared by both portals. Every wait records how long it
+# actually took so the remaining dead time per bill can be measured.
+
+DOWNLOAD_TEMP_SUFFIXES = ('.crdownload', '.part', '.tmp')
+
+_wait_durations: Dict[str, List[float]] = defaultdict(list)
+
+
+def record_wait(label: str, seconds: float) -> None:
+    """
+    Record the duration of a finished wait.
+
+    Args:
+        label (str): Name of the wait, e.g. "mp_submit_form".
+        seconds (float): How long the wait took.
+    """
+    _wait_durations[label].append(seconds)
+
+
+def wait_until(target: Any, condition: Callable[[Any], Any], timeout: float, label: str,
+               poll_frequency: float = 0.2, raise_on_timeout: bool = True) -> Any:
+    """
+    Wait until a condition returns a truthy value and record the time spent.
+
+    Args:
+        target (Any): Object passed to the condition, usually the WebDriver.
+        condition (Callable[[Any], Any]): Callable polled until it returns a truthy value.
+        timeout (float): Maximum time to wait in seconds.
+        label (str): Name under which the wait duration is recorded.
+        poll_frequency (float): Seconds between two polls.
+        raise_on_timeout (bool): Raise TimeoutException on timeout instead of returning None.
+
+    Returns:
+        Any: The truthy value returned by the condition, or None on a tolerated timeout.
+
+    Raises:
+        TimeoutException: If the condition is not met in time and raise_on_timeout is True.
+    """
+    start_time = time.monotonic()
+    try:
+        return WebDriverWait(target, timeout, poll_frequency=poll_frequency).until(condition)
+    except TimeoutException:
+        if raise_on_timeout:
+            raise
+        logging.info(f"Wait '{label}' timed out after {timeout}s; continuing.")
+        return None
+    finally:
+        record_wait(label, time.monotonic() - start_time)
+
+
+def document_ready(driver: webdriver.Chrome) -> bool:
+    """
+    Condition: the current document has finished loading.
+
+    Args:
+        driver (webdriver.Chrome): WebDriver instance.
+
+    Returns:
+        bool: True once document.readyState is "complete".
+    """
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def network_idle(idle_time: float = 0.5) -> Callable[[webdriver.Chrome], bool]:
+    """
+    Condition: the document is loaded and no new resource has been fetched for idle_time seconds.
+
+    Args:
+        idle_time (float): Seconds without a new resource entry before the page counts as idle.
+
+    Returns:
+        Callable[[webdriver.Chrome], bool]: Condition usable with wait_until.
+    """
+    state = {'count': -1, 'changed_at': time.monotonic()}
+
+    def _condition(driver: webdriver.Chrome) -> bool:
+        ready, count = driver.execute_script(
+            "return [document.readyState, performance.getEntriesByType('resource').length];"
+        )
+        now = time.monotonic()
+        if count != state['count']:
+            state['count'] = count
+            state['changed_at'] = now
+            return False
+        return ready == "complete" and now - state['changed_at'] >= idle_time
+
+    return _condition
+
+
+def new_window_opened(known_handles: List[str]) -> Callable[[webdriver.Chrome], Optional[str]]:
+    """
+    Condition: a window handle that was not in known_handles exists.
+
+    Args:
+        known_handles (List[str]): Window handles open before the action.
+
+    Returns:
+        Callable[[webdriver.Chrome], Optional[str]]: Condition returning the new handle.
+    """
+    def _condition(driver: webdriver.Chrome) -> Optional[str]:
+        new_handles = [handle for handle in driver.window_handles if handle not in known_handles]
+        return new_handles[-1] if new_handles else None
+
+    return _condition
+
+
+def get_element_html(driver: webdriver.Chrome, locator: Tuple[By, str]) -> str:
+    """
+    Return the outer HTML of an element, or an empty string if it is missing.
+
+    Args:
+        driver (webdriver.Chrome): WebDriver instance.
+        locator (Tuple[By, str]): Locator of the element.
+
+    Returns:
+        str: The element's outer HTML.
+    """
+    try:
+        return driver.find_element(*locator).get_attribute('outerHTML') or ""
+    except WebDriverException:
+        return ""
+
+
+def element_changed(locator: Tuple[By, str], previous_html: str) -> Callable[[webdriver.Chrome], bool]:
+    """
+    Condition: an element is present and its outer HTML differs from previous_html.
+
+    Args:
+        locator (Tuple[By, str]): Locator of the element.
+        previous_html (str): Outer HTML captured before the action.
+
+    Returns:
+        Callable[[webdriver.Chrome], bool]: Condition usable with wait_until.
+    """
+    def _condition(driver: webdriver.Chrome) -> bool:
+        current_html = get_element_html(driver, locator)
+        return bool(current_html) and current_html != previous_html
+
+    return _condition
+
+
+def download_completed(directory: str, since: float = 0.0) -> Callable[[Any], Optional[str]]:
+    """
+    Condition: a PDF written at or after `since` exists and no download is still in progress.
+
+    Args:
+        directory (str): Download directory to watch.
+        since (float): Epoch timestamp taken just before the download was triggered.
+
+    Returns:
+        Callable[[Any], Optional[str]]: Condition returning the path of the newest finished PDF.
+    """
+    def _condition(_target: Any) -> Optional[str]:
+        files = os.listdir(directory)
+        if any(f.endswith(DOWNLOAD_TEMP_SUFFIXES) for f in files):
+            return None
+        candidates = []
+        for f in files:
+            if not f.endswith('.pdf'):
+                continue
+            path = os.path.join(directory, f)
+            try:
+                modified = os.path.getmtime(path)
+            except OSError:
+                # Renamed or removed by the browser since listdir; the next poll sees the result.
+                continue
+            if modified >= since:
+                candidates.append((modified, path))
+        return max(candidates)[1] if candidates else None
+
+    return _condition
+
+
+def get_wait_summary() -> Dict[str, Tuple[int, float, float]]:
+    """
+    Summarize the recorded waits.
+
+    Returns:
+        Dict[str, Tuple[int, float, float]]: Per label, the number of waits, total seconds and longest wait.
+    """
+    return {
+        label: (len(durations), sum(durations), max(durations))
+        for label, durations in _wait_durations.items()
+    }
+
+
+def log_wait_summary() -> None:
+    """
+    Log the number, total and longest duration of every recorded wait.
+    """
+    for label, (count, total, longest) in sorted(get_wait_summary().items()):
+        logging.info(f"Wait '{label}': {count} waits, {total:.2f}s total, "
+                     f"{total / count:.2f}s average, {longest:.2f}s longest.")
@@ -0,0 +1,156 @@
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import Table, Column, String, select, exists, and_, cast
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+from mp_automation.mp_database import mp_table
+from mh_automation.mh_database import reflect_mh_table
+from bill_ledger import ledger_table, current_billing_period
+from config import WORK_BATCH_SIZE
+
+# Streaming work source for both portals.
+#
+# IVRS numbers and MH credentials are read one page at a time with keyset
+# pagination (id > last id, LIMIT batch size), each page on its own short-lived
+# connection, so startup time and memory do not grow with the size of the
+# credential tables and no cursor or read transaction stays open while the bills
+# of a batch are processed or enqueued. Filtering (explicit ids, shards, bills
+# not fetched yet) happens in SQL rather than in Python.
+
+
+class WorkFilter(NamedTuple):
+    """Restricts which rows a work source yields."""
+    ids: Optional[Sequence[int]] = None
+    # (shard index, shard count): keeps rows whose id % count == index
+    shard: Optional[Tuple[int, int]] = None
+    # Skip rows whose bill for the current billing period is already in the ledger
+    due_only: bool = False
+
+
+def _apply_filter(query: Select, table: Table, portal: str, item_key, work_filter: WorkFilter) -> Select:
+    """
+    Add the WHERE clauses of a work filter to a query.
+
+    Args:
+        query (Select): Query over the credentials table.
+        table (Table): Credentials table.
+        portal (str): "mp" or "mh".
+        item_key: Column expression matching bill_ledger.item_key.
+        work_filter (WorkFilter): Filter to apply.
+
+    Returns:
+        Select: The filtered query, ordered by id.
+    """
+    if work_filter.ids is not None:
+        query = query.where(table.c.id.in_(list(work_filter.ids)))
+    if work_filter.shard is not None:
+        index, count = work_filter.shard
+        query = query.where(table.c.id % count == index)
+    if work_filter.due_only:
+        query = query.where(~exists().where(and_(
+            ledger_table.c.portal == portal,
+            ledger_table.c.item_key == item_key,
+            ledger_table.c.billing_period == current_billing_period(),
+        )))
+    return query.order_by(table.c.id)
+
+
+def _stream_batches(engine: Engine, query: Select, id_column: Column, batch_size: int) -> Iterator[List[Any]]:
+    """
+    Run a query one keyset page at a time and yield each page as a batch.
+
+    The connection of a page is returned to the pool before the page is
+    yielded, so callers may write to the database between batches.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        query (Select): Query ordered by id_column, selecting it as "id".
+        id_column (Column): Unique, ascending key to paginate on.
+        batch_size (int): Rows fetched per batch.
+
+    Yields:
+        List[Any]: Rows of one batch.
+    """
+    last_id = None
+    while True:
+        page = query if last_id is None else query.where(id_column > last_id)
+        with engine.connect() as connection:
+            rows = connection.execute(page.limit(batch_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1].id
+
+
+def iter_ivrs_batches(engine: Engine, work_filter: WorkFilter = WorkFilter(),
+                      batch_size: int = WORK_BATCH_SIZE) -> Iterator[List[str]]:
+    """
+    Yield the IVRS numbers to process in batches.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        work_filter (WorkFilter): Rows to include.
+        batch_size (int): IVRS numbers per batch.
+
+    Yields:
+        List[str]: IVRS numbers of one batch.
+    """
+    query = _apply_filter(select(mp_table.c.id, mp_table.c.ivrs_no), mp_table, "mp", mp_table.c.ivrs_no, work_filter)
+    for rows in _stream_batches(engine, query, mp_table.c.id, batch_size):
+        yield [row.ivrs_no for row in rows]
+
+
+def iter_mh_credential_batches(engine: Engine, work_filter: WorkFilter = WorkFilter(),
+                               batch_size: int = WORK_BATCH_SIZE,
+                               mh_table: Optional[Table] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield the Maharashtra credentials to process in batches.
+
+    Args:
+        engine (Engine): SQLAlchemy engine instance.
+        work_filter (WorkFilter): Rows to include.
+        batch_size (int): Credentials per batch.
+        mh_table (Optional[Table]): mh_website_credentials table; reflected when omitted.
+
+    Yields:
+        List[Dict[str, Any]]: Credentials of one batch, with 'id', 'login_name' and 'password'.
+    """
+    mh_table = mh_table if mh_table is not None else reflect_mh_table(engine)
+    query = _apply_filter(
+        select(mh_table.c.id, mh_table.c.login_name, mh_table.c.password),
+        mh_table, "mh", cast(mh_table.c.id, String), work_filter,
+    )
+    for rows in _stream_batches(engine, query, mh_table.c.id, batch_size):
+        yield [{'id': row.id, 'login_name': row.login_name, 'password': row.password} for row in rows]
+
+
+def iter_work_items(batches: Iterable[List[Any]]) -> Iterator[Any]:
+    """
+    Flatten work batches into a stream of single items, logging progress per batch.
+
+    Args:
+        batches (Iterable[List[Any]]): Batches from iter_ivrs_batches or iter_mh_credential_batches.
+
+    Yields:
+        Any: One IVRS number or credential record at a time.
+    """
+    total = 0
+    for batch in batches:
+        total += len(batch)
+        logging.info(f"Work source: loaded a batch of {len(batch)} items ({total} so far).")
+        yield from batch
+
+
+def credential_key(credentials: Dict[str, Any]) -> str:
+    """
+    Return the checkpoint and ledger key of a credential record.
+
+    Args:
+        credentials (Dict[str, Any]): Credential record from iter_mh_credential_batches.
+
+    Returns:
+        str: The record id.
+    """
+    return str(credentials['id'])